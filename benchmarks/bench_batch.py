@@ -0,0 +1,52 @@
+"""Title cleaning and key building of whole catalogs, one title at a time and in batch
+
+Run from the repository root: python -m benchmarks.bench_batch
+"""
+import argparse
+import timeit
+from typing import Callable, List
+
+from benchmarks.corpus import generate_titles
+from utils.clean_string import clean_string, clean_strings
+from utils.normalize_key import normalize_key, normalize_keys
+
+
+def _bench(label: str, function: Callable[[], object], repeat: int) -> float:
+    best = min(timeit.repeat(function, number=1, repeat=repeat))
+    print("{:<32} {:>10.2f} ms".format(label, best * 1000))
+    return best
+
+
+def one_by_one(titles: List[str]) -> List[str]:
+    # cold caches, as on the first fetch of a run
+    clean_string.cache_clear()
+    normalize_key.cache_clear()
+    return [normalize_key(clean_string(title)) for title in titles]
+
+
+def batch(titles: List[str]) -> List[str]:
+    return normalize_keys(clean_strings(titles))
+
+
+def run(size: int, repeat: int):
+    titles = generate_titles(size)
+
+    # the batch path must give exactly the same names and keys
+    if clean_strings(titles) != [clean_string(title) for title in titles]:
+        raise Exception("clean_strings does not give the same names")
+    if batch(titles) != one_by_one(titles):
+        raise Exception("normalize_keys does not give the same keys")
+
+    print("{} titles ({} unique), best of {}".format(size, len(set(titles)), repeat))
+    one_by_one_time = _bench("one by one", lambda: one_by_one(titles), repeat)
+    batch_time = _bench("batch", lambda: batch(titles), repeat)
+    print("{:<32} {:>10.1f} x".format("  speedup", one_by_one_time / batch_time))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=100000, help="number of titles")
+    parser.add_argument("--repeat", type=int, default=5, help="number of runs of each benchmark")
+    args = parser.parse_args()
+
+    run(args.size, args.repeat)
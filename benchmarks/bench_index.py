@@ -0,0 +1,75 @@
+"""Catalog kept in order: full sort against incremental updates, and queries against linear scans
+
+Run from the repository root: python -m benchmarks.bench_index --size 100000
+"""
+import argparse
+import itertools
+import random
+import timeit
+from typing import Callable, Dict
+
+from benchmarks.corpus import generate_titles
+from catalog import CatalogIndex, CrossCloudGame
+from utils.normalize_key import normalize_keys
+
+PROVIDER_NAMES = ("geforce", "psnow", "stadia", "xcloud")
+
+
+def _bench(label: str, function: Callable[[], object], repeat: int) -> float:
+    best = min(timeit.repeat(function, number=1, repeat=repeat))
+    print("{:<40} {:>10.2f} ms".format(label, best * 1000))
+    return best
+
+
+def build_catalog(size: int, seed: int = 42) -> Dict[str, CrossCloudGame]:
+    rnd = random.Random(seed)
+    merged_games: Dict[str, CrossCloudGame] = dict()
+    titles = generate_titles(size, seed)
+    for key, title in zip(normalize_keys(titles), titles):
+        game = merged_games.setdefault(key, CrossCloudGame(title, PROVIDER_NAMES))
+        game.set_game(rnd.randrange(len(PROVIDER_NAMES)), True)
+    return merged_games
+
+
+def run(size: int, changes: int, repeat: int):
+    merged_games = build_catalog(size)
+    index = CatalogIndex(merged_games)
+    rnd = random.Random(0)
+    changed_keys = rnd.sample(sorted(merged_games), min(changes, len(merged_games)))
+    print("{} games, {} changed games, best of {}".format(len(merged_games), len(changed_keys), repeat))
+
+    def full_sort():
+        return sorted(merged_games.values(), key=lambda game: game.name)
+
+    def incremental():
+        for key in changed_keys:
+            game = merged_games[key]
+            game.set_game(rnd.randrange(len(PROVIDER_NAMES)), True)
+            index.update(key, game)
+
+    _bench("full sort", full_sort, repeat)
+    _bench("incremental update", incremental, repeat)
+    if [game for _, game in index.items()] != full_sort():
+        raise Exception("The index is not in the order of the names")
+
+    _bench("on 3+ providers, scan", lambda: [game for game in full_sort() if game.nb_cloud() >= 3], repeat)
+    _bench("on 3+ providers, index", lambda: list(index.with_min_providers(3)), repeat)
+    _bench("prefix \"Dark\", first 100, scan",
+           lambda: list(itertools.islice((game for game in full_sort() if game.name.startswith("Dark")), 100)),
+           repeat)
+    _bench("prefix \"Dark\", first 100, index", lambda: list(itertools.islice(index.prefix("Dark"), 100)), repeat)
+
+    # what the server does on each refresh: the snapshot gets its own index of the new games
+    server_index = CatalogIndex(merged_games, by_key=True)
+    _bench("server refresh, new index", lambda: CatalogIndex(merged_games, by_key=True), repeat)
+    _bench("server refresh, sync and copy", lambda: (server_index.sync(merged_games), server_index.copy()), repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=100000, help="number of titles")
+    parser.add_argument("--changes", type=int, default=1000, help="number of games changed by a refresh")
+    parser.add_argument("--repeat", type=int, default=5, help="number of runs of each benchmark")
+    args = parser.parse_args()
+
+    run(args.size, args.changes, args.repeat)
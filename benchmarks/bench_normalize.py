@@ -0,0 +1,93 @@
+"""Micro-benchmark of the title cleaning and key building
+
+Run from the repository root: python -m benchmarks.bench_normalize
+"""
+import argparse
+import timeit
+from typing import Callable
+
+from benchmarks.corpus import generate_titles
+from utils.clean_string import clean_string
+from utils.normalize_key import normalize_key
+
+
+def legacy_clean_string(input_str: str) -> str:
+    return ''.join(c for c in input_str if c.isprintable()).strip(" ")
+
+
+def legacy_normalize_key(name: str):
+    key = name
+    name_remapping = {
+        "Trine 4": "Trine 4: The Nightmare Prince",
+        "Cities: Skylines - Xbox One Edition": "Cities: Skylines",
+        "Wolfenstein Young Blood": "Wolfenstein Youngblood",
+        "ARK: Survival Evolved Explorer's Edition": "ARK: Survival Evolved",
+        "Totally Accurate Battle Simulator (Game Preview)": "Totally Accurate Battle Simulator",
+        "Tom Clancy's Rainbow Six® Siege Deluxe Edition": "Tom Clancy's Rainbow Six® Siege"
+    }
+
+    if name in name_remapping:
+        key = name_remapping[name]
+
+    key = key.lower().replace("™", "").replace("®", "").replace("©", "").replace(
+        ":", "").replace("'", "").replace("’", "").replace("_", " ")
+
+    return key
+
+
+def _bench(label: str, function: Callable[[], object], repeat: int) -> float:
+    best = min(timeit.repeat(function, number=1, repeat=repeat))
+    print("{:<32} {:>10.2f} ms".format(label, best * 1000))
+    return best
+
+
+def _clear_caches():
+    clean_string.cache_clear()
+    normalize_key.cache_clear()
+
+
+def run(size: int, repeat: int):
+    titles = generate_titles(size)
+
+    # the new path must give exactly the same names and keys
+    legacy_names = [legacy_clean_string(title) for title in titles]
+    names = [clean_string(title) for title in titles]
+    if names != legacy_names:
+        raise Exception("clean_string does not give the same names")
+    if [normalize_key(name) for name in names] != [legacy_normalize_key(name) for name in names]:
+        raise Exception("normalize_key does not give the same keys")
+
+    print("{} titles ({} unique), best of {}".format(size, len(set(titles)), repeat))
+
+    def legacy():
+        for title in titles:
+            legacy_normalize_key(legacy_clean_string(title))
+
+    def cold():
+        _clear_caches()
+        for title in titles:
+            normalize_key(clean_string(title))
+
+    def warm():
+        for title in titles:
+            normalize_key(clean_string(title))
+
+    def uncached():
+        for title in titles:
+            normalize_key.__wrapped__(clean_string.__wrapped__(title))
+
+    legacy_time = _bench("legacy", legacy, repeat)
+    for label, function in (("one pass, no memo", uncached),
+                            ("one pass, cold memo", cold),
+                            ("one pass, warm memo", warm)):
+        elapsed = _bench(label, function, repeat)
+        print("{:<32} {:>10.1f} x".format("  speedup", legacy_time / elapsed))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=10000, help="number of titles")
+    parser.add_argument("--repeat", type=int, default=5, help="number of runs of each benchmark")
+    args = parser.parse_args()
+
+    run(args.size, args.repeat)
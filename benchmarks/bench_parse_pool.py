@@ -0,0 +1,67 @@
+"""Parsing of the PS Now and Geforce payloads in the fetching threads and in a process pool
+
+Several regions are fetched at the same time, as with --regions. Parsing only runs in parallel
+in the process pool, so the gain depends on the number of cores.
+
+Run from the repository root: python -m benchmarks.bench_parse_pool --scale 10 --regions 8
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from benchmarks.fixtures import synthetic_adapter
+from providers import PROVIDERS_BY_NAME
+from utils import http_client, parse_pool
+from utils.clean_string import clean_string
+
+PROVIDER_NAMES = ("psnow", "geforce")
+
+
+def fetch_regions(regions: int) -> List[List]:
+    providers = [PROVIDERS_BY_NAME[name] for name in PROVIDER_NAMES]
+    with ThreadPoolExecutor(max_workers=regions * len(providers)) as executor:
+        futures = [executor.submit(provider.fetch) for _ in range(regions) for provider in providers]
+        return [future.result() for future in futures]
+
+
+def _summary(results: List[List]) -> List:
+    return [[(game.name, getattr(game, "console", None), getattr(game, "stores", None)) for game in games]
+            for games in results]
+
+
+def run(scale: int, regions: int, workers: int, repeat: int):
+    # payloads are served from memory: only the parsing is measured
+    http_client.configure(transport=synthetic_adapter(scale))
+    print("scale {}, {} regions, {} processes, {} cores, best of {}".format(
+        scale, regions, workers, os.cpu_count(), repeat))
+
+    summaries = dict()
+    for label, pool_workers in (("fetching threads", 0), ("process pool", workers)):
+        parse_pool.configure(pool_workers)
+        # starts the processes before timing
+        fetch_regions(1)
+        best = float("inf")
+        for _ in range(repeat):
+            clean_string.cache_clear()
+            start = time.perf_counter()
+            results = fetch_regions(regions)
+            best = min(best, time.perf_counter() - start)
+        summaries[label] = _summary(results)
+        print("{:<32} {:>10.2f} ms {:>8} games".format(label, best * 1000, sum(len(games) for games in results)))
+    parse_pool.shutdown()
+
+    if summaries["fetching threads"] != summaries["process pool"]:
+        raise Exception("The process pool does not give the same games")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=10, help="size of the catalogs, relative to the real ones")
+    parser.add_argument("--regions", type=int, default=8, help="number of regions fetched at the same time")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of processes")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs of each benchmark")
+    args = parser.parse_args()
+
+    run(args.scale, args.regions, args.workers, args.repeat)
@@ -0,0 +1,118 @@
+"""Time and memory of each stage of the fetch, merge and write pipeline, on replayed synthetic catalogs
+
+Run from the repository root: python -m benchmarks.bench_pipeline --scales 1,10,100
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.corpus import generate_titles
+from benchmarks.fixtures import BASE_SIZES, synthetic_adapter
+from catalog import CatalogIndex, merge_games
+from fetchers.xcloud import clear_endpoints, configure_product_store
+from providers import PROVIDER_NAMES, PROVIDERS
+from utils import http_client
+from utils.clean_string import clean_string, clean_strings
+from utils.normalize_key import normalize_key, normalize_keys
+from writers import WRITERS, open_writer, write_batches
+
+
+def _clear_caches():
+    # memoized functions would hide the cost of a stage on the following runs
+    clean_string.cache_clear()
+    normalize_key.cache_clear()
+    configure_product_store(None)
+    clear_endpoints()
+
+
+def measure(function: Callable[[], object], repeat: int) -> Tuple[object, float, int]:
+    """Run a stage, without then with memory tracing
+
+    Args:
+        function (Callable[[], object]): stage
+        repeat (int): number of timed runs, the best one is kept
+
+    Returns:
+        Tuple[object, float, int]: result of the stage, best time in seconds and peak of allocated memory in bytes
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        _clear_caches()
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    _clear_caches()
+    tracemalloc.start()
+    result = function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def run(scale: int, repeat: int, output_format: str) -> List[Tuple[str, int, float, int]]:
+    """Run all stages at a scale
+
+    Args:
+        scale (int): size of the catalogs, relative to the real ones
+        repeat (int): number of timed runs of each stage
+        output_format (str): format of the written output
+
+    Returns:
+        List[Tuple[str, int, float, int]]: stage, number of records, time in seconds and peak memory in bytes
+    """
+    http_client.configure(transport=synthetic_adapter(scale))
+    stages: List[Tuple[str, int, float, int]] = []
+
+    results: Dict[str, List] = dict()
+    for provider in PROVIDERS:
+        games, elapsed, peak = measure(provider.fetch, repeat)
+        results[provider.name] = games
+        stages.append(("parse {}".format(provider.name), len(games), elapsed, peak))
+
+    raw_titles = [title + " " for title in generate_titles(sum(BASE_SIZES.values()) * scale)]
+    _, elapsed, peak = measure(lambda: clean_strings(raw_titles), repeat)
+    stages.append(("clean_strings", len(raw_titles), elapsed, peak))
+
+    names = [game.name for games in results.values() for game in games]
+    _, elapsed, peak = measure(lambda: normalize_keys(names), repeat)
+    stages.append(("normalize_keys", len(names), elapsed, peak))
+
+    merged_games, elapsed, peak = measure(lambda: merge_games(PROVIDER_NAMES, results), repeat)
+    stages.append(("merge", len(names), elapsed, peak))
+
+    # main sorts the games by name in a CatalogIndex, which also counts them by number of providers
+    catalog_index, elapsed, peak = measure(lambda: CatalogIndex(merged_games), repeat)
+    stages.append(("sort", len(catalog_index), elapsed, peak))
+
+    columns = [provider.column for provider in PROVIDERS]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "output.{}".format(output_format))
+
+        def write():
+            with open_writer(path, columns, output_format) as writer:
+                return write_batches(writer, ((game.name, [slot is not None for slot in game.games])
+                                              for _, game in catalog_index.items()))
+
+        count, elapsed, peak = measure(write, repeat)
+        stages.append(("write {}".format(output_format), count, elapsed, peak))
+
+    return stages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=str, default="1,10,100",
+                        help="comma separated sizes of the catalogs, relative to the real ones")
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs of each stage")
+    parser.add_argument("--format", choices=list(WRITERS), default="csv", help="format of the written output")
+    args = parser.parse_args()
+
+    print("{:>5} {:<16} {:>9} {:>11} {:>10}".format("scale", "stage", "records", "time (ms)", "peak (MiB)"))
+    for scale in [int(value) for value in args.scales.split(",")]:
+        for stage, records, elapsed, peak in run(scale, args.repeat, args.format):
+            print("{:>5} {:<16} {:>9} {:>11.1f} {:>10.2f}".format(scale, stage, records, elapsed * 1000,
+                                                                  peak / 1024 / 1024))
@@ -0,0 +1,91 @@
+"""Memory used by the game records and the merged catalog
+
+Both catalogs hold the same names and keys, which make up most of the compact one: with a single catalog, the
+compact records are 1.4x smaller. The compact records intern the names and keys, which are then shared by the
+regional catalogs: 2.5x smaller with 8 regions, 2.8x with 16.
+
+Run from the repository root: python -m benchmarks.bench_records
+"""
+import argparse
+import tracemalloc
+from typing import Callable, Dict, List
+
+from benchmarks.corpus import generate_titles
+from catalog import merge_games
+from fetchers.geforce_now import GeforceGame, GeforceStatus, Store
+from fetchers.playstation_now import PlaystationModel, PlaystationNowGame
+from fetchers.xcloud import XCloudGame
+from utils.clean_string import clean_string
+from utils.normalize_key import normalize_keys
+
+
+class LegacyGame:
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.__dict__.update(attributes)
+
+
+class LegacyCrossCloudGame:
+    def __init__(self, name: str, geforce_game, psnow_game, stadia_game, xcloud_game):
+        self.name = name
+        self.geforce_game = geforce_game
+        self.stadia_game = stadia_game
+        self.psnow_game = psnow_game
+        self.xcloud_game = xcloud_game
+
+
+def _titles(size: int, seed: int) -> List[str]:
+    # names are built from the raw text like the fetchers do, so they are new string objects
+    return [clean_string.__wrapped__(title + " ") for title in generate_titles(size, seed)]
+
+
+def build_legacy(size: int) -> Dict[str, LegacyCrossCloudGame]:
+    catalogs = {
+        "geforce": [LegacyGame(name, stores={Store.STEAM: GeforceStatus.AVAILABLE, Store.EPIC: GeforceStatus.PATCHING})
+                    for name in _titles(size, 1)],
+        "psnow": [LegacyGame(name, console=PlaystationModel.PS4) for name in _titles(size, 2)],
+        "xcloud": [LegacyGame(name, xbox_id="9N{:08d}".format(i)) for i, name in enumerate(_titles(size, 3))],
+    }
+    merged: Dict[str, LegacyCrossCloudGame] = dict()
+    # keys are built like merge_games does, so that only the records differ
+    for provider, games in catalogs.items():
+        for game, key in zip(games, normalize_keys([game.name for game in games])):
+            if key not in merged:
+                merged[key] = LegacyCrossCloudGame(game.name, None, None, None, None)
+            setattr(merged[key], "{}_game".format(provider), game)
+    return merged
+
+
+def build_compact(size: int):
+    catalogs = {
+        "geforce": [GeforceGame(name, stores={Store.STEAM: GeforceStatus.AVAILABLE, Store.EPIC: GeforceStatus.PATCHING})
+                    for name in _titles(size, 1)],
+        "psnow": [PlaystationNowGame(name, console=PlaystationModel.PS4) for name in _titles(size, 2)],
+        "xcloud": [XCloudGame(name, xbox_id="9N{:08d}".format(i)) for i, name in enumerate(_titles(size, 3))],
+    }
+    return merge_games(("geforce", "psnow", "stadia", "xcloud"), catalogs)
+
+
+def measure(build: Callable[[int], object], size: int, regions: int = 1) -> int:
+    tracemalloc.start()
+    # regional catalogs have the same games, parsed again from the payload of each region
+    catalogs = [build(size) for _ in range(regions)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del catalogs
+    return current
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=20000, help="number of games of each provider")
+    parser.add_argument("--regions", type=str, default="1,8", help="comma separated numbers of regional catalogs")
+    args = parser.parse_args()
+
+    print("{} games by provider".format(args.size))
+    for regions in [int(value) for value in args.regions.split(",")]:
+        legacy = measure(build_legacy, args.size, regions)
+        compact = measure(build_compact, args.size, regions)
+        print("{} region(s)".format(regions))
+        print("  legacy records   {:>8.1f} MiB".format(legacy / 1024 / 1024))
+        print("  compact records  {:>8.1f} MiB ({:.1f}x smaller)".format(compact / 1024 / 1024, legacy / compact))
@@ -0,0 +1,38 @@
+import random
+from typing import List
+
+_WORDS = ["Dark", "Souls", "Legend", "Star", "Wars", "Battle", "Front", "Call", "Duty", "Assassin's", "Creed",
+          "Far", "Cry", "Tomb", "Raider", "Final", "Fantasy", "Dragon", "Age", "Mass", "Effect", "Forza",
+          "Horizon", "Halo", "Gears", "Sea", "Thieves", "Ori", "Will", "Wisps", "Dead", "Cells", "Hollow",
+          "Knight", "Cities", "Skylines", "Wolfenstein", "Trine", "Rainbow", "Six", "Siege", "Monster",
+          "Hunter", "World", "Destiny", "Borderlands", "Überlord", "Cœur", "Ōkami", "Evil", "Resident"]
+_SUFFIXES = ["", "", "", "", " 2", " 3", " II", ": Remastered", " - Deluxe Edition", " (Game Preview)",
+             ": Game of the Year Edition", " Definitive Edition", "_Beta"]
+_SYMBOLS = ["", "", "", "", "™", "®", "©", "’s"]
+_INVISIBLES = [""] * 30 + ["\u200b", "\xad", "\t", "\n"]
+
+
+def generate_titles(size: int, seed: int = 42) -> List[str]:
+    """Generate a realistic list of raw game titles, as received from the providers
+
+    About a third of the titles are repeated (the same game listed on several stores or providers),
+    some have trademark symbols, punctuation, trailing spaces and a few have invisible characters.
+
+    Args:
+        size (int): number of titles
+        seed (int): random seed, to get the same titles on each run
+
+    Returns:
+        List[str]: titles
+    """
+    rnd = random.Random(seed)
+    unique_titles: List[str] = []
+    for _ in range(max(1, size * 2 // 3)):
+        words = rnd.sample(_WORDS, rnd.randint(1, 4))
+        words[0] += rnd.choice(_SYMBOLS)
+        title = " ".join(words) + rnd.choice(_SUFFIXES)
+        title += rnd.choice(_INVISIBLES) + " " * rnd.randint(0, 2)
+        unique_titles.append(title)
+
+    return [rnd.choice(unique_titles) if i % 3 == 2 else unique_titles[i * 2 // 3 % len(unique_titles)]
+            for i in range(size)]
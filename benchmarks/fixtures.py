@@ -0,0 +1,107 @@
+"""Synthetic provider responses, replayed without network access
+
+The sizes at scale 1 are close to the real catalogs.
+"""
+import html
+import json
+import random
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from benchmarks.corpus import generate_titles
+from utils.replay import RecordedResponse, ReplayAdapter
+
+# number of records of each provider at scale 1
+BASE_SIZES = {
+    "geforce": 1400,
+    "psnow": 800,
+    "stadia": 200,
+    "xcloud": 300,
+}
+
+_GEFORCE_STATUSES = ["AVAILABLE"] * 8 + ["MAINTENANCE", "PATCHING"]
+_GEFORCE_STORES = ["Steam"] * 5 + ["Epic", "Epic", "Origin", "Ubisoft Connect", "GOG", ""]
+_JSON = {"Content-Type": "application/json; charset=utf-8"}
+_HTML = {"Content-Type": "text/html; charset=utf-8"}
+_JAVASCRIPT = {"Content-Type": "application/javascript; charset=utf-8"}
+
+_XCLOUD_SCRIPT = """var categories = {{"allCloud" : "29a81209-df6f-41fd-a528-2ae6b91f719c", "other" : "x"}};
+var xgplistUrl = "https://catalog.gamepass.com/sigls/v2?id=CATEGORY&language=LANG&market=MARK";
+var guidUrl = 'https://displaycatalog.mp.microsoft.com/v7.0/products?bigIds=' + ids + \
+    '&market=US&languages=en-us&MS-CV={}';
+"""
+
+
+def _json_response(data) -> RecordedResponse:
+    return RecordedResponse(200, _JSON, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+
+def _sample(titles: List[str], size: int, rnd: random.Random) -> List[str]:
+    # providers share part of their games
+    return [rnd.choice(titles) for _ in range(size)]
+
+
+def _playstation_now_page(titles: List[str], rnd: random.Random) -> str:
+    parts = ['<!DOCTYPE html><html><head><meta charset="utf-8"><title>PS Now</title></head><body>']
+    position = 0
+    letter = 0
+    while position < len(titles):
+        parts.append('<div class="tabs"><div id="tab-content-{}" class="tab-content">'.format(letter))
+        for console in ("PS4", "PS3"):
+            parts.append('<div class="text-block"><h3>{}</h3>'.format(console))
+            for _ in range(rnd.randint(10, 40)):
+                if position >= len(titles):
+                    break
+                # names are in paragraphs, or several in a paragraph separated by <br/>
+                count = 1 if rnd.random() < 0.7 else rnd.randint(2, 4)
+                names = [html.escape(title) for title in titles[position:position + count]]
+                parts.append("<p>{}</p>".format("<br/>".join(names)))
+                position += count
+            parts.append('</div>')
+        parts.append('</div></div>')
+        letter += 1
+    parts.append('</body></html>')
+    return "".join(parts)
+
+
+def synthetic_adapter(scale: int = 1, seed: int = 42) -> ReplayAdapter:
+    """Build an adapter answering the requests of all fetchers with synthetic catalogs
+
+    Args:
+        scale (int): size of the catalogs, relative to the real ones
+        seed (int): random seed, to get the same catalogs on each run
+
+    Returns:
+        ReplayAdapter: adapter to give to http_client.configure
+    """
+    rnd = random.Random(seed)
+    sizes = {name: size * scale for name, size in BASE_SIZES.items()}
+    titles = generate_titles(sum(sizes.values()), seed)
+
+    geforce = [{"title": title, "status": rnd.choice(_GEFORCE_STATUSES), "store": rnd.choice(_GEFORCE_STORES)}
+               for title in _sample(titles, sizes["geforce"], rnd)]
+    stadia_titles = _sample(titles, sizes["stadia"], rnd)
+    stadia = {"stadia_game_list": [{"title": title} for title in stadia_titles[:len(stadia_titles) * 4 // 5]],
+              "stadia_pro_game_list": [{"title": title} for title in stadia_titles[len(stadia_titles) * 4 // 5:]]}
+    psnow = _playstation_now_page(_sample(titles, sizes["psnow"], rnd), rnd)
+    xcloud_products: Dict[str, str] = {"9N{:08d}".format(i): title
+                                       for i, title in enumerate(_sample(titles, sizes["xcloud"], rnd))}
+
+    def products(request: requests.PreparedRequest) -> RecordedResponse:
+        ids = parse_qs(urlparse(request.url).query)["bigIds"][0].split(",")
+        return _json_response({"Products": [{"ProductId": product_id,
+                                             "LocalizedProperties": [{"ProductTitle": xcloud_products[product_id]}]}
+                                            for product_id in ids if product_id in xcloud_products]})
+
+    adapter = ReplayAdapter()
+    adapter.route(r"static\.nvidiagrid\.net/", lambda request: _json_response(geforce))
+    adapter.route(r"ssl\.gstatic\.com/stadia/", lambda request: _json_response(stadia))
+    adapter.route(r"www\.playstation\.com/", lambda request: RecordedResponse(200, _HTML, psnow.encode("utf-8")))
+    adapter.route(r"xgpcatPopulate", lambda request: RecordedResponse(
+        200, _JAVASCRIPT, _XCLOUD_SCRIPT.format("DGU1mcuYo0WMMp+F.1").encode("utf-8")))
+    adapter.route(r"catalog\.gamepass\.com/sigls/", lambda request: _json_response(
+        [{"siglId": "29a81209-df6f-41fd-a528-2ae6b91f719c"}] + [{"id": product_id} for product_id in xcloud_products]))
+    adapter.route(r"displaycatalog\.mp\.microsoft\.com/", products)
+    return adapter
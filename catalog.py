@@ -0,0 +1,368 @@
+import heapq
+import re
+import sys
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from utils.normalize_key import normalize_keys
+from utils.sorted_list import SortedList
+from utils.trigram_index import TrigramIndex
+
+DEFAULT_FUZZY_THRESHOLD = 0.85
+
+# words ending a name that describe an edition of a game rather than another game
+_EDITION_SUFFIX = re.compile(r"(?: (?:(?:game of the year|goty|deluxe|standard|definitive|complete|ultimate|"
+                             r"xbox one|windows 10|pc) edition|game of the year|goty|deluxe|definitive|ultimate|"
+                             r"xbox one|xbox series x|windows 10|game preview|edition))+$")
+_PUNCTUATION = re.compile(r"[-–—()\[\].,!?&+/|]")
+# numbers and roman numerals tell sequels apart
+_NUMBERS = re.compile(r"\b(\d+|[ivx]+)\b")
+
+# upper bound of the names starting with a prefix
+_MAX_CHARACTER = "\U0010ffff"
+
+
+class CrossCloudGame:
+    """A game merged from all providers
+
+    The game of each provider is kept in a slot of a tuple, in the order of the provider names,
+    and the providers having the game are also kept as a bitmask.
+    """
+    __slots__ = ("name", "providers", "games", "providers_mask")
+
+    def __init__(self, name: str, providers: Tuple[str, ...]):
+        self.name = sys.intern(name)
+        # shared by all the games of a catalog
+        self.providers = providers
+        # a tuple has no spare capacity nor separate item array, unlike a list
+        self.games: Tuple[Optional[Any], ...] = (None,) * len(providers)
+        self.providers_mask = 0
+
+    def set_game(self, index: int, game: Any):
+        """Set the game of a provider
+
+        Args:
+            index (int): position of the provider
+            game (Any): game of the provider
+        """
+        self.games = self.games[:index] + (game,) + self.games[index + 1:]
+        self.providers_mask |= 1 << index
+
+    def game(self, provider: str) -> Optional[Any]:
+        """Get the game of a provider
+
+        Args:
+            provider (str): provider name
+
+        Returns:
+            Optional[Any]: game of the provider, None if the provider does not have it
+        """
+        if provider not in self.providers:
+            return None
+        return self.games[self.providers.index(provider)]
+
+    @property
+    def geforce_game(self):
+        return self.game("geforce")
+
+    @property
+    def psnow_game(self):
+        return self.game("psnow")
+
+    @property
+    def stadia_game(self):
+        return self.game("stadia")
+
+    @property
+    def xcloud_game(self):
+        return self.game("xcloud")
+
+    def nb_cloud(self) -> int:
+        return bin(self.providers_mask).count("1")
+
+
+def merge_games(providers: Sequence[str], games_by_provider: Dict[str, Iterable]) -> Dict[str, CrossCloudGame]:
+    """Merge the games of all providers by normalized name
+
+    The name of a merged game is the name given by the first provider that has it.
+
+    Args:
+        providers (Sequence[str]): provider names, in order of priority
+        games_by_provider (Dict[str, Iterable]): games of each provider
+
+    Returns:
+        Dict[str, CrossCloudGame]: merged games, by key
+    """
+    provider_names = tuple(providers)
+    merged_games: Dict[str, CrossCloudGame] = dict()
+
+    for index, provider in enumerate(provider_names):
+        games = list(games_by_provider.get(provider, ()))
+        for game, key in zip(games, normalize_keys([game.name for game in games])):
+            merged_game = merged_games.get(key)
+            if merged_game is None:
+                # the keys of the regional catalogs are the same strings
+                merged_game = merged_games[sys.intern(key)] = CrossCloudGame(game.name, provider_names)
+            merged_game.set_game(index, game)
+
+    return merged_games
+
+
+class CatalogIndex:
+    """Merged games kept in order, with the games of each number of providers
+
+    The games are sorted by name (or by key), and updating a game only moves it in the index:
+    a catalog that changes a little is not sorted again.
+    """
+
+    def __init__(self, merged_games: Optional[Dict[str, CrossCloudGame]] = None, by_key: bool = False):
+        """Index merged games
+
+        Args:
+            merged_games (Optional[Dict[str, CrossCloudGame]]): games by key
+            by_key (bool): sort the games by key instead of by name
+        """
+        self.by_key = by_key
+        self._games: Dict[str, CrossCloudGame] = dict()
+        # position of each game in the index: (name or key, key), and its number of providers
+        self._entries: Dict[str, Tuple[Tuple[str, str], int]] = dict()
+        self._sorted = SortedList()
+        self._by_count: Dict[int, SortedList] = dict()
+
+        if merged_games is not None:
+            # the initial games are sorted at once
+            entries_by_count: Dict[int, List[Tuple[str, str]]] = dict()
+            for key, game in merged_games.items():
+                entry = self._entry(key, game)
+                count = game.nb_cloud()
+                self._games[key] = game
+                self._entries[key] = (entry, count)
+                entries_by_count.setdefault(count, []).append(entry)
+            self._sorted = SortedList(entry for entry, _ in self._entries.values())
+            self._by_count = {count: SortedList(entries) for count, entries in entries_by_count.items()}
+
+    def _entry(self, key: str, game: CrossCloudGame) -> Tuple[str, str]:
+        return (key if self.by_key else game.name), key
+
+    def __len__(self) -> int:
+        return len(self._games)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._games
+
+    def get(self, key: str) -> Optional[CrossCloudGame]:
+        return self._games.get(key)
+
+    def update(self, key: str, game: CrossCloudGame):
+        """Add a game, or move it after its name or its providers changed
+
+        Args:
+            key (str): key of the game
+            game (CrossCloudGame): merged game
+        """
+        entry = self._entry(key, game)
+        count = game.nb_cloud()
+        previous = self._entries.get(key)
+        self._games[key] = game
+        if previous == (entry, count):
+            return
+        if previous is not None:
+            self._remove_entry(*previous)
+
+        self._entries[key] = (entry, count)
+        self._sorted.add(entry)
+        if count not in self._by_count:
+            self._by_count[count] = SortedList()
+        self._by_count[count].add(entry)
+
+    def sync(self, merged_games: Dict[str, CrossCloudGame]):
+        """Replace the games of the index, only moving the games that were added, removed or changed
+
+        Args:
+            merged_games (Dict[str, CrossCloudGame]): new games by key
+        """
+        for key in [key for key in self._games if key not in merged_games]:
+            self.remove(key)
+        for key, game in merged_games.items():
+            self.update(key, game)
+
+    def copy(self) -> "CatalogIndex":
+        """Copy the index, in linear time: later updates of the index do not change the copy
+
+        Returns:
+            CatalogIndex: independent index of the same games
+        """
+        other = CatalogIndex(by_key=self.by_key)
+        other._games = dict(self._games)
+        other._entries = dict(self._entries)
+        other._sorted = self._sorted.copy()
+        other._by_count = {count: entries.copy() for count, entries in self._by_count.items()}
+        return other
+
+    def remove(self, key: str):
+        """Remove a game, if it is in the index
+
+        Args:
+            key (str): key of the game
+        """
+        previous = self._entries.pop(key, None)
+        self._games.pop(key, None)
+        if previous is not None:
+            self._remove_entry(*previous)
+
+    def _remove_entry(self, entry: Tuple[str, str], count: int):
+        self._sorted.remove(entry)
+        self._by_count[count].remove(entry)
+        if len(self._by_count[count]) == 0:
+            del self._by_count[count]
+
+    def _items(self, entries: Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, CrossCloudGame]]:
+        for _, key in entries:
+            yield key, self._games[key]
+
+    def items(self) -> Iterator[Tuple[str, CrossCloudGame]]:
+        """Iterate over all the games, in order
+
+        Yields:
+            Tuple[str, CrossCloudGame]: key and game
+        """
+        return self._items(self._sorted)
+
+    def range(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Tuple[str, CrossCloudGame]]:
+        """Iterate over the games whose name (or key) is from start (included) to end (excluded)
+
+        Args:
+            start (Optional[str]): first name, None to start from the first game
+            end (Optional[str]): name ending the iteration, None to go to the last game
+
+        Yields:
+            Tuple[str, CrossCloudGame]: key and game
+        """
+        return self._items(self._sorted.irange(None if start is None else (start,),
+                                               None if end is None else (end,)))
+
+    def prefix(self, prefix: str) -> Iterator[Tuple[str, CrossCloudGame]]:
+        """Iterate over the games whose name (or key) starts with a prefix, in order
+
+        Args:
+            prefix (str): beginning of the names (or of the keys)
+
+        Yields:
+            Tuple[str, CrossCloudGame]: key and game
+        """
+        return self.range(prefix, prefix + _MAX_CHARACTER)
+
+    def with_min_providers(self, min_providers: int) -> Iterator[Tuple[str, CrossCloudGame]]:
+        """Iterate over the games available on at least a number of providers, in order
+
+        Args:
+            min_providers (int): minimum number of providers
+
+        Yields:
+            Tuple[str, CrossCloudGame]: key and game
+        """
+        counts = [entries for count, entries in self._by_count.items() if count >= min_providers]
+        return self._items(heapq.merge(*counts))
+
+    def count_with_min_providers(self, min_providers: int) -> int:
+        """Count the games available on at least a number of providers
+
+        Args:
+            min_providers (int): minimum number of providers
+
+        Returns:
+            int: number of games
+        """
+        return sum(len(entries) for count, entries in self._by_count.items() if count >= min_providers)
+
+
+def fuzzy_form(key: str) -> str:
+    """Simplify a key for fuzzy matching: no punctuation and no edition words at the end
+
+    Args:
+        key (str): normalized key
+
+    Returns:
+        str: simplified key, empty if the key only has punctuation
+    """
+    simplified = " ".join(_PUNCTUATION.sub(" ", key).split())
+    return _EDITION_SUFFIX.sub("", simplified)
+
+
+def _numbers(text: str) -> FrozenSet[str]:
+    return frozenset(_NUMBERS.findall(text))
+
+
+def _one_edit(word: str, other_word: str) -> bool:
+    # one character added, removed or replaced
+    if len(word) > len(other_word):
+        word, other_word = other_word, word
+    if len(other_word) - len(word) > 1:
+        return False
+    start = 0
+    while start < len(word) and word[start] == other_word[start]:
+        start += 1
+    skip = 1 if len(word) == len(other_word) else 0
+    return word[start + skip:] == other_word[start + 1:]
+
+
+def _same_words(form: str, other_form: str) -> bool:
+    # editions only differ by their end, which is not in the forms: an added word (i.e. "pc building simulator",
+    # "hunter monster remastered"), another word or other words in another order are another game, while
+    # spaces (i.e. "spider man") and a typo in a single word are not
+    words, other_words = form.split(" "), other_form.split(" ")
+    if "".join(words) == "".join(other_words):
+        return True
+    if len(words) != len(other_words):
+        return False
+    different = [(word, other_word) for word, other_word in zip(words, other_words) if word != other_word]
+    return len(different) <= 1 and all(_one_edit(word, other_word) for word, other_word in different)
+
+
+def _complementary(game: CrossCloudGame, other: CrossCloudGame) -> bool:
+    # two games of the same provider are different games
+    return game.providers_mask & other.providers_mask == 0
+
+
+def fuzzy_merge(merged_games: Dict[str, CrossCloudGame],
+                threshold: float = DEFAULT_FUZZY_THRESHOLD) -> List[Tuple[str, str, float]]:
+    """Merge the games whose names are similar but not identical (i.e. editions and suffixes)
+
+    Two games are merged when their simplified keys have a trigram similarity of at least
+    the threshold, the same words but a typo (or the same letters), the same numbers (sequels are
+    different games) and no provider has both of them. Candidates are found with a trigram index,
+    not by comparing all pairs.
+
+    Args:
+        merged_games (Dict[str, CrossCloudGame]): games merged by exact key, updated in place
+        threshold (float): minimum similarity, between 0 and 1
+
+    Returns:
+        List[Tuple[str, str, float]]: audit of the merges: kept key, merged key and similarity
+    """
+    keys = sorted(merged_games)
+    forms = [fuzzy_form(key) for key in keys]
+    index = TrigramIndex(forms, threshold)
+
+    merges: List[Tuple[str, str, float]] = []
+    for item_id, key in enumerate(keys):
+        game = merged_games.get(key)
+        # names without any word are not similar to anything
+        if game is None or forms[item_id] == "":
+            continue
+
+        numbers = _numbers(forms[item_id])
+        # a rejected pair stays rejected: the previous games were already compared to this one
+        for other_id, similarity in index.similar(item_id, following_only=True):
+            other = merged_games.get(keys[other_id])
+            if other is None or forms[other_id] == "" or _numbers(forms[other_id]) != numbers \
+                    or not _same_words(forms[item_id], forms[other_id]) or not _complementary(game, other):
+                continue
+
+            for index_slot, other_game in enumerate(other.games):
+                if other_game is not None:
+                    game.set_game(index_slot, other_game)
+            del merged_games[keys[other_id]]
+            index.remove(other_id)
+            merges.append((key, keys[other_id], similarity))
+
+    return merges
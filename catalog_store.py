@@ -0,0 +1,317 @@
+import argparse
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from catalog import CrossCloudGame
+from providers import PROVIDER_NAMES, PROVIDERS
+from utils.logging_config import configure_logging
+from utils.normalize_key import normalize_key
+from writers import FAILED
+
+logger = logging.getLogger("CatalogStore")
+
+DEFAULT_CATALOG_DB = os.path.join(".cache", "catalog.sqlite")
+
+
+def _quote(name: str) -> str:
+    # provider names come from the entry points of other packages, i.e. "shadow-pc"
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+# games are keyed by normalized name; the providers having a game are kept both as one
+# column by provider and as a bitmask in the order of PROVIDER_NAMES, which is indexed.
+# A provider column is NULL while the provider was never fetched with the game in the catalog.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    key TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    providers INTEGER NOT NULL,
+    {provider_columns},
+    psnow_console TEXT,
+    xbox_id TEXT
+);
+CREATE INDEX IF NOT EXISTS games_providers ON games (providers);
+CREATE INDEX IF NOT EXISTS games_xbox_id ON games (xbox_id);
+CREATE TABLE IF NOT EXISTS geforce_stores (
+    key TEXT NOT NULL REFERENCES games (key),
+    store TEXT NOT NULL,
+    status TEXT NOT NULL,
+    PRIMARY KEY (key, store)
+);
+CREATE INDEX IF NOT EXISTS geforce_stores_store ON geforce_stores (store, status);
+CREATE TABLE IF NOT EXISTS metadata (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS provider_status (
+    name TEXT PRIMARY KEY,
+    status TEXT,
+    updated_at REAL
+);
+""".format(provider_columns=",\n    ".join("{} INTEGER".format(_quote(name)) for name in PROVIDER_NAMES))
+
+# upper bound of the keys starting with a prefix
+_MAX_CHARACTER = "\U0010ffff"
+
+
+class CatalogStore:
+    """SQLite database of the merged games, queried without fetching the providers again"""
+
+    def __init__(self, path: str = DEFAULT_CATALOG_DB):
+        """Open the database, creating it if needed
+
+        Args:
+            path (str): database file
+        """
+        directory = os.path.dirname(path)
+        if directory != "":
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.executescript(_SCHEMA)
+
+        # a database saved with other providers, or in another order (which changes the meaning of the
+        # bitmask), or before the provider columns could be unknown, is rebuilt
+        columns = [(row["name"], row["notnull"]) for row in self._connection.execute("PRAGMA table_info(games)")]
+        if columns[3:-2] != [(name, 0) for name in PROVIDER_NAMES]:
+            logger.warning("The providers changed since the last save, {} is rebuilt".format(path))
+            self._connection.executescript("DROP TABLE games; DROP TABLE geforce_stores; "
+                                           "DROP TABLE provider_status;" + _SCHEMA)
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def save(self, merged_games: Dict[str, CrossCloudGame], providers: Optional[Sequence[str]] = None,
+             statuses: Optional[Dict[str, str]] = None):
+        """Update the database with a catalog, in a single transaction
+
+        Only the columns of the providers fetched by the run are written: the other providers, and
+        the ones that failed, keep their previous games. The games of stale providers (taken from
+        their last snapshot) are written, and their status is recorded.
+
+        Args:
+            merged_games (Dict[str, CrossCloudGame]): merged games, by key, of all or some providers
+            providers (Optional[Sequence[str]]): names of the providers of the run, None for all providers
+            statuses (Optional[Dict[str, str]]): STALE or FAILED, by name, for the providers not fetched
+        """
+        providers = PROVIDER_NAMES if providers is None else providers
+        statuses = statuses or dict()
+        written = [index for index, name in enumerate(PROVIDER_NAMES)
+                   if name in providers and statuses.get(name) != FAILED]
+        written_names = set(PROVIDER_NAMES[index] for index in written)
+
+        # (name, presence of each provider, PS Now console, xbox id) by key
+        previous: Dict[str, Tuple[str, List[Optional[int]], Optional[str], Optional[str]]] = dict()
+        for row in self._connection.execute("SELECT * FROM games"):
+            previous[row["key"]] = (row["name"], [row[name] for name in PROVIDER_NAMES],
+                                    row["psnow_console"], row["xbox_id"])
+
+        games = []
+        for key in list(merged_games) + [key for key in previous if key not in merged_games]:
+            game = merged_games.get(key)
+            unknown = (None, [None] * len(PROVIDER_NAMES), None, None)
+            name, presence, psnow_console, xbox_id = previous.get(key, unknown)
+            for index in written:
+                presence[index] = int(game is not None and game.game(PROVIDER_NAMES[index]) is not None)
+            # a game that no provider has anymore is removed
+            if 1 not in presence:
+                continue
+            if game is not None:
+                name = game.name
+                if "psnow" in written_names:
+                    psnow_console = game.psnow_game.console.value if game.psnow_game is not None else None
+                if "xcloud" in written_names:
+                    xbox_id = game.xcloud_game.xbox_id if game.xcloud_game is not None else None
+            providers_mask = sum(1 << index for index, present in enumerate(presence) if present == 1)
+            games.append([key, name, providers_mask] + presence + [psnow_console, xbox_id])
+
+        kept = set(game[0] for game in games)
+        stores = []
+        if "geforce" in written_names:
+            for key, game in merged_games.items():
+                geforce_game = game.geforce_game
+                if geforce_game is not None:
+                    stores.extend((key, store.value, status.value) for store, status in geforce_game.stores.items())
+        else:
+            stores = [tuple(row) for row in self._connection.execute("SELECT key, store, status FROM geforce_stores")
+                      if row["key"] in kept]
+
+        now = time.time()
+        with self._connection:
+            self._connection.execute("DELETE FROM geforce_stores")
+            self._connection.execute("DELETE FROM games")
+            self._connection.executemany("INSERT INTO games (key, name, providers, {}, psnow_console, xbox_id) "
+                                         "VALUES ({})".format(", ".join(_quote(name) for name in PROVIDER_NAMES),
+                                                              ", ".join("?" * (len(PROVIDER_NAMES) + 5))),
+                                         games)
+            self._connection.executemany("INSERT INTO geforce_stores (key, store, status) VALUES (?, ?, ?)", stores)
+            self._connection.execute("INSERT OR REPLACE INTO metadata (name, value) VALUES ('updated_at', ?)",
+                                     (str(now),))
+            for name in providers:
+                # a failed provider keeps the time its games were last written
+                self._connection.execute(
+                    "INSERT INTO provider_status (name, status, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET status = excluded.status, "
+                    "updated_at = COALESCE(excluded.updated_at, provider_status.updated_at)",
+                    (name, statuses.get(name), None if statuses.get(name) == FAILED else now))
+        logger.info("{} games saved in {} ({} providers written)".format(len(games), self.path, len(written)))
+
+    def provider_statuses(self) -> Dict[str, Tuple[Optional[str], Optional[float]]]:
+        """Get the status of the providers in the last run that included them
+
+        Returns:
+            Dict[str, Tuple[Optional[str], Optional[float]]]: by provider name, STALE, FAILED or None when
+                it was fetched, and the time its games were last written (None if never)
+        """
+        rows = self._connection.execute("SELECT name, status, updated_at FROM provider_status")
+        return {row["name"]: (row["status"], row["updated_at"]) for row in rows}
+
+    def updated_at(self) -> Optional[float]:
+        """Get the time of the last save
+
+        Returns:
+            Optional[float]: timestamp of the last save, None if the database is empty
+        """
+        row = self._connection.execute("SELECT value FROM metadata WHERE name = 'updated_at'").fetchone()
+        return float(row["value"]) if row is not None else None
+
+    def query(self, with_providers: Sequence[str] = (), without_providers: Sequence[str] = (),
+              name_prefix: Optional[str] = None, store: Optional[str] = None,
+              status: Optional[str] = None, limit: Optional[int] = None) -> List[sqlite3.Row]:
+        """Find games, sorted by name
+
+        Every criterion is answered from an index: the providers by the bitmask index,
+        the name prefix by the primary key, and the Geforce store by the stores index.
+
+        Args:
+            with_providers (Sequence[str]): names of the providers that must have the games
+            without_providers (Sequence[str]): names of the providers that must not have the games
+            name_prefix (Optional[str]): beginning of the names
+            store (Optional[str]): Geforce store of the games, i.e. "Steam"
+            status (Optional[str]): Geforce status of the games on the store, i.e. "AVAILABLE"
+            limit (Optional[int]): maximum number of games
+
+        Returns:
+            List[sqlite3.Row]: matching games, with the columns of the games table
+        """
+        for name in list(with_providers) + list(without_providers):
+            if name not in PROVIDER_NAMES:
+                raise Exception("Unknown provider: {}".format(name))
+
+        conditions: List[str] = []
+        parameters: List = []
+
+        required = sum(1 << PROVIDER_NAMES.index(name) for name in with_providers)
+        excluded = sum(1 << PROVIDER_NAMES.index(name) for name in without_providers)
+        if required != 0 or excluded != 0:
+            # there are only a few possible masks: list the matching ones
+            masks = [mask for mask in range(1 << len(PROVIDER_NAMES))
+                     if mask & required == required and mask & excluded == 0]
+            conditions.append("games.providers IN ({})".format(", ".join("?" * len(masks))))
+            parameters.extend(masks)
+        # the bit of a provider is also 0 when it is unknown (NULL), which is not an absence
+        conditions.extend("games.{} = 0".format(_quote(name)) for name in without_providers)
+
+        if name_prefix is not None:
+            prefix = normalize_key(name_prefix)
+            conditions.append("games.key >= ? AND games.key < ?")
+            parameters.extend([prefix, prefix + _MAX_CHARACTER])
+
+        if store is not None or status is not None:
+            store_conditions = ["geforce_stores.key = games.key"]
+            if store is not None:
+                store_conditions.append("geforce_stores.store = ?")
+                parameters.append(store)
+            if status is not None:
+                store_conditions.append("geforce_stores.status = ?")
+                parameters.append(status)
+            conditions.append("EXISTS (SELECT 1 FROM geforce_stores WHERE {})".format(" AND ".join(store_conditions)))
+
+        sql = "SELECT * FROM games"
+        if len(conditions) > 0:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY games.name"
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+        return self._connection.execute(sql, parameters).fetchall()
+
+    def stores(self, key: str) -> Dict[str, str]:
+        """Get the Geforce stores of a game
+
+        Args:
+            key (str): key of the game
+
+        Returns:
+            Dict[str, str]: status of the game, by store
+        """
+        rows = self._connection.execute("SELECT store, status FROM geforce_stores WHERE key = ? ORDER BY store",
+                                        (key,))
+        return {row["store"]: row["status"] for row in rows}
+
+
+def _provider_list(value: str) -> List[str]:
+    names = [name.strip().lower() for name in value.split(",") if name.strip() != ""]
+    for name in names:
+        if name not in PROVIDER_NAMES:
+            raise argparse.ArgumentTypeError("unknown provider: {} (expected {})"
+                                             .format(name, ",".join(PROVIDER_NAMES)))
+    return names
+
+
+if __name__ == "__main__":
+    configure_logging()
+
+    parser = argparse.ArgumentParser(description="Query the catalog saved by main.py --catalog-db")
+    parser.add_argument("--db", type=str, default=DEFAULT_CATALOG_DB, help="catalog database")
+    parser.add_argument("--with", dest="with_providers", type=_provider_list, default=[],
+                        help="comma separated providers that must have the games")
+    parser.add_argument("--without", dest="without_providers", type=_provider_list, default=[],
+                        help="comma separated providers that must not have the games")
+    parser.add_argument("--name", type=str, default=None, help="beginning of the game names")
+    parser.add_argument("--store", type=str, default=None, help="Geforce store, i.e. Steam")
+    parser.add_argument("--status", type=str, default=None, help="Geforce status on the store, i.e. AVAILABLE")
+    parser.add_argument("--limit", type=int, default=None, help="maximum number of games")
+    parser.add_argument("--count", action="store_true", help="only print the number of games")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        parser.error("no catalog in {}: run main.py --catalog-db {} first".format(args.db, args.db))
+
+    with CatalogStore(args.db) as catalog_store:
+        for name, (status, updated_at) in catalog_store.provider_statuses().items():
+            if status is not None:
+                logger.warning("{} {} in the last run, its games are from {}".format(
+                    name, status, time.ctime(updated_at) if updated_at is not None else "no run"))
+
+        start = time.perf_counter()
+        games = catalog_store.query(args.with_providers, args.without_providers, args.name,
+                                    args.store, args.status, args.limit)
+        elapsed = time.perf_counter() - start
+
+        if not args.count:
+            for game in games:
+                # "?" when the provider was not fetched with the game in the catalog yet
+                providers = " ".join(provider.column if game[provider.name]
+                                     else ("?" if game[provider.name] is None else "").ljust(len(provider.column))
+                                     for provider in PROVIDERS)
+                details = []
+                if game["psnow_console"] is not None:
+                    details.append(game["psnow_console"])
+                if game["xbox_id"] is not None:
+                    details.append(game["xbox_id"])
+                if game["geforce"]:
+                    details.extend("{}:{}".format(store, status)
+                                   for store, status in catalog_store.stores(game["key"]).items())
+                print("{} {} {}".format(game["name"].ljust(70), providers, " ".join(details)))
+        print("{} games ({:.1f} ms)".format(len(games), elapsed * 1000))
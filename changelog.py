@@ -0,0 +1,87 @@
+import json
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from utils.normalize_key import normalize_key
+from writers import FAILED, Row, split_column
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+
+
+class Snapshot:
+    """Availability of each game of an output, by normalized key
+
+    Columns are named without their status; the failed ones are listed apart, as their games are unknown.
+    """
+
+    def __init__(self, columns: Sequence[str], rows: Iterable[Row]):
+        split_columns = [split_column(column) for column in columns]
+        self.columns = [column for column, _ in split_columns]
+        self.failed = set(column for column, status in split_columns if status == FAILED)
+        self.games: Dict[str, Tuple[str, Dict[str, bool]]] = dict()
+        for name, values in rows:
+            self.games[normalize_key(name)] = (name, dict(zip(self.columns, values)))
+
+    def __len__(self) -> int:
+        return len(self.games)
+
+
+def diff_snapshots(previous: Snapshot, current: Snapshot) -> Iterator[Dict]:
+    """Compare two outputs
+
+    Each snapshot is read once and games are matched by key, so the diff is linear in the
+    number of games. A column missing in a snapshot (i.e. a new region) counts as unavailable,
+    and a column failed in either snapshot is left out.
+
+    Args:
+        previous (Snapshot): previous output
+        current (Snapshot): new output
+
+    Yields:
+        Dict: changes, in the order of the new output then of the previous one for removed games
+    """
+    failed = previous.failed | current.failed
+    for key, (name, availability) in current.games.items():
+        old = previous.games.get(key)
+        if old is None:
+            available = [column for column, value in availability.items() if value and column not in failed]
+            # a game only listed by failed columns may have been there before
+            if len(available) > 0:
+                yield {"change": ADDED, "key": key, "name": name, "available": available}
+            continue
+
+        old_name, old_availability = old
+        added = [column for column, value in availability.items()
+                 if value and not old_availability.get(column) and column not in failed]
+        removed = [column for column, value in old_availability.items()
+                   if value and not availability.get(column) and column not in failed]
+        if len(added) > 0 or len(removed) > 0 or name != old_name:
+            change = {"change": CHANGED, "key": key, "name": name, "added": added, "removed": removed}
+            if name != old_name:
+                change["previous_name"] = old_name
+            yield change
+
+    for key, (name, availability) in previous.games.items():
+        if key not in current.games and any(value and column not in failed for column, value in availability.items()):
+            yield {"change": REMOVED, "key": key, "name": name}
+
+
+def write_changelog(path: str, changes: Iterable[Dict]) -> Dict[str, int]:
+    """Write changes as JSON Lines
+
+    Args:
+        path (str): changelog file
+        changes (Iterable[Dict]): changes from diff_snapshots
+
+    Returns:
+        Dict[str, int]: number of written changes, by kind
+    """
+    counts = {ADDED: 0, REMOVED: 0, CHANGED: 0}
+    lines: List[str] = []
+    for change in changes:
+        counts[change["change"]] += 1
+        lines.append(json.dumps(change, ensure_ascii=False))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(line + "\n" for line in lines))
+    return counts
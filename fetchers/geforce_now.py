@@ -1,14 +1,17 @@
-from typing import Dict, List
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Tuple
+from utils import http_client, metrics, parse_pool
 from utils.clean_string import clean_string
-import coloredlogs
+from utils.logging_config import configure_logging
+from utils.json_stream import iter_response_json_array
 import logging
+import sys
 from enum import Enum
 
-import requests
-
 logger = logging.getLogger("GeforceNow")
-coloredlogs.install(level='INFO', logger=logger,
-                    fmt='%(name)s %(asctime)s %(levelname)s %(message)s')
+
+# number of games parsed by each task of the process pool
+CHUNK_SIZE = 2000
 
 
 class GeforceStatus(Enum):
@@ -43,64 +46,128 @@ class Store(Enum):
         return cls._value2member_map_[value]
 
 
-class GeforceGame:
-    def __init__(self, name: str, stores: Dict[Store, GeforceStatus]):
-        self.name = name
-        self.stores = stores
+# the status of each store is packed in 4 bits of an int: 0 when the game is not on the store,
+# else the position of the status in GeforceStatus + 1
+_STORES = list(Store)
+_STATUSES = list(GeforceStatus)
+_STORE_SHIFTS = {store: 4 * index for index, store in enumerate(_STORES)}
+_STATUS_CODES = {status: index + 1 for index, status in enumerate(_STATUSES)}
 
 
-def fetch_geforce_now() -> List[GeforceGame]:
-    geforce_url = "https://static.nvidiagrid.net/supported-public-game-list/locales/gfnpc-en-US.json"
-    r = requests.get(geforce_url)
+class GeforceGame:
+    __slots__ = ("name", "_stores")
+
+    def __init__(self, name: str, stores: Dict[Store, GeforceStatus]):
+        self.name = sys.intern(name)
+        self._stores = 0
+        for store, status in stores.items():
+            self.set_store(store, status)
+
+    @property
+    def stores(self) -> Mapping[Store, GeforceStatus]:
+        """Status of the game on each store
+
+        The statuses are packed in an integer: this mapping is built again on each access, and is read-only
+        (an assignment raises a TypeError). Use set_store to change a status.
+        """
+        stores: Dict[Store, GeforceStatus] = dict()
+        for store in _STORES:
+            code = (self._stores >> _STORE_SHIFTS[store]) & 0xF
+            if code != 0:
+                stores[store] = _STATUSES[code - 1]
+        # writes raise a TypeError instead of silently changing a copy
+        return MappingProxyType(stores)
+
+    def set_store(self, store: Store, status: GeforceStatus):
+        shift = _STORE_SHIFTS[store]
+        self._stores = (self._stores & ~(0xF << shift)) | (_STATUS_CODES[status] << shift)
+
+
+def fetch_geforce_now(locale: str = "en-US") -> List[GeforceGame]:
+    geforce_url = "https://static.nvidiagrid.net/supported-public-game-list/locales/gfnpc-{}.json".format(locale)
+    r = http_client.get(geforce_url, use_cache=True, stream=True)
 
     if r.status_code != 200:
+        r.close()
         raise Exception("Geforce fetch data failed")
 
-    data = r.json()
-    if not isinstance(data, list):
-        raise Exception("Unexpected response format")
-
     # use a dict becase a same game can be listed multiple time (one for each platform)
     game_list: dict[str, GeforceGame] = dict()
 
-    for game in data:
-        title: str = clean_string(game['title'])
-
-        # find game status
-        status_str = game["status"]
-        status = GeforceStatus.UNKNOWN
-        if GeforceStatus.has_value(status_str):
-            status = GeforceStatus.get_value(status_str)
-        else:
-            logger.warn(
-                "Unknown status for game {} : {}".format(title, status_str))
-
-        # find store
-        store_str: str = game["store"]
-        store: Store = None
-        if Store.has_value(store_str):
-            store = Store.get_value(store_str)
-        else:
-            store = Store.OTHER
-            if store_str == "":
-                logger.debug(
-                    "Game without platform: {} {}".format(title, status))
+    try:
+        with metrics.timer("stage_seconds", stage="parse", provider="geforce"):
+            if parse_pool.enabled():
+                _parse_in_pool(game_list, r.json())
             else:
-                logger.warning("Unknown platform: {}".format(store_str))
+                # games are decoded one by one while the response is received
+                for game in iter_response_json_array(r):
+                    _add_game(game_list, *_parse_game(game))
+    except ValueError as e:
+        raise Exception("Unexpected response format: {}".format(e))
+
+    return list(game_list.values())
+
 
-        # find the game on known games
-        # each game can be present multiple times; one for each platform (i.e. Steam, Origin, etc.)
-        if title in game_list:
-            game = game_list[title]
-            game.stores[store] = status
+def _parse_in_pool(game_list: Dict[str, GeforceGame], games: List[dict]):
+    if not isinstance(games, list):
+        raise ValueError("Not a JSON array")
+    chunks = [games[start:start + CHUNK_SIZE] for start in range(0, len(games), CHUNK_SIZE)]
+    for parsed_games in parse_pool.map_chunks(_parse_games, chunks):
+        for title, status, store in parsed_games:
+            _add_game(game_list, title, GeforceStatus.get_value(status), Store.get_value(store))
+
+
+def _parse_games(games: List[dict]) -> List[Tuple[str, str, str]]:
+    # runs in a process of the pool: games are sent back as (title, status, store) tuples
+    parsed_games: List[Tuple[str, str, str]] = []
+    for game in games:
+        title, status, store = _parse_game(game)
+        parsed_games.append((title, status.value, store.value))
+    return parsed_games
+
+
+def _parse_game(game: dict) -> Tuple[str, GeforceStatus, Store]:
+    title: str = clean_string(game['title'])
+
+    # find game status
+    status_str = game["status"]
+    status = GeforceStatus.UNKNOWN
+    if GeforceStatus.has_value(status_str):
+        status = GeforceStatus.get_value(status_str)
+    else:
+        logger.warn(
+            "Unknown status for game {} : {}".format(title, status_str))
+
+    # find store
+    store_str: str = game["store"]
+    store: Store = None
+    if Store.has_value(store_str):
+        store = Store.get_value(store_str)
+    else:
+        store = Store.OTHER
+        if store_str == "":
+            logger.debug(
+                "Game without platform: {} {}".format(title, status))
         else:
-            game = GeforceGame(name=title, stores={store: status})
-            game_list[title] = game
+            logger.warning("Unknown platform: {}".format(store_str))
+
+    return title, status, store
 
-    return list(game_list.values())
+
+def _add_game(game_list: Dict[str, GeforceGame], title: str, status: GeforceStatus, store: Store):
+    # find the game on known games
+    # each game can be present multiple times; one for each platform (i.e. Steam, Origin, etc.)
+    if title in game_list:
+        game = game_list[title]
+        game.set_store(store, status)
+    else:
+        game = GeforceGame(name=title, stores={store: status})
+        game_list[title] = game
 
 
 if __name__ == "__main__":
+    configure_logging()
+
     game_list = fetch_geforce_now()
 
     for game in game_list:
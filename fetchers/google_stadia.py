@@ -1,30 +1,32 @@
 import logging
+import sys
+import time
 from typing import List
-from utils.clean_string import clean_string
-
-import coloredlogs
-import requests
+from utils import http_client, metrics
+from utils.clean_string import clean_strings
+from utils.logging_config import configure_logging
 
 logger = logging.getLogger("Stadia")
-coloredlogs.install(level='INFO', logger=logger,
-                    fmt='%(name)s %(asctime)s %(levelname)s %(message)s')
 
 
 class StadiaGame:
+    __slots__ = ("name", "pro_discount")
+
     def __init__(self, name: str, pro_discount: bool):
-        self.name = name
+        self.name = sys.intern(name)
         self.pro_discount = pro_discount
 
 
-def fetch_stadia() -> List[StadiaGame]:
+def fetch_stadia(country: str = "us") -> List[StadiaGame]:
 
     # from https://stadia.google.com/games page
-    stadia_url = "https://ssl.gstatic.com/stadia/gamers/landing_page/config/landing_page_us.json"
+    stadia_url = "https://ssl.gstatic.com/stadia/gamers/landing_page/config/landing_page_{}.json".format(country)
 
-    r = requests.get(stadia_url)
+    r = http_client.get(stadia_url, use_cache=True)
     if(r.status_code != 200):
         raise Exception("XCloud fetch data failed")
 
+    parse_start = time.perf_counter()
     data = r.json()
 
     if "stadia_game_list" not in data \
@@ -33,20 +35,16 @@ def fetch_stadia() -> List[StadiaGame]:
             or not isinstance(data["stadia_pro_game_list"], list):
         raise Exception("Unexpected response format")
 
-    game_list: List[StadiaGame] = list()
-
-    for game in data["stadia_game_list"]:
-        if "title" in game:
-            game_list.append(StadiaGame(name=clean_string(game["title"]), pro_discount=False))
-
-    for game in data["stadia_pro_game_list"]:
-        if "title" in game:
-            game_list.append(StadiaGame(name=clean_string(game["title"]), pro_discount=False))
+    titles = [game["title"] for game in data["stadia_game_list"] + data["stadia_pro_game_list"] if "title" in game]
+    game_list: List[StadiaGame] = [StadiaGame(name=name, pro_discount=False) for name in clean_strings(titles)]
 
+    metrics.observe("stage_seconds", time.perf_counter() - parse_start, stage="parse", provider="stadia")
     return game_list
 
 
 if __name__ == "__main__":
+    configure_logging()
+
     game_list = fetch_stadia()
 
     for game in game_list:
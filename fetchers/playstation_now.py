@@ -1,18 +1,28 @@
+import argparse
 import logging
 import re
+import sys
+import time
 from enum import Enum
-from typing import List
+from html.parser import HTMLParser
+from typing import List, Optional, Tuple, Union
+from utils import http_client, metrics, parse_pool
 from utils.clean_string import clean_string
-
-# ignore "mypy" import error for coloredlogs and BeautifulSoup.
-# see https://mypy.readthedocs.io/en/latest/running_mypy.html#missing-imports
-import coloredlogs  # type: ignore
-import requests
-from bs4 import BeautifulSoup, NavigableString  # type: ignore
+from utils.logging_config import configure_logging
 
 logger = logging.getLogger("PlaystationNow")
-coloredlogs.install(level='INFO', logger=logger,
-                    fmt='%(name)s %(asctime)s %(levelname)s %(message)s')
+
+PARSER_ENGINES = ("stream", "soup")
+DEFAULT_PARSER_ENGINE = "stream"
+_parser_engine = DEFAULT_PARSER_ENGINE
+
+# opening tag of a letter block, where the page is split to be parsed in several processes
+_LETTER_BLOCK_START = re.compile(r"""<div\b[^>]*\bid\s*=\s*["']?tab-content-""")
+
+# elements closed as soon as they are opened, as BeautifulSoup does
+_VOID_ELEMENTS = frozenset(["area", "base", "basefont", "bgsound", "br", "col", "command", "embed", "frame", "hr",
+                            "image", "img", "input", "isindex", "keygen", "link", "menuitem", "meta", "nextid",
+                            "param", "source", "spacer", "track", "wbr"])
 
 
 class PlaystationModel(Enum):
@@ -30,19 +40,19 @@ class PlaystationModel(Enum):
 
 
 class PlaystationNowGame:
+    __slots__ = ("name", "console")
+
     def __init__(self, name: str, console: PlaystationModel):
-        self.name = name
+        self.name = sys.intern(name)
         self.console = console
 
 
-def fetch_playstation_now() -> List[PlaystationNowGame]:
-    playstation_now = 'https://www.playstation.com/fr-fr/ps-now/ps-now-games/#all-ps-now-games'
+def _parse_with_soup(html: str) -> List[PlaystationNowGame]:
+    # ignore "mypy" import error for BeautifulSoup.
+    # see https://mypy.readthedocs.io/en/latest/running_mypy.html#missing-imports
+    from bs4 import BeautifulSoup, NavigableString  # type: ignore
 
-    page = requests.get(playstation_now)
-    if(page.status_code != 200):
-        raise Exception("Geforce fetch data failed")
-
-    soup = BeautifulSoup(page.text, 'html.parser')
+    soup = BeautifulSoup(html, 'html.parser')
 
     game_list: List[PlaystationNowGame] = []
 
@@ -75,7 +85,7 @@ def fetch_playstation_now() -> List[PlaystationNowGame]:
                     first_child = children[0]
                     # if it is a string, then it is a game name
                     if isinstance(first_child, NavigableString):
-                        game_name = clean_string(first_child)
+                        game_name = clean_string(str(first_child))
                         if len(game_name) > 0:
                             game_list.append(PlaystationNowGame(
                                 name=game_name, console=game_console))
@@ -88,7 +98,7 @@ def fetch_playstation_now() -> List[PlaystationNowGame]:
                     # loop over game names and ignoring <br/>
                     for child in children:
                         if isinstance(child, NavigableString):
-                            game_name = clean_string(child)
+                            game_name = clean_string(str(child))
                             if len(game_name) > 0:
                                 game_list.append(PlaystationNowGame(
                                     name=game_name, console=game_console))
@@ -96,8 +106,315 @@ def fetch_playstation_now() -> List[PlaystationNowGame]:
     return game_list
 
 
+class _SubBlock:
+    def __init__(self):
+        # texts of the first h3 and of the first span.txt--6, filled while parsing
+        self.h3_text: Optional[List[str]] = None
+        self.span_text: Optional[List[str]] = None
+        # one event for each paragraph: game names, or a console type change
+        self.events: List[Union[List[str], PlaystationModel, None]] = []
+        # games of the column, known when it is closed
+        self.games: List[PlaystationNowGame] = []
+
+
+class _Paragraph:
+    def __init__(self, sub_blocks: List[_SubBlock]):
+        # a paragraph of nested columns is one of the paragraphs of each of them
+        self.events = []
+        for sub_block in sub_blocks:
+            self.events.append((sub_block, len(sub_block.events)))
+            sub_block.events.append(None)
+        # direct children: a string, or the list of texts of a tag
+        self.children: List[Union[str, List[str]]] = []
+
+
+class _StreamParser(HTMLParser):
+    """Single pass extraction of the games, without building the document tree
+
+    Gives the same result as the BeautifulSoup engine (with the html.parser tree builder of
+    beautifulsoup4 4.9.3): the first h3 (or span.txt--6) of a column is only known at the end of
+    the column, so the paragraphs of a column are kept as events and resolved when the column is
+    closed. Like BeautifulSoup, nested letter blocks and columns list their games once for each
+    enclosing block.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        # open elements: [tag, text collector, paragraph, letter block, sub block]
+        self._stack: List[list] = []
+        self._collectors: List[List[str]] = []
+        self._data: List[str] = []
+        # columns of each letter block, all letter blocks in document order and the open ones
+        self._letter_blocks: List[List[_SubBlock]] = []
+        self._open_letter_blocks: List[List[_SubBlock]] = []
+        self._open_sub_blocks: List[_SubBlock] = []
+        # void elements closed on their opening tag, whose next closing tag must be ignored
+        self._already_closed: List[str] = []
+
+    @property
+    def game_list(self) -> List[PlaystationNowGame]:
+        return [game for letter_block in self._letter_blocks for sub_block in letter_block
+                for game in sub_block.games]
+
+    def _flush_data(self):
+        if len(self._data) == 0:
+            return
+        text = "".join(self._data)
+        self._data = []
+
+        for collector in self._collectors:
+            collector.append(text)
+        if len(self._stack) > 0 and self._stack[-1][2] is not None:
+            self._stack[-1][2].children.append(text)
+
+    def handle_starttag(self, tag, attrs, close_void_element=True):
+        self._flush_data()
+        parent_paragraph = self._stack[-1][2] if len(self._stack) > 0 else None
+        entry = [tag, None, None, None, None]
+
+        if tag == "div":
+            attributes = dict(attrs)
+            if self._open_letter_blocks and "text-block" in (attributes.get("class") or "").split():
+                entry[4] = _SubBlock()
+                for letter_block in self._open_letter_blocks:
+                    letter_block.append(entry[4])
+            if (attributes.get("id") or "").startswith("tab-content-"):
+                entry[3] = []
+                self._letter_blocks.append(entry[3])
+                self._open_letter_blocks.append(entry[3])
+            if entry[4] is not None:
+                self._open_sub_blocks.append(entry[4])
+
+        sub_blocks = self._open_sub_blocks
+        if len(sub_blocks) > 0:
+            if tag == "p":
+                entry[2] = _Paragraph(sub_blocks)
+            if tag == "h3":
+                for sub_block in sub_blocks:
+                    if sub_block.h3_text is None:
+                        if entry[1] is None:
+                            entry[1] = []
+                        sub_block.h3_text = entry[1]
+            elif tag == "span" and "txt--6" in (dict(attrs).get("class") or "").split():
+                for sub_block in sub_blocks:
+                    if sub_block.span_text is None:
+                        if entry[1] is None:
+                            entry[1] = []
+                        sub_block.span_text = entry[1]
+            if parent_paragraph is not None:
+                if entry[1] is None:
+                    entry[1] = []
+                parent_paragraph.children.append(entry[1])
+
+        if entry[1] is not None:
+            self._collectors.append(entry[1])
+        self._stack.append(entry)
+
+        if tag in _VOID_ELEMENTS and close_void_element:
+            self.handle_endtag(tag, check_already_closed=False)
+            self._already_closed.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, close_void_element=False)
+        # like BeautifulSoup 4.9.3, a <br/> following a <br> is taken as the closing tag of the <br>,
+        # so it stays open until the closing tag of one of its parents
+        self.handle_endtag(tag)
+
+    def handle_endtag(self, tag, check_already_closed=True):
+        # the closing tag of a void element is ignored, the texts around it are a single string
+        if check_already_closed and tag in self._already_closed:
+            self._already_closed.remove(tag)
+            return
+        self._flush_data()
+        # like BeautifulSoup, ignore closing tags that were not opened
+        if not any(entry[0] == tag for entry in self._stack):
+            return
+        while self._pop()[0] != tag:
+            pass
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def handle_comment(self, data):
+        self._flush_data()
+        # comments are not part of the texts, but BeautifulSoup lists them as strings of a paragraph
+        if len(self._stack) > 0 and self._stack[-1][2] is not None:
+            self._stack[-1][2].children.append(data)
+
+    def close(self):
+        super().close()
+        self._flush_data()
+        while len(self._stack) > 0:
+            self._pop()
+
+    def _pop(self) -> list:
+        entry = self._stack.pop()
+        tag, collector, paragraph, letter_block, sub_block = entry
+
+        if collector is not None:
+            self._collectors.pop()
+        if paragraph is not None:
+            self._end_paragraph(paragraph)
+        if sub_block is not None:
+            self._end_sub_block(sub_block)
+            self._open_sub_blocks.pop()
+        if letter_block is not None:
+            self._open_letter_blocks.pop()
+        return entry
+
+    @staticmethod
+    def _end_paragraph(paragraph: _Paragraph):
+        children = paragraph.children
+        event: Union[List[str], PlaystationModel, None] = None
+
+        # name list can be on one paragraph (separated by <br/>) or in multiple paragraph
+        if len(children) == 1:
+            first_child = children[0]
+            if isinstance(first_child, str):
+                event = [first_child]
+            # sometime, Sony put the console type in a span
+            elif PlaystationModel.has_value("".join(first_child)):
+                event = PlaystationModel.get_value("".join(first_child))
+        else:
+            event = [child for child in children if isinstance(child, str)]
+
+        for sub_block, event_index in paragraph.events:
+            sub_block.events[event_index] = event
+
+    @staticmethod
+    def _end_sub_block(sub_block: _SubBlock):
+        game_console: PlaystationModel = PlaystationModel.UNKNOWN
+        h3_text = "".join(sub_block.h3_text) if sub_block.h3_text is not None else None
+        span_text = "".join(sub_block.span_text) if sub_block.span_text is not None else None
+        if h3_text is not None and PlaystationModel.has_value(h3_text):
+            game_console = PlaystationModel.get_value(h3_text)
+        elif span_text is not None and PlaystationModel.has_value(span_text):
+            game_console = PlaystationModel.get_value(span_text)
+
+        for event in sub_block.events:
+            if isinstance(event, PlaystationModel):
+                game_console = event
+            elif event is not None:
+                for name in event:
+                    game_name = clean_string(name)
+                    if len(game_name) > 0:
+                        sub_block.games.append(PlaystationNowGame(name=game_name, console=game_console))
+
+
+def _parse_with_stream(html: str) -> List[PlaystationNowGame]:
+    parser = _StreamParser()
+    parser.feed(html)
+    parser.close()
+    return parser.game_list
+
+
+def parse_playstation_now(html: str, engine: str = DEFAULT_PARSER_ENGINE) -> List[PlaystationNowGame]:
+    """Extract the games of the PS Now games page
+
+    Args:
+        html (str): content of the page
+        engine (str): "stream" for the single pass parser, "soup" for the BeautifulSoup one
+
+    Returns:
+        List[PlaystationNowGame]: games of the page
+    """
+    if engine == "stream":
+        return _parse_with_stream(html)
+    if engine == "soup":
+        return _parse_with_soup(html)
+    raise Exception("Unknown parser engine: {}".format(engine))
+
+
+def split_letter_blocks(html: str) -> List[str]:
+    """Split the PS Now games page by letter block
+
+    Each part starts with the opening tag of a letter block and ends before the next one, so
+    it gives the same games as the letter block in the whole page.
+
+    Args:
+        html (str): content of the page
+
+    Returns:
+        List[str]: letter blocks, empty if the page has none
+    """
+    starts = [match.start() for match in _LETTER_BLOCK_START.finditer(html)]
+    return [html[start:end] for start, end in zip(starts, starts[1:] + [len(html)])]
+
+
+def _parse_letter_block(task: Tuple[str, str]) -> List[Tuple[str, str]]:
+    # runs in a process of the pool: games are sent back as (name, console) tuples
+    html, engine = task
+    return [(game.name, game.console.value) for game in parse_playstation_now(html, engine)]
+
+
+def parse_playstation_now_in_pool(html: str, engine: str = DEFAULT_PARSER_ENGINE) -> List[PlaystationNowGame]:
+    """Extract the games of the PS Now games page, parsing each letter block in the process pool
+
+    Args:
+        html (str): content of the page
+        engine (str): "stream" for the single pass parser, "soup" for the BeautifulSoup one
+
+    Returns:
+        List[PlaystationNowGame]: games of the page
+    """
+    letter_blocks = split_letter_blocks(html)
+    if len(letter_blocks) == 0:
+        return parse_playstation_now(html, engine)
+
+    results = parse_pool.map_chunks(_parse_letter_block, [(letter_block, engine) for letter_block in letter_blocks])
+    return [PlaystationNowGame(name=name, console=PlaystationModel.get_value(console))
+            for games in results for name, console in games]
+
+
+def configure_parser(engine: str):
+    """Set the engine used to parse the PS Now games page
+
+    Args:
+        engine (str): "stream" or "soup"
+    """
+    global _parser_engine
+
+    if engine not in PARSER_ENGINES:
+        raise Exception("Unknown parser engine: {}".format(engine))
+    _parser_engine = engine
+
+
+def fetch_playstation_now(locale: str = "fr-fr") -> List[PlaystationNowGame]:
+    playstation_now = 'https://www.playstation.com/{}/ps-now/ps-now-games/#all-ps-now-games'.format(locale)
+
+    page = http_client.get(playstation_now, use_cache=True)
+    if(page.status_code != 200):
+        raise Exception("Playstation Now fetch data failed")
+
+    with metrics.timer("stage_seconds", stage="parse", provider="psnow"):
+        if parse_pool.enabled():
+            return parse_playstation_now_in_pool(page.text, _parser_engine)
+        return parse_playstation_now(page.text, _parser_engine)
+
+
 if __name__ == "__main__":
-    game_list = fetch_playstation_now()
+    configure_logging()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--engine", choices=PARSER_ENGINES, default=DEFAULT_PARSER_ENGINE, help="parser engine")
+    parser.add_argument("--compare", action="store_true", help="compare the result and the time of each engine")
+    args = parser.parse_args()
+
+    if args.compare:
+        page = http_client.get('https://www.playstation.com/fr-fr/ps-now/ps-now-games/')
+        results = dict()
+        for engine in PARSER_ENGINES:
+            start = time.perf_counter()
+            results[engine] = [(game.name, game.console) for game in parse_playstation_now(page.text, engine)]
+            elapsed = time.perf_counter() - start
+            logger.info("{}: {} games in {:.3f}s".format(engine, len(results[engine]), elapsed))
+        if results["stream"] == results["soup"]:
+            logger.info("Both engines found the same games")
+        else:
+            logger.error("Engines found different games")
+    else:
+        configure_parser(args.engine)
+        game_list = fetch_playstation_now()
 
-    for game in game_list:
-        logger.info("{}: {}".format(game.name, game.console.value))
+        for game in game_list:
+            logger.info("{}: {}".format(game.name, game.console.value))
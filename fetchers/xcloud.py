@@ -1,128 +1,219 @@
+import hashlib
+import json
 import logging
+import os
 import re
-from typing import Dict, List
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import as_completed
+from typing import Dict, List, Optional, Tuple
 from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
-from utils.clean_string import clean_string
-
-import coloredlogs
-import requests
+from utils import http_client, metrics
+from utils.clean_string import clean_strings
+from utils.daemon_pool import DaemonThreadPool
+from utils.logging_config import configure_logging
 
 logger = logging.getLogger("XCLOUD")
-coloredlogs.install(level='DEBUG', logger=logger,
-                    fmt='%(name)s %(asctime)s %(levelname)s %(message)s')
+
+# maximum number of products requested at once to the display catalog
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_WORKERS = 4
+# known products are fetched again after a week
+DEFAULT_REVALIDATE_AFTER = 7 * 24 * 3600
 
 
 class XCloudGame:
+    __slots__ = ("name", "xbox_id")
+
     def __init__(self, name: str, xbox_id: str):
-        self.name = name
+        self.name = sys.intern(name)
         self.xbox_id = xbox_id
 
 
-def remove_url_query_params(url: str) -> str:
-    url_parsed = urlparse(url)
-    return url_parsed.scheme + "://" + url_parsed.netloc + url_parsed.path
+def _write_json(path: str, data):
+    directory = os.path.dirname(path)
+    if directory != "":
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = "{}.{}.tmp".format(path, threading.get_ident())
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
 
 
-def replace_url_query_string(url: str, params: Dict[str, str]):
-    url_parts = list(urlparse(url))
-    query = dict(parse_qsl(url_parts[4]))
-    query.update(params)
-    url_parts[4] = urlencode(query)
-    return urlunparse(url_parts)
+class XCloudProductStore:
+    """Games already fetched from the display catalog, by language and product id
 
+    The store can be saved to a JSON file so that the next runs only request new products.
+    Entries are fetched again after revalidate_after seconds (plus up to 50% spread by product,
+    so that the products stored on the same day are not all requested again on the same day).
+    The endpoints found in the last populate script are kept in a second file, next to it.
+    """
 
-def fetch_xcloud() -> List[XCloudGame]:
-    xcloud_url = "https://www.xbox.com/en-US/xbox-game-pass/games"\
-                 "/js/xgpcatPopulate-MWF2.js"
-    r = requests.get(xcloud_url)
+    def __init__(self, path: Optional[str] = None, revalidate_after: float = DEFAULT_REVALIDATE_AFTER):
+        self.path = path
+        # i.e. ".cache/xcloud_products.endpoints.json"
+        self.endpoints_path = None if path is None else "{}.endpoints.json".format(os.path.splitext(path)[0])
+        self.revalidate_after = revalidate_after
+        self._lock = threading.Lock()
+        # (language, product id) => (game name, fetch timestamp)
+        self._products: Dict[Tuple[str, str], Tuple[str, float]] = dict()
 
-    if(r.status_code != 200):
-        raise Exception("XCloud fetch populate script failed")
-
-    data = r.text
-    # first : find the allCloud category id (guidAmpt)
-    # it is a uuidv4 ID (32 hexadecimal characters and 4 hyphens)
-    # https://www.debuggex.com/r/crK1W0FQBBlhO5md
-    ms_cv_regex = re.compile(
-        "\"allCloud\" : \"([0-9a-z]{8}-[0-9a-z]{4}-[0-9a-z]{4}-[0-9a-z]{4}-[0-9a-z]{12}).*\"")
-    cloud_caterory_match = ms_cv_regex.search(data, re.IGNORECASE)
-
-    if cloud_caterory_match is not None:
-        cloud_caterory_id = cloud_caterory_match.group(1)
-        logger.debug("Cloud games category id: {}".format(cloud_caterory_id))
-    else:
-        raise Exception("Cannot get cloud games category")
-
-    # extract url to get game list
-    # i.e. "https://catalog.gamepass.com/sigls/v2?id=CATEGORY&language=LANG&market=MARK"; # noqa: E501
-    games_list_url_regex = re.compile("xgplistUrl = \"(.*)\"")
-    games_list_url_match = games_list_url_regex.search(data)
-
-    if games_list_url_match is not None:
-        games_list_url = games_list_url_match.group(1)
-        logger.debug("Game list URL (not modified): {}".format(games_list_url))
-    else:
-        raise Exception("Cannot get game list URL")
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                for language, products in data.items():
+                    for product_id, (name, fetched_at) in products.items():
+                        self._products[(language, product_id)] = (name, fetched_at)
+            except (OSError, ValueError, TypeError) as e:
+                logger.warning("Cannot load XCloud products store {}: {}".format(path, e))
 
-    # add parameters to the URL
-    # TODO : allow to change region
-    params = {'id': cloud_caterory_id, 'language': 'en-US', 'market': "US"}
-    games_list_url = replace_url_query_string(games_list_url, params)
-    logger.debug("Game list URL (with real parameters): {}"
-                 .format(games_list_url))
+    def _is_stale(self, product_id: str, fetched_at: float, now: float) -> bool:
+        spread = 1 + (zlib.crc32(product_id.encode("utf-8")) % 100) / 200
+        return now - fetched_at > self.revalidate_after * spread
 
-    r = requests.get(games_list_url)
-    if(r.status_code != 200):
-        raise Exception("Geforce fetch game id list failed")
-    game_list_data = r.json()
+    def get(self, language: str, product_id: str) -> Optional[XCloudGame]:
+        """Get a known game
 
-    game_ids: list[str] = []
-    for game in game_list_data:
-        if "id" in game:
-            game_ids.append(game["id"])
-    logger.debug("Found {} game IDs".format(len(game_ids)))
+        Args:
+            language (str): language of the game name
+            product_id (str): product id
+
+        Returns:
+            Optional[XCloudGame]: game, or None if it is unknown or must be fetched again
+        """
+        with self._lock:
+            entry = self._products.get((language, product_id))
+        if entry is None or self._is_stale(product_id, entry[1], time.time()):
+            return None
+        return XCloudGame(name=entry[0], xbox_id=product_id)
+
+    def put(self, language: str, game: XCloudGame):
+        """Add or refresh a game
+
+        Args:
+            language (str): language of the game name
+            game (XCloudGame): fetched game
+        """
+        with self._lock:
+            self._products[(language, game.xbox_id)] = (game.name, time.time())
+
+    def save(self):
+        """Write the store to its file, if any"""
+        if self.path is None:
+            return
 
-    # extract url to get game informations
-    # i.e. https://displaycatalog.mp.microsoft.com/v7.0/products
-    game_information_url_regex = re.compile("guidUrl = '(.*\?)")  # noqa: W605
-    game_information_url_match = game_information_url_regex.search(data)
+        data: Dict[str, Dict[str, Tuple[str, float]]] = dict()
+        with self._lock:
+            for (language, product_id), entry in self._products.items():
+                data.setdefault(language, dict())[product_id] = entry
 
-    if game_information_url_match is not None:
-        game_information_url = game_information_url_match.group(1)
-        logger.debug("Game information URL (not modified): {}".format(
-            game_information_url))
-    else:
-        raise Exception("Cannot get game  information URL")
+        _write_json(self.path, data)
 
-    ms_cv_regex = re.compile("MS-CV=(.*)'")
-    ms_cv_match = ms_cv_regex.search(data, re.IGNORECASE)
+    def get_endpoints(self, script_key: str) -> Optional["XCloudEndpoints"]:
+        """Get the endpoints found in a populate script by a previous run
 
-    if ms_cv_match is not None:
-        ms_cv = ms_cv_match.group(1)
-        logger.debug("MS CV: {}".format(ms_cv))
-    else:
-        raise Exception("Cannot get MS CV")
+        Args:
+            script_key (str): ETag, or content hash, of the script
 
+        Returns:
+            Optional[XCloudEndpoints]: endpoints, or None if the last scanned script is another one
+        """
+        if self.endpoints_path is None:
+            return None
+        try:
+            with open(self.endpoints_path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data["script_key"] == script_key:
+                return XCloudEndpoints(**data["endpoints"])
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            logger.warning("Cannot load XCloud endpoints {}: {}".format(self.endpoints_path, e))
+        return None
+
+    def put_endpoints(self, script_key: str, endpoints: "XCloudEndpoints"):
+        """Write the endpoints found in a populate script, if the store has a file
+
+        Args:
+            script_key (str): ETag, or content hash, of the script
+            endpoints (XCloudEndpoints): endpoints found in the script
+        """
+        if self.endpoints_path is None:
+            return
+        _write_json(self.endpoints_path, {"script_key": script_key, "endpoints": {
+            name: getattr(endpoints, name) for name in XCloudEndpoints.__slots__}})
+
+
+_product_store = XCloudProductStore()
+_batch_size = DEFAULT_BATCH_SIZE
+_max_workers = DEFAULT_MAX_WORKERS
+
+
+def configure_product_store(path: Optional[str], revalidate_after: float = DEFAULT_REVALIDATE_AFTER):
+    """Set the file used to keep the known products, and the endpoints, between runs
+
+    Args:
+        path (Optional[str]): JSON file of the store, None to keep the products and the endpoints in memory only
+        revalidate_after (float): time in seconds after which a product is fetched again
+    """
+    global _product_store
+    _product_store = XCloudProductStore(path, revalidate_after)
+
+
+def configure_batches(batch_size: int = DEFAULT_BATCH_SIZE, max_workers: int = DEFAULT_MAX_WORKERS):
+    """Set how the products of fetch_xcloud are requested to the display catalog
+
+    Args:
+        batch_size (int): maximum number of products requested at once
+        max_workers (int): maximum number of concurrent requests
+    """
+    global _batch_size, _max_workers
+
+    if batch_size < 1 or max_workers < 1:
+        raise Exception("Invalid XCloud batches: {} products, {} requests".format(batch_size, max_workers))
+    _batch_size = batch_size
+    _max_workers = max_workers
+
+
+def remove_url_query_params(url: str) -> str:
+    url_parsed = urlparse(url)
+    return url_parsed.scheme + "://" + url_parsed.netloc + url_parsed.path
+
+
+def replace_url_query_string(url: str, params: Dict[str, str]):
+    url_parts = list(urlparse(url))
+    query = dict(parse_qsl(url_parts[4]))
+    query.update(params)
+    url_parts[4] = urlencode(query)
+    return urlunparse(url_parts)
+
+
+def _fetch_products_batch(game_information_url: str, ms_cv: str, product_ids: List[str],
+                          language: str, market: str) -> List[XCloudGame]:
     params = {
-        'bigIds': ",".join(game_ids),
-        'languages': 'en-US',
-        'market': "US",
+        'bigIds': ",".join(product_ids),
+        'languages': language,
+        'market': market,
         "MS-CV": ms_cv
     }
     game_information_url = replace_url_query_string(
         game_information_url, params)
-    r = requests.get(game_information_url)
+    r = http_client.get(game_information_url)
     if(r.status_code != 200):
-        raise Exception("Geforce fetch game informations failed: code {} {}"
+        raise Exception("XCloud fetch game informations failed: code {} {}"
                         .format(r.status_code, r.text))
 
-    game_list: list[XCloudGame] = list()
-
+    parse_start = time.perf_counter()
     game_information_data = r.json()
     if "Products" not in game_information_data \
             or not isinstance(game_information_data["Products"], list):
         raise Exception("Unexpected games information response format")
 
+    titles: List[str] = list()
+    xbox_ids: List[str] = list()
     for product in game_information_data["Products"]:
         if "ProductId" not in product or "LocalizedProperties" not in product:
             continue
@@ -132,13 +223,235 @@ def fetch_xcloud() -> List[XCloudGame]:
         if isinstance(product["LocalizedProperties"], list) \
                 and len(localized_properties) > 0 \
                 and "ProductTitle" in localized_properties[0]:
-            name = clean_string(localized_properties[0]["ProductTitle"])
-            game_list.append(XCloudGame(name=name, xbox_id=product_id))
+            titles.append(localized_properties[0]["ProductTitle"])
+            xbox_ids.append(product_id)
+    game_list: List[XCloudGame] = [XCloudGame(name=name, xbox_id=product_id)
+                                   for name, product_id in zip(clean_strings(titles), xbox_ids)]
+
+    metrics.observe("stage_seconds", time.perf_counter() - parse_start, stage="parse", provider="xcloud")
+    return game_list
+
+
+def fetch_xcloud_products(game_information_url: str, ms_cv: str, product_ids: List[str],
+                          language: str = "en-US", market: str = "US",
+                          batch_size: int = DEFAULT_BATCH_SIZE,
+                          max_workers: int = DEFAULT_MAX_WORKERS) -> Dict[str, XCloudGame]:
+    """Get the games of a list of products from the display catalog
+
+    Products are requested by batches sent concurrently; the products already
+    known are taken from the products store and are not requested again.
+
+    Args:
+        game_information_url (str): display catalog URL
+        ms_cv (str): correlation vector expected by the display catalog
+        product_ids (List[str]): ids of the products
+        language (str): language of the game names
+        market (str): market of the products
+        batch_size (int): maximum number of products requested at once
+        max_workers (int): maximum number of concurrent requests
+
+    Returns:
+        Dict[str, XCloudGame]: games by product id
+    """
+    store = _product_store
+    products: Dict[str, XCloudGame] = dict()
+    missing_ids: List[str] = []
+    for product_id in product_ids:
+        game = store.get(language, product_id)
+        if game is not None:
+            products[product_id] = game
+        else:
+            missing_ids.append(product_id)
+    logger.debug("{} known products, {} to fetch".format(len(products), len(missing_ids)))
+
+    batches = [missing_ids[i:i + batch_size] for i in range(0, len(missing_ids), batch_size)]
+    if len(batches) == 0:
+        return products
+
+    # daemon threads: the batches of a fetch which timed out do not keep the run alive
+    executor = DaemonThreadPool(max_workers=min(max_workers, len(batches)), thread_name_prefix="xcloud-batch")
+    try:
+        futures = [executor.submit(_fetch_products_batch, game_information_url, ms_cv, batch,
+                                   language, market)
+                   for batch in batches]
+
+        # merge batches as soon as they are received
+        for future in as_completed(futures):
+            for game in future.result():
+                store.put(language, game)
+                products[game.xbox_id] = game
+    finally:
+        # the other batches are not requested once a batch failed
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    store.save()
+    return products
+
+
+class XCloudEndpoints:
+    """Parameters of the catalog endpoints, found in the populate script of the Game Pass page"""
+    __slots__ = ("category_id", "games_list_url", "game_information_url", "ms_cv")
+
+    def __init__(self, category_id: str, games_list_url: str, game_information_url: str, ms_cv: str):
+        # allCloud category id, i.e. "29a81209-df6f-41fd-a528-2ae6b91f719c"
+        self.category_id = category_id
+        # i.e. "https://catalog.gamepass.com/sigls/v2?id=CATEGORY&language=LANG&market=MARK"
+        self.games_list_url = games_list_url
+        # i.e. "https://displaycatalog.mp.microsoft.com/v7.0/products?"
+        self.game_information_url = game_information_url
+        # correlation vector expected by the display catalog
+        self.ms_cv = ms_cv
+
+
+# each parameter of the script, with the error raised when it is missing (the category id
+# and the MS CV are case insensitive)
+# the category id is a uuidv4 ID (32 hexadecimal characters and 4 hyphens)
+# https://www.debuggex.com/r/crK1W0FQBBlhO5md
+_ENDPOINT_PATTERNS = {
+    "category_id": ("(?i:\"allCloud\" : \"([0-9a-z]{8}-[0-9a-z]{4}-[0-9a-z]{4}-[0-9a-z]{4}-[0-9a-z]{12}).*\")",
+                    "Cannot get cloud games category"),
+    "games_list_url": ("xgplistUrl = \"(.*)\"", "Cannot get game list URL"),
+    "game_information_url": ("guidUrl = '(.*\\?)", "Cannot get game  information URL"),
+    "ms_cv": ("(?i:MS-CV=(.*)')", "Cannot get MS CV"),
+}
+_ENDPOINT_REGEXES = {name: re.compile(pattern) for name, (pattern, _) in _ENDPOINT_PATTERNS.items()}
+# any of the parameters, to find them all in a single scan
+_ANY_ENDPOINT_REGEX = re.compile("|".join("(?P<{}>{})".format(name, pattern)
+                                          for name, (pattern, _) in _ENDPOINT_PATTERNS.items()))
+
+XCLOUD_SCRIPT_URL = "https://www.xbox.com/en-US/xbox-game-pass/games/js/xgpcatPopulate-MWF2.js"
+# the script is not requested again for an hour, i.e. by the fetches of the other markets
+SCRIPT_MAX_AGE = 3600
+
+_script_lock = threading.Lock()
+# ETag (or content hash) of the last script, time it was fetched at and its endpoints
+_script_endpoints: Optional[Tuple[str, float, XCloudEndpoints]] = None
+
+
+def extract_endpoints(script: str) -> XCloudEndpoints:
+    """Find the parameters of the catalog endpoints in the populate script
+
+    The script is scanned once, until all parameters are found. Each parameter is the first match of its
+    own pattern, even when it starts inside the match of another parameter.
+
+    Args:
+        script (str): text of the populate script
+
+    Raises:
+        Exception: a parameter is missing
+
+    Returns:
+        XCloudEndpoints: parameters of the endpoints
+    """
+    values: Dict[str, str] = dict()
+    # end of the line already searched, without a match, for each missing parameter
+    searched: Dict[str, int] = dict()
+    for match in _ANY_ENDPOINT_REGEX.finditer(script):
+        # a parameter not found before the match may start inside it: parameters do not span lines, so they
+        # are searched from the match to the end of its line, once per line
+        line_end = script.find("\n", match.end())
+        if line_end == -1:
+            line_end = len(script)
+        for name, regex in _ENDPOINT_REGEXES.items():
+            if name in values or searched.get(name, -1) > match.start():
+                continue
+            found = regex.search(script, match.start(), line_end)
+            if found is None:
+                searched[name] = line_end
+            else:
+                values[name] = found.group(1)
+        if len(values) == len(_ENDPOINT_PATTERNS):
+            break
+
+    for name, (_, error) in _ENDPOINT_PATTERNS.items():
+        if name not in values:
+            raise Exception(error)
+
+    logger.debug("Cloud games category id: {}".format(values["category_id"]))
+    logger.debug("Game list URL (not modified): {}".format(values["games_list_url"]))
+    logger.debug("Game information URL (not modified): {}".format(values["game_information_url"]))
+    logger.debug("MS CV: {}".format(values["ms_cv"]))
+    return XCloudEndpoints(**values)
+
+
+def get_endpoints() -> XCloudEndpoints:
+    """Get the parameters of the catalog endpoints
+
+    The populate script is requested at most once per SCRIPT_MAX_AGE, and only scanned again when
+    its ETag (or its content when it has none) changes: the endpoints found by the previous runs
+    are kept by the product store.
+
+    Returns:
+        XCloudEndpoints: parameters of the endpoints
+    """
+    global _script_endpoints
+
+    # the fetches of the other markets wait for the script instead of requesting it too
+    with _script_lock:
+        if _script_endpoints is not None and time.time() - _script_endpoints[1] < SCRIPT_MAX_AGE:
+            return _script_endpoints[2]
+
+        r = http_client.get(XCLOUD_SCRIPT_URL, use_cache=True)
+        if(r.status_code != 200):
+            raise Exception("XCloud fetch populate script failed")
+
+        key = r.headers.get("ETag") or hashlib.sha256(r.content).hexdigest()
+        if _script_endpoints is not None and _script_endpoints[0] == key:
+            endpoints = _script_endpoints[2]
+        else:
+            store = _product_store
+            endpoints = store.get_endpoints(key)
+            if endpoints is None:
+                endpoints = extract_endpoints(r.text)
+                store.put_endpoints(key, endpoints)
+        _script_endpoints = (key, time.time(), endpoints)
+        return endpoints
+
+
+def clear_endpoints():
+    """Forget the last populate script, so that it is requested and scanned again"""
+    global _script_endpoints
+
+    with _script_lock:
+        _script_endpoints = None
+
+
+def fetch_xcloud(language: str = "en-US", market: str = "US") -> List[XCloudGame]:
+    endpoints = get_endpoints()
+
+    # add parameters to the URL
+    params = {'id': endpoints.category_id, 'language': language, 'market': market}
+    games_list_url = replace_url_query_string(endpoints.games_list_url, params)
+    logger.debug("Game list URL (with real parameters): {}"
+                 .format(games_list_url))
+
+    r = http_client.get(games_list_url)
+    if(r.status_code != 200):
+        raise Exception("Geforce fetch game id list failed")
+    game_list_data = r.json()
+
+    game_ids: list[str] = []
+    for game in game_list_data:
+        if "id" in game:
+            game_ids.append(game["id"])
+    logger.debug("Found {} game IDs".format(len(game_ids)))
+
+    products = fetch_xcloud_products(endpoints.game_information_url, endpoints.ms_cv, game_ids, language, market,
+                                     _batch_size, _max_workers)
+
+    game_list: list[XCloudGame] = list()
+    for game_id in game_ids:
+        # pop to ignore ids listed multiple times
+        game = products.pop(game_id, None)
+        if game is not None:
+            game_list.append(game)
 
     return game_list
 
 
 if __name__ == "__main__":
+    configure_logging("DEBUG")
+
     game_list = fetch_xcloud()
 
     for game in game_list:
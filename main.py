@@ -1,202 +1,373 @@
 
 import argparse
 import logging
-from typing import Optional
+import os
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from changelog import ADDED, CHANGED, REMOVED, Snapshot, diff_snapshots, write_changelog
+from catalog import DEFAULT_FUZZY_THRESHOLD, CatalogIndex, CrossCloudGame, fuzzy_merge, merge_games  # noqa: F401
+from providers import Provider, provider_names, registered_providers, select_providers
+from utils import http_client, metrics, parse_pool
+from utils.daemon_pool import DaemonThreadPool
+from utils.http_cache import DEFAULT_CACHE_DIR, DEFAULT_TTL, ResponseCache
+from utils.logging_config import configure_logging
+from utils.normalize_key import normalize_key  # noqa: F401
+from writers import FAILED, STALE, WRITERS, Row, mark_column, open_writer, read_rows, write_batches
+
+# catalog_store, regions, server, snapshots and utils.replay are only imported by the options using them
+if TYPE_CHECKING:
+    from snapshots import ProviderSnapshotStore
 
-import coloredlogs
-
-from fetchers.geforce_now import GeforceGame, fetch_geforce_now
-from fetchers.google_stadia import StadiaGame, fetch_stadia
-from fetchers.playstation_now import PlaystationNowGame, fetch_playstation_now
-from fetchers.xcloud import XCloudGame, fetch_xcloud
-
-# suppress overly verbose logs from libraries that aren't helpful
-logging.getLogger("requests").setLevel(logging.WARNING)
-logging.getLogger("urllib3").setLevel(logging.WARNING)
-
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("Main")
-logger.setLevel("INFO")
-coloredlogs.install(level='INFO', logger=logger,
-                    fmt='%(name)s %(asctime)s %(levelname)s %(message)s')
-
-
-class CrossCloudGame:
-    def __init__(self, name: str,
-                 geforce_game: Optional[GeforceGame],
-                 psnow_game: Optional[PlaystationNowGame],
-                 stadia_game: Optional[StadiaGame],
-                 xcloud_game: Optional[XCloudGame],
-                 ):
-        self.name = name
-        self.geforce_game = geforce_game
-        self.stadia_game = stadia_game
-        self.psnow_game = psnow_game
-        self.xcloud_game = xcloud_game
-
-    def nb_cloud(self) -> int:
-        nb = 0
-        if self.geforce_game is not None:
-            nb += 1
-        if self.stadia_game is not None:
-            nb += 1
-        if self.psnow_game is not None:
-            nb += 1
-        if self.xcloud_game is not None:
-            nb += 1
-        return nb
-
-
-def normalize_key(name: str):
-    key = name
-    name_remapping = {
-        "Trine 4": "Trine 4: The Nightmare Prince",
-        "Cities: Skylines - Xbox One Edition": "Cities: Skylines",
-        "Wolfenstein Young Blood": "Wolfenstein Youngblood",
-        "ARK: Survival Evolved Explorer's Edition": "ARK: Survival Evolved",
-        "Totally Accurate Battle Simulator (Game Preview)": "Totally Accurate Battle Simulator",
-        "Tom Clancy's Rainbow Six® Siege Deluxe Edition": "Tom Clancy's Rainbow Six® Siege"
-    }
-
-    if name in name_remapping:
-        key = name_remapping[name]
-
-    key = key.lower().replace("™", "").replace("®", "").replace("©", "").replace(
-        ":", "").replace("'", "").replace("’", "").replace("_", " ")
-
-    return key
-
-
-def main(output_file: str = None):
-
-    try:
-        geforce_games = fetch_geforce_now()
-        logger.info("Geforce: {} Games".format(len(geforce_games)))
-    except Exception as e:
-        logger.error("Cannot get Geforce games:")
-        logger.error(e)
-        exit(1)
-
-    try:
-        stadia_games = fetch_stadia()
-        logger.info("Stadia: {} Games".format(len(stadia_games)))
-    except Exception as e:
-        logger.error("Cannot get Stadia games:")
-        logger.error(e)
-        exit(1)
 
-    try:
-        psnow_games = fetch_playstation_now()
-        logger.info("Playstation Now: {} Games".format(len(stadia_games)))
-    except Exception as e:
-        logger.error("Cannot get Playstation Now games:")
-        logger.error(e)
+# maximum time (in seconds) given to each provider to send its games
+DEFAULT_FETCH_TIMEOUT = 120.0
+DEFAULT_XCLOUD_STORE = os.path.join(".cache", "xcloud_products.json")
+# same as fetchers.xcloud.DEFAULT_BATCH_SIZE and DEFAULT_MAX_WORKERS, shown in the help
+DEFAULT_XCLOUD_BATCH_SIZE = 100
+DEFAULT_XCLOUD_WORKERS = 4
+# engines of fetchers.playstation_now, which is only imported when PS Now is fetched
+PSNOW_PARSER_ENGINES = ("stream", "soup")
+# same as catalog_store.DEFAULT_CATALOG_DB and server.DEFAULT_PORT, shown in the help
+DEFAULT_CATALOG_DB = os.path.join(".cache", "catalog.sqlite")
+DEFAULT_PORT = 8080
+
+
+def _fetch(provider: Provider) -> List:
+    with metrics.timer("stage_seconds", stage="fetch", provider=provider.name):
+        return provider.fetch()
+
+
+def _fallback(provider: Provider, snapshots: Optional["ProviderSnapshotStore"], statuses: Dict[str, str]) -> List:
+    snapshot = snapshots.load(provider.name) if snapshots is not None else None
+    if snapshot is None:
+        statuses[provider.name] = FAILED
+        return []
+    games, age = snapshot
+    logger.warning("Using the last {} games, fetched {:.1f} hours ago".format(provider.label, age / 3600))
+    statuses[provider.name] = STALE
+    metrics.set_gauge("provider_snapshot_age_seconds", age, provider=provider.name)
+    return games
+
+
+def fetch_all(timeout: float = DEFAULT_FETCH_TIMEOUT, providers: Optional[Sequence[Provider]] = None,
+              snapshots: Optional["ProviderSnapshotStore"] = None) -> Tuple[Dict[str, List], Dict[str, str]]:
+    """Run the provider fetchers concurrently
+
+    A provider that fails or does not answer within the timeout is logged and gets
+    its last fetched games from the snapshots, or an empty list, so it does not
+    prevent the other ones from being merged.
+
+    Args:
+        timeout (float): maximum time in seconds given to each provider
+        providers (Optional[Sequence[Provider]]): fetched providers, None for all providers
+        snapshots (Optional[ProviderSnapshotStore]): last games of each provider, updated by successful fetches
+
+    Returns:
+        Tuple[Dict[str, List], Dict[str, str]]: games of each provider, by provider name, and status
+            (STALE: taken from the snapshots, FAILED: unknown) of the providers that were not fetched
+    """
+    results: Dict[str, List] = dict()
+    statuses: Dict[str, str] = dict()
+    providers = registered_providers() if providers is None else providers
+    if len(providers) == 0:
+        return results, statuses
+    # daemon threads: a provider which timed out does not keep the run alive
+    executor = DaemonThreadPool(max_workers=len(providers), thread_name_prefix="fetch")
+    futures = [(provider, executor.submit(_fetch, provider)) for provider in providers]
+
+    # providers run in parallel: each timeout is counted from the start of the run
+    start = time.monotonic()
+    for provider, future in futures:
+        remaining = max(0.0, timeout - (time.monotonic() - start))
+        try:
+            results[provider.name] = future.result(timeout=remaining)
+            logger.info("{}: {} Games".format(provider.label, len(results[provider.name])))
+            if snapshots is not None and len(results[provider.name]) > 0:
+                snapshots.save(provider.name, results[provider.name])
+        except FutureTimeoutError:
+            logger.error("Cannot get {} games: no answer after {} seconds".format(provider.label, timeout))
+            results[provider.name] = _fallback(provider, snapshots, statuses)
+            metrics.increment("provider_errors_total", provider=provider.name, error="timeout")
+        except Exception as e:
+            logger.error("Cannot get {} games:".format(provider.label))
+            logger.error(e)
+            results[provider.name] = _fallback(provider, snapshots, statuses)
+            metrics.increment("provider_errors_total", provider=provider.name, error=type(e).__name__)
+        metrics.set_gauge("games", len(results[provider.name]), provider=provider.name)
+        metrics.set_gauge("provider_stale", int(statuses.get(provider.name) == STALE), provider=provider.name)
+    executor.shutdown(wait=False)
+
+    return results, statuses
+
+
+def main(output_file: str = None, timeout: float = DEFAULT_FETCH_TIMEOUT,
+         fuzzy_threshold: float = None, fuzzy_audit_file: str = None, output_format: str = None,
+         previous_file: str = None, changelog_file: str = None, catalog_db: str = None,
+         providers: Optional[Sequence[Provider]] = None, snapshots: Optional["ProviderSnapshotStore"] = None):
+
+    providers = registered_providers() if providers is None else providers
+    results, statuses = fetch_all(timeout, providers, snapshots)
+    if all(len(games) == 0 for games in results.values()):
+        logger.error("Cannot get games from any provider")
         exit(1)
 
-    try:
-        xcloud_games = fetch_xcloud()
-        logger.info("XCloud: {} Games".format(len(xcloud_games)))
-    except Exception as e:
-        logger.error("Cannot get XCloud games:")
-        logger.error(e)
-        exit(1)
-
-    merged_games: dict[str, CrossCloudGame] = dict()
-
-    for game in geforce_games:
-        game_name = game.name
-        key = normalize_key(game_name)
-
-        if key not in merged_games:
-            merged_games[key] = CrossCloudGame(name=game_name, geforce_game=game, psnow_game=None,
-                                               stadia_game=None, xcloud_game=None)
-        else:
-            merged_games[key].geforce_game = game
-
-    for game in psnow_games:
-        game_name = game.name
-        key = normalize_key(game_name)
-
-        if key not in merged_games:
-            merged_games[key] = CrossCloudGame(name=game_name, geforce_game=None, psnow_game=game,
-                                               stadia_game=None, xcloud_game=None)
-        else:
-            merged_games[key].xcloud_game = game
-
-    for game in stadia_games:
-        game_name = game.name
-        key = normalize_key(game_name)
-
-        if key not in merged_games:
-            merged_games[key] = CrossCloudGame(name=game_name, geforce_game=None, psnow_game=None,
-                                               stadia_game=game, xcloud_game=None)
-        else:
-            merged_games[key].stadia_game = game
-
-    for game in xcloud_games:
-        game_name = game.name
-        key = normalize_key(game_name)
+    with metrics.timer("stage_seconds", stage="merge"):
+        merged_games = merge_games([provider.name for provider in providers], results)
+
+    if fuzzy_threshold is not None:
+        with metrics.timer("stage_seconds", stage="fuzzy_merge"):
+            merges = fuzzy_merge(merged_games, fuzzy_threshold)
+        logger.info("Fuzzy matching: {} games merged".format(len(merges)))
+        for kept_key, merged_key, similarity in merges:
+            logger.debug("Merged \"{}\" into \"{}\" ({:.2f})".format(merged_key, kept_key, similarity))
+        if fuzzy_audit_file is not None:
+            with open(fuzzy_audit_file, "w", encoding="utf-8") as audit:
+                audit.write("Kept;Merged;Similarity\n")
+                for kept_key, merged_key, similarity in merges:
+                    audit.write('"{}";"{}";{:.3f}\n'.format(kept_key, merged_key, similarity))
+
+    if catalog_db is not None:
+        from catalog_store import CatalogStore
+        with metrics.timer("stage_seconds", stage="catalog_db"), CatalogStore(catalog_db) as catalog_store:
+            catalog_store.save(merged_games, [provider.name for provider in providers], statuses)
+
+    with metrics.timer("stage_seconds", stage="sort"):
+        catalog_index = CatalogIndex(merged_games)
+
+    # the display of each game is only built when it is logged
+    show_games = logger.isEnabledFor(logging.DEBUG)
+
+    def rows() -> Iterator[Row]:
+        for _, game in catalog_index.items():
+            if show_games:
+                display = " ".join(provider.column if slot is not None else "".ljust(len(provider.column))
+                                   for slot, provider in zip(game.games, providers))
+                logger.debug("{} {}".format(game.name.ljust(70), display))
+            yield game.name, [slot is not None for slot in game.games]
+
+    # providers whose games come from a snapshot, or are unknown, are marked in the header
+    columns = [mark_column(provider.column, statuses.get(provider.name)) for provider in providers]
+    _write_output(output_file, output_format, columns, rows(), show_games, previous_file, changelog_file)
+    metrics.set_gauge("games", len(catalog_index), provider="all")
+    for min_providers in range(2, len(providers) + 1):
+        metrics.set_gauge("games_min_providers", catalog_index.count_with_min_providers(min_providers),
+                          min_providers=min_providers)
+    logger.info("Total of unique games: {}".format(len(catalog_index)))
+
+
+def _write_output(output_file: Optional[str], output_format: Optional[str], columns: List[str],
+                  rows: Iterable[Row], consume_rows: bool,
+                  previous_file: Optional[str] = None, changelog_file: Optional[str] = None):
+    previous = None
+    if changelog_file is not None:
+        # the previous output is read first, as it may be overwritten by the new one
+        with metrics.timer("stage_seconds", stage="read_previous"):
+            previous = _read_snapshot(previous_file)
+        rows = list(rows)
 
-        if key not in merged_games:
-            merged_games[key] = CrossCloudGame(name=game_name, geforce_game=None, psnow_game=None,
-                                               stadia_game=None, xcloud_game=game)
-        else:
-            merged_games[key].xcloud_game = game
-
-    f = None
     if output_file is not None:
-        f = open(output_file, "w", encoding="utf-8-sig")
-        f.write('Name;Geforce;PSNow;Stadia;XCloud\n')
-
-    games_ordered = sorted(list(merged_games.values()), key=lambda x: x.name)
-    for game in games_ordered:
-        providers = ""
-        if game.geforce_game is not None:
-            providers += "Geforce"
-        else:
-            providers += "".ljust(7)
-
-        providers += " "
-        if game.psnow_game is not None:
-            providers += "PSNow"
-        else:
-            providers += "".ljust(5)
+        with metrics.timer("stage_seconds", stage="write"), open_writer(output_file, columns, output_format) as writer:
+            write_batches(writer, rows)
+        logger.info("Output file generated: {}".format(output_file))
+    elif consume_rows:
+        for _ in rows:
+            pass
+
+    if previous is not None:
+        with metrics.timer("stage_seconds", stage="changelog"):
+            counts = write_changelog(changelog_file, diff_snapshots(previous, Snapshot(columns, rows)))
+        for change, count in counts.items():
+            metrics.set_gauge("changelog_games", count, change=change)
+        logger.info("Changelog generated: {} ({} added, {} removed, {} changed)".format(
+            changelog_file, counts[ADDED], counts[REMOVED], counts[CHANGED]))
+
+
+def _read_snapshot(previous_file: Optional[str]) -> Snapshot:
+    if previous_file is None or not os.path.exists(previous_file):
+        logger.warning("No previous output to compare with: every game is added")
+        return Snapshot([], [])
+    columns, rows = read_rows(previous_file)
+    snapshot = Snapshot(columns, rows)
+    logger.info("Previous output: {} games".format(len(snapshot)))
+    return snapshot
+
+
+def main_regions(region_codes: List[str], output_file: str = None, max_workers: Optional[int] = None,
+                 output_format: str = None, previous_file: str = None, changelog_file: str = None,
+                 providers: Optional[Sequence[Provider]] = None, snapshots: Optional["ProviderSnapshotStore"] = None,
+                 timeout: float = DEFAULT_FETCH_TIMEOUT):
+
+    from regions import DEFAULT_MAX_WORKERS, fetch_regions
+
+    providers = registered_providers() if providers is None else providers
+    max_workers = DEFAULT_MAX_WORKERS if max_workers is None else max_workers
+
+    with metrics.timer("stage_seconds", stage="fetch_regions"):
+        merged_games, statuses = fetch_regions(region_codes, providers, max_workers, snapshots, timeout)
+    if len(merged_games) == 0:
+        logger.error("Cannot get games from any provider")
+        exit(1)
 
-        providers += " "
-        if game.stadia_game is not None:
-            providers += "Stadia"
-        else:
-            providers += "".ljust(6)
+    catalog_index = CatalogIndex(merged_games)
+    cells = [(region_index, provider_index)
+             for region_index in range(len(region_codes)) for provider_index in range(len(providers))]
+    rows = ((game.name, [game.has(*cell) for cell in cells]) for _, game in catalog_index.items())
 
-        providers += " "
-        if game.xcloud_game is not None:
-            providers += ("Xcloud")
-        else:
-            providers += "".ljust(6)
-
-        to_show = "{} {}".format(game.name.ljust(70), providers)
-        logger.debug(to_show)
-
-        if f is not None:
-            f.write(
-                '"{}";{};{};{};{}\n'
-                .format(game.name,
-                        game.geforce_game is not None,
-                        game.psnow_game is not None,
-                        game.stadia_game is not None,
-                        game.xcloud_game is not None,
-                        )
-            )
-
-    logger.info("Total of unique games: {}".format(len(games_ordered)))
-    if f is not None:
-        logger.info("Output file generated: {}".format(output_file))
-        f.close()
+    columns = [mark_column("{} {}".format(code, provider.column), statuses.get((code, provider.name)))
+               for code in region_codes for provider in providers]
+    _write_output(output_file, output_format, columns, rows, False, previous_file, changelog_file)
+    metrics.set_gauge("games", len(catalog_index), provider="all")
+    logger.info("Total of unique games: {}".format(len(catalog_index)))
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("-o", "--output", type=str, default="output.csv", help="output file")
+    parser.add_argument("-f", "--format", choices=list(WRITERS), default=None,
+                        help="output format, guessed from the output file extension by default")
+    parser.add_argument("--previous", type=str, default=None,
+                        help="output of a previous run, compared with the new one for --changelog")
+    parser.add_argument("--changelog", type=str, default=None,
+                        help="JSON Lines file listing the games added, removed or changed since --previous")
+    parser.add_argument("--catalog-db", type=str, nargs="?", const=DEFAULT_CATALOG_DB, default=None,
+                        help="also save the games in a SQLite database queried by catalog_store.py (default: {})"
+                        .format(DEFAULT_CATALOG_DB))
+    parser.add_argument("-t", "--timeout", type=float, default=DEFAULT_FETCH_TIMEOUT,
+                        help="maximum time in seconds given to each provider (to all fetches with --regions)")
+    parser.add_argument("--http-timeout", type=float, default=http_client.DEFAULT_TIMEOUT[1],
+                        help="timeout in seconds of each HTTP request")
+    parser.add_argument("--retries", type=int, default=http_client.DEFAULT_RETRIES,
+                        help="maximum number of retries of a failed HTTP request")
+    parser.add_argument("--cache-dir", type=str, default=DEFAULT_CACHE_DIR, help="HTTP cache directory")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL,
+                        help="time in seconds after which a cached response is downloaded again")
+    parser.add_argument("--xcloud-store", type=str, default=DEFAULT_XCLOUD_STORE,
+                        help="file keeping the XCloud products (and endpoints) resolved by previous runs")
+    parser.add_argument("--xcloud-batch-size", type=int, default=DEFAULT_XCLOUD_BATCH_SIZE, metavar="N",
+                        help="maximum number of XCloud products requested at once")
+    parser.add_argument("--xcloud-workers", type=int, default=DEFAULT_XCLOUD_WORKERS, metavar="N",
+                        help="maximum number of concurrent requests of XCloud products")
+    parser.add_argument("--psnow-parser", choices=PSNOW_PARSER_ENGINES, default=PSNOW_PARSER_ENGINES[0],
+                        help="engine used to parse the PS Now games page")
+    parser.add_argument("--fuzzy", nargs="?", type=float, const=DEFAULT_FUZZY_THRESHOLD, default=None,
+                        metavar="THRESHOLD",
+                        help="also merge games with similar names (default similarity: {})"
+                        .format(DEFAULT_FUZZY_THRESHOLD))
+    parser.add_argument("--fuzzy-audit", type=str, default=None, help="file listing the games merged by --fuzzy")
+    parser.add_argument("--regions", type=str, default=None,
+                        help="comma separated regions to fetch (i.e. US,FR,JP), or \"all\"; "
+                        "the output then has one column by region and provider")
+    parser.add_argument("--max-workers", type=int, default=None,
+                        help="maximum number of concurrent fetches with --regions")
+    parser.add_argument("--parse-workers", type=int, default=0, metavar="N",
+                        help="parse the PS Now and Geforce payloads in N processes (default: in the fetching threads)")
+    parser.add_argument("--no-cache", action="store_true", help="do not use the HTTP cache nor the XCloud store")
+    parser.add_argument("-p", "--providers", type=str, default=None,
+                        help="comma separated providers to fetch ({}), all by default".format(
+                            ",".join(provider_names())))
+    parser.add_argument("-v", "--verbose", action="store_true", help="show debug logs")
+    parser.add_argument("--metrics-json", type=str, default=None,
+                        help="JSON report of the run: timings by stage and provider, HTTP requests, memory")
+    parser.add_argument("--metrics-prom", type=str, default=None,
+                        help="metrics of the run in the Prometheus text format (i.e. for a textfile collector)")
+    parser.add_argument("--serve", type=int, nargs="?", const=DEFAULT_PORT, default=None, metavar="PORT",
+                        help="keep the games in memory, refresh each provider in the background and answer queries "
+                        "over HTTP (default port: {})".format(DEFAULT_PORT))
+    parser.add_argument("--host", type=str, default=None, help="address listened by --serve")
+    parser.add_argument("--refresh", type=str, default=None, metavar="PROVIDER=SECONDS,...",
+                        help="time between two fetches of each provider with --serve (default: 6 hours, "
+                        "1 hour for Geforce)")
+    parser.add_argument("--snapshot-dir", type=str, default=None,
+                        help="directory keeping the last games of each provider, used when a provider fails")
+    parser.add_argument("--snapshot-max-age", type=float, default=None,
+                        help="maximum age in seconds of the games used when a provider fails")
+    parser.add_argument("--no-snapshots", action="store_true",
+                        help="write no games for a provider that fails, instead of its last games")
+    recording = parser.add_mutually_exclusive_group()
+    recording.add_argument("--record", type=str, default=None, metavar="DIRECTORY",
+                           help="save every HTTP response in a directory, to replay the run with --replay")
+    recording.add_argument("--replay", type=str, default=None, metavar="DIRECTORY",
+                           help="answer HTTP requests with the responses saved by --record, without network access")
     args = parser.parse_args()
 
-    main(args.output)
+    configure_logging("DEBUG" if args.verbose else "INFO")
+
+    selected_names = None
+    if args.providers is not None:
+        selected_names = [name.strip().lower() for name in args.providers.split(",") if name.strip() != ""]
+        for name in selected_names:
+            if name not in provider_names():
+                parser.error("unknown provider: {}".format(name))
+    providers = select_providers(selected_names)
+    selected_names = [provider.name for provider in providers]
+
+    refresh_intervals: Dict[str, float] = dict()
+    for item in (args.refresh or "").split(","):
+        if item.strip() == "":
+            continue
+        name, _, seconds = item.partition("=")
+        if name.strip() not in selected_names:
+            parser.error("unknown provider in --refresh: {}".format(name))
+        try:
+            refresh_intervals[name.strip()] = float(seconds)
+        except ValueError:
+            parser.error("invalid --refresh interval: {}".format(item))
+
+    region_codes = None
+    if args.regions is not None:
+        from regions import REGIONS
+        region_codes = list(REGIONS) if args.regions == "all" else args.regions.upper().split(",")
+        for code in region_codes:
+            if code not in REGIONS:
+                parser.error("unknown region: {}".format(code))
+    if args.xcloud_batch_size < 1 or args.xcloud_workers < 1:
+        parser.error("--xcloud-batch-size and --xcloud-workers must be at least 1")
+
+    cache = None if args.no_cache else ResponseCache(args.cache_dir, ttl=args.cache_ttl)
+    # only the fetchers of the selected providers are imported
+    if "xcloud" in selected_names:
+        from fetchers.xcloud import configure_batches, configure_product_store
+        configure_product_store(None if args.no_cache else args.xcloud_store)
+        configure_batches(args.xcloud_batch_size, args.xcloud_workers)
+    if "psnow" in selected_names:
+        from fetchers.playstation_now import configure_parser
+        configure_parser(args.psnow_parser)
+    transport = None
+    if args.record is not None:
+        from utils.replay import RecordingAdapter
+        transport = RecordingAdapter(args.record, cache, max_retries=http_client.build_retry(args.retries))
+    elif args.replay is not None:
+        from utils.replay import ReplayAdapter
+        transport = ReplayAdapter.load(args.replay)
+    http_client.configure(timeout=(http_client.DEFAULT_TIMEOUT[0], args.http_timeout), retries=args.retries,
+                          cache=cache, transport=transport)
+    parse_pool.configure(args.parse_workers)
+
+    snapshots = None
+    if not args.no_snapshots:
+        from snapshots import DEFAULT_MAX_AGE, DEFAULT_SNAPSHOT_DIR, ProviderSnapshotStore  # noqa: F811
+        snapshots = ProviderSnapshotStore(args.snapshot_dir or DEFAULT_SNAPSHOT_DIR,
+                                          DEFAULT_MAX_AGE if args.snapshot_max_age is None else args.snapshot_max_age)
+
+    if args.serve is not None:
+        from server import DEFAULT_HOST, CatalogServer, serve
+        serve(CatalogServer(providers, refresh_intervals, fuzzy_threshold=args.fuzzy, snapshots=snapshots),
+              args.host or DEFAULT_HOST, args.serve)
+        exit(0)
+
+    try:
+        if region_codes is not None:
+            main_regions(region_codes, args.output, args.max_workers, args.format, args.previous, args.changelog,
+                         providers, snapshots, args.timeout)
+        else:
+            main(args.output, args.timeout, args.fuzzy, args.fuzzy_audit, args.format, args.previous,
+                 args.changelog, args.catalog_db, providers, snapshots)
+    finally:
+        # also reported when no provider answered, to alert on it
+        if args.metrics_json is not None:
+            metrics.write_json_report(args.metrics_json)
+        if args.metrics_prom is not None:
+            metrics.write_prometheus(args.metrics_prom)
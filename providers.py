@@ -0,0 +1,176 @@
+import importlib
+import logging
+import threading
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger("Providers")
+
+# entry point group of the providers of other packages, i.e. in their setup.cfg:
+# [options.entry_points]
+# cloud_gaming_game_list.providers =
+#     shadow = shadow_provider:PROVIDER
+ENTRY_POINT_GROUP = "cloud_gaming_game_list.providers"
+
+
+class Provider:
+    def __init__(self, name: str, label: str, column: str, fetch: Union[str, Callable[..., List]]):
+        """Describe a provider
+
+        Args:
+            name (str): short identifier, i.e. "geforce"
+            label (str): name shown in logs
+            column (str): name of the column in the output file
+            fetch (str or Callable): fetcher returning the games of the provider, or its
+                "module:function" path, imported on the first fetch
+        """
+        self.name = name
+        self.label = label
+        self.column = column
+        self._fetch = fetch
+
+    def load(self) -> Callable[..., List]:
+        """Import the fetcher of the provider
+
+        Returns:
+            Callable[..., List]: fetcher
+        """
+        if isinstance(self._fetch, str):
+            module_name, function_name = self._fetch.split(":")
+            self._fetch = getattr(importlib.import_module(module_name), function_name)
+        return self._fetch
+
+    def fetch(self, **kwargs) -> List:
+        """Fetch the games of the provider
+
+        A catalog is never empty: a fetcher finding no games (i.e. after a change of the page
+        layout) fails, so that the last games of the provider are used instead.
+
+        Args:
+            **kwargs: arguments of the fetcher, i.e. its locale
+
+        Raises:
+            Exception: the fetcher failed, or found no games
+
+        Returns:
+            List: games of the provider
+        """
+        games = self.load()(**kwargs)
+        if len(games) == 0:
+            raise Exception("No {} games found".format(self.label))
+        return games
+
+
+# fetcher modules are only imported when their provider is fetched
+BUILTIN_PROVIDERS: List[Provider] = [
+    Provider("geforce", "Geforce", "Geforce", "fetchers.geforce_now:fetch_geforce_now"),
+    Provider("psnow", "Playstation Now", "PSNow", "fetchers.playstation_now:fetch_playstation_now"),
+    Provider("stadia", "Stadia", "Stadia", "fetchers.google_stadia:fetch_stadia"),
+    Provider("xcloud", "XCloud", "XCloud", "fetchers.xcloud:fetch_xcloud"),
+]
+
+
+def _entry_points() -> List:
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return []
+
+    all_entry_points = entry_points()
+    # entry_points() is only selectable since Python 3.10
+    if hasattr(all_entry_points, "select"):
+        return list(all_entry_points.select(group=ENTRY_POINT_GROUP))
+    return list(all_entry_points.get(ENTRY_POINT_GROUP, []))
+
+
+def load_plugin_providers() -> List[Provider]:
+    """Load the providers registered by other packages with the entry point group
+
+    An entry point gives a Provider, or a fetcher which is then shown and written under
+    the name of the entry point. Only the module of the entry point is imported here, so
+    it should not import the fetcher itself, i.e. by giving a "module:function" path.
+
+    Returns:
+        List[Provider]: providers of other packages, sorted by name
+    """
+    plugins: List[Provider] = []
+    for entry_point in sorted(_entry_points(), key=lambda entry_point: entry_point.name):
+        try:
+            loaded = entry_point.load()
+        except Exception as e:
+            logger.error("Cannot load provider {}: {}".format(entry_point.name, e))
+            continue
+        if isinstance(loaded, Provider):
+            plugins.append(loaded)
+        elif callable(loaded):
+            plugins.append(Provider(entry_point.name, entry_point.name, entry_point.name, loaded))
+        else:
+            logger.error("Provider {} is neither a Provider nor a fetcher".format(entry_point.name))
+    return plugins
+
+
+_registry_lock = threading.Lock()
+_registry: Optional[List[Provider]] = None
+
+
+def registered_providers() -> List[Provider]:
+    """Get all providers: the built-in ones, then the ones of other packages
+
+    The entry points are only scanned on the first call, so that importing this module stays cheap.
+
+    Returns:
+        List[Provider]: providers, in the order of the columns of the output file
+    """
+    global _registry
+
+    with _registry_lock:
+        if _registry is None:
+            providers = list(BUILTIN_PROVIDERS)
+            names = set(provider.name for provider in providers)
+            for plugin in load_plugin_providers():
+                if plugin.name in names:
+                    logger.error("Provider {} is already registered".format(plugin.name))
+                    continue
+                names.add(plugin.name)
+                providers.append(plugin)
+            _registry = providers
+        return _registry
+
+
+def __getattr__(name: str):
+    # PROVIDERS (the order of the providers is the order of the columns of the output file),
+    # PROVIDER_NAMES and PROVIDERS_BY_NAME are built from the registry on first use
+    if name == "PROVIDERS":
+        return registered_providers()
+    if name == "PROVIDER_NAMES":
+        return provider_names()
+    if name == "PROVIDERS_BY_NAME":
+        return {provider.name: provider for provider in registered_providers()}
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def provider_names() -> Tuple[str, ...]:
+    """Get the names of all providers, in the order of the columns of the output file
+
+    Returns:
+        Tuple[str, ...]: provider names
+    """
+    return tuple(provider.name for provider in registered_providers())
+
+
+def select_providers(names: Optional[Sequence[str]]) -> List[Provider]:
+    """Get the providers of a selection, in the order of the output columns
+
+    Args:
+        names (Optional[Sequence[str]]): provider names, None for all providers
+
+    Returns:
+        List[Provider]: selected providers
+    """
+    providers = registered_providers()
+    if names is None:
+        return list(providers)
+    known_names = provider_names()
+    for name in names:
+        if name not in known_names:
+            raise Exception("Unknown provider: {} (expected {})".format(name, ",".join(known_names)))
+    return [provider for provider in providers if provider.name in names]
@@ -0,0 +1,198 @@
+import logging
+from concurrent.futures import Future, as_completed
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from providers import Provider, registered_providers
+from snapshots import ProviderSnapshotStore
+from utils.daemon_pool import DaemonThreadPool
+from utils.normalize_key import normalize_keys
+from writers import FAILED, STALE
+
+logger = logging.getLogger("Regions")
+
+DEFAULT_MAX_WORKERS = 8
+
+
+class Region:
+    def __init__(self, code: str, params: Dict[str, Dict[str, str]]):
+        self.code = code
+        # arguments of the fetcher of each provider available in the region
+        self.params = params
+
+
+def _region(code: str, geforce: Optional[str], psnow: Optional[str], stadia: Optional[str], market: str) -> Region:
+    params: Dict[str, Dict[str, str]] = dict()
+    if geforce is not None:
+        params["geforce"] = {"locale": geforce}
+    if psnow is not None:
+        params["psnow"] = {"locale": psnow}
+    if stadia is not None:
+        params["stadia"] = {"country": stadia}
+    # xCloud titles are requested in english so that games match between regions,
+    # the market gives the availability
+    params["xcloud"] = {"language": "en-US", "market": market}
+    return Region(code, params)
+
+
+REGIONS: Dict[str, Region] = {region.code: region for region in [
+    _region("US", "en-US", "en-us", "us", "US"),
+    _region("CA", "en-US", "en-ca", "ca", "CA"),
+    _region("GB", "en-GB", "en-gb", "gb", "GB"),
+    _region("IE", "en-GB", "en-ie", "ie", "IE"),
+    _region("FR", "fr-FR", "fr-fr", "fr", "FR"),
+    _region("BE", "fr-FR", "fr-be", "be", "BE"),
+    _region("NL", "nl-NL", "nl-nl", "nl", "NL"),
+    _region("DE", "de-DE", "de-de", "de", "DE"),
+    _region("AT", "de-DE", "de-at", "at", "AT"),
+    _region("CH", "de-DE", "de-ch", "ch", "CH"),
+    _region("IT", "it-IT", "it-it", "it", "IT"),
+    _region("ES", "es-ES", "es-es", "es", "ES"),
+    _region("PT", "pt-PT", "pt-pt", "pt", "PT"),
+    _region("SE", "sv-SE", "sv-se", "se", "SE"),
+    _region("DK", "da-DK", "da-dk", "dk", "DK"),
+    _region("NO", "nb-NO", "no-no", "no", "NO"),
+    _region("FI", "fi-FI", "fi-fi", "fi", "FI"),
+    _region("PL", "pl-PL", None, "pl", "PL"),
+    _region("JP", "ja-JP", "ja-jp", None, "JP"),
+    _region("BR", "pt-BR", None, None, "BR"),
+]}
+
+
+class RegionalGame:
+    """A game merged from all providers of all regions
+
+    Availability is kept as one bitmask of providers by region, in the order of the regions.
+    """
+    __slots__ = ("name", "masks")
+
+    def __init__(self, name: str, nb_regions: int):
+        self.name = name
+        self.masks = [0] * nb_regions
+
+    def has(self, region_index: int, provider_index: int) -> bool:
+        return self.masks[region_index] >> provider_index & 1 == 1
+
+    def nb_cloud(self) -> int:
+        # providers having the game in at least one region
+        providers_mask = 0
+        for mask in self.masks:
+            providers_mask |= mask
+        return bin(providers_mask).count("1")
+
+
+def _task_key(provider: Provider, params: Dict[str, str]) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    return provider.name, tuple(sorted(params.items()))
+
+
+def _snapshot_id(task_key: Tuple[str, Tuple[Tuple[str, str], ...]]) -> str:
+    name, params = task_key
+    return " ".join([name] + ["{}={}".format(param, value) for param, value in params])
+
+
+def fetch_regions(region_codes: Sequence[str], providers: Optional[Sequence[Provider]] = None,
+                  max_workers: int = DEFAULT_MAX_WORKERS, snapshots: Optional[ProviderSnapshotStore] = None,
+                  timeout: Optional[float] = None) -> Tuple[Dict[str, RegionalGame], Dict[Tuple[str, str], str]]:
+    """Fetch the games of several regions and merge them in an availability matrix
+
+    Regions sharing the same fetcher arguments (i.e. the same Geforce locale) fetch them once,
+    and identical game lists are only merged once. Fetchers run concurrently, over the
+    connections of the shared HTTP session.
+
+    Args:
+        region_codes (Sequence[str]): codes of the regions, i.e. "US"
+        providers (Optional[Sequence[Provider]]): providers to fetch, None for all providers
+        max_workers (int): maximum number of concurrent fetches
+        snapshots (Optional[ProviderSnapshotStore]): last games of each fetch, used when it fails
+        timeout (Optional[float]): maximum time in seconds given to the fetches, counted from the start
+            of the run; a fetch without answer by then fails. None to wait for all fetches
+
+    Returns:
+        Tuple[Dict[str, RegionalGame], Dict[Tuple[str, str], str]]: merged games, by key, and the status
+            (STALE: taken from the snapshots, FAILED: unknown) of the (region code, provider name) not fetched
+    """
+    regions = [REGIONS[code] for code in region_codes]
+    providers = registered_providers() if providers is None else providers
+
+    # each distinct fetch is only done once
+    tasks: Dict[Tuple, Tuple[Provider, Dict[str, str]]] = dict()
+    for region in regions:
+        for provider in providers:
+            if provider.name in region.params:
+                params = region.params[provider.name]
+                tasks.setdefault(_task_key(provider, params), (provider, params))
+    logger.info("{} regions, {} distinct fetches".format(len(regions), len(tasks)))
+
+    results: Dict[Tuple, List] = dict()
+    task_statuses: Dict[Tuple, str] = dict()
+
+    def failed(task_key: Tuple, provider: Provider, params: Dict[str, str]):
+        results[task_key] = []
+        task_statuses[task_key] = FAILED
+        snapshot = snapshots.load(_snapshot_id(task_key)) if snapshots is not None else None
+        if snapshot is not None:
+            results[task_key], age = snapshot
+            task_statuses[task_key] = STALE
+            logger.warning("Using the last {} games {}, fetched {:.1f} hours ago"
+                           .format(provider.label, params, age / 3600))
+
+    def done(future: Future):
+        task_key, provider, params = futures[future]
+        try:
+            results[task_key] = future.result()
+            logger.info("{} {}: {} Games".format(provider.label, params, len(results[task_key])))
+            if snapshots is not None and len(results[task_key]) > 0:
+                snapshots.save(_snapshot_id(task_key), results[task_key])
+        except Exception as e:
+            logger.error("Cannot get {} games {}:".format(provider.label, params))
+            logger.error(e)
+            failed(task_key, provider, params)
+
+    # daemon threads: fetches which timed out do not keep the run alive
+    executor = DaemonThreadPool(max_workers=max_workers, thread_name_prefix="fetch-region")
+    futures = {executor.submit(provider.fetch, **params): (task_key, provider, params)
+               for task_key, (provider, params) in tasks.items()}
+    try:
+        for future in as_completed(futures, timeout=timeout):
+            done(future)
+    except FutureTimeoutError:
+        for future, (task_key, provider, params) in futures.items():
+            if task_key in results:
+                continue
+            if future.done():
+                done(future)
+            else:
+                logger.error("Cannot get {} games {}: no answer after {} seconds".format(provider.label, params,
+                                                                                         timeout))
+                failed(task_key, provider, params)
+    finally:
+        # fetches which did not start yet are not sent anymore
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    # regions often get the same games: compute the keys of each distinct game list once
+    payload_keys: Dict[Tuple[str, ...], List[Tuple[str, str]]] = dict()
+    keys_by_task: Dict[Tuple, List[Tuple[str, str]]] = dict()
+    for task_key, games in results.items():
+        names = tuple(game.name for game in games)
+        if names not in payload_keys:
+            payload_keys[names] = list(zip(normalize_keys(names), names))
+        keys_by_task[task_key] = payload_keys[names]
+    logger.info("{} distinct game lists".format(len(payload_keys)))
+
+    merged_games: Dict[str, RegionalGame] = dict()
+    for region_index, region in enumerate(regions):
+        for provider_index, provider in enumerate(providers):
+            if provider.name not in region.params:
+                continue
+            bit = 1 << provider_index
+            for key, name in keys_by_task[_task_key(provider, region.params[provider.name])]:
+                game = merged_games.get(key)
+                if game is None:
+                    game = merged_games[key] = RegionalGame(name, len(regions))
+                game.masks[region_index] |= bit
+
+    statuses = {(region.code, provider.name): task_statuses[_task_key(provider, region.params[provider.name])]
+                for region in regions for provider in providers
+                if provider.name in region.params
+                and _task_key(provider, region.params[provider.name]) in task_statuses}
+    return merged_games, statuses
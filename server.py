@@ -0,0 +1,301 @@
+import heapq
+import itertools
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional, Sequence
+from urllib.parse import parse_qs, unquote, urlparse
+
+from catalog import CatalogIndex, CrossCloudGame, fuzzy_merge, merge_games
+from providers import Provider
+from snapshots import ProviderSnapshotStore
+from utils import metrics
+from utils.normalize_key import normalize_key
+
+logger = logging.getLogger("Server")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+# time in seconds between two fetches of a provider
+DEFAULT_REFRESH_INTERVAL = 6 * 3600
+DEFAULT_REFRESH_INTERVALS = {
+    # Geforce statuses (maintenance, patching) change during the day
+    "geforce": 3600,
+}
+# time in seconds before fetching again a provider that failed
+DEFAULT_RETRY_INTERVAL = 300
+DEFAULT_LIMIT = 100
+
+
+class CatalogSnapshot:
+    """Merged games and their lookup indexes, never changed once built
+
+    A refresh builds a new snapshot, which replaces the previous one in a single assignment:
+    requests always read a complete snapshot without locking.
+    """
+
+    def __init__(self, provider_names: Sequence[str], merged_games: Dict[str, CrossCloudGame],
+                 updated_at: Dict[str, float], index: Optional[CatalogIndex] = None):
+        """Build the lookup indexes of merged games
+
+        Args:
+            provider_names (Sequence[str]): provider names, in the order of the slots of the games
+            merged_games (Dict[str, CrossCloudGame]): games by key
+            updated_at (Dict[str, float]): time of the last successful fetch of each provider
+            index (Optional[CatalogIndex]): games sorted by key, owned by the snapshot, None to sort them
+        """
+        self.provider_names = tuple(provider_names)
+        self.games = merged_games
+        # time of the last successful fetch of each provider
+        self.updated_at = dict(updated_at)
+        self.built_at = time.time()
+        self.index = CatalogIndex(merged_games, by_key=True) if index is None else index
+        self.games_by_mask: Dict[int, List[str]] = dict()
+        for key, game in self.index.items():
+            self.games_by_mask.setdefault(game.providers_mask, []).append(key)
+
+    def to_json(self, key: str) -> Dict:
+        game = self.games[key]
+        return {"key": key, "name": game.name,
+                "providers": [name for name, slot in zip(self.provider_names, game.games) if slot is not None]}
+
+    def find(self, key: Optional[str] = None, name_prefix: Optional[str] = None,
+             with_providers: Sequence[str] = (), without_providers: Sequence[str] = (),
+             min_providers: int = 0, limit: int = DEFAULT_LIMIT) -> List[Dict]:
+        """Find games, sorted by key
+
+        Args:
+            key (Optional[str]): normalized key, or name, of the game
+            name_prefix (Optional[str]): beginning of the names
+            with_providers (Sequence[str]): names of the providers that must have the games
+            without_providers (Sequence[str]): names of the providers that must not have the games
+            min_providers (int): minimum number of providers having the games
+            limit (int): maximum number of games
+
+        Returns:
+            List[Dict]: matching games
+        """
+        for name in list(with_providers) + list(without_providers):
+            if name not in self.provider_names:
+                raise ValueError("Unknown provider: {}".format(name))
+
+        if key is not None:
+            key = normalize_key(key)
+            return [self.to_json(key)] if key in self.games else []
+
+        required = sum(1 << self.provider_names.index(name) for name in with_providers)
+        excluded = sum(1 << self.provider_names.index(name) for name in without_providers)
+        masks = set(mask for mask in self.games_by_mask
+                    if mask & required == required and mask & excluded == 0 and bin(mask).count("1") >= min_providers)
+
+        # games are read in key order, and only until the limit is reached
+        if name_prefix is not None:
+            candidates: Iterable[str] = (key for key, _ in self.index.prefix(normalize_key(name_prefix)))
+        elif required != 0 or excluded != 0:
+            # games of each matching provider set, merged in key order
+            candidates = heapq.merge(*(self.games_by_mask[mask] for mask in masks))
+        else:
+            candidates = (key for key, _ in self.index.with_min_providers(min_providers))
+
+        matches = (key for key in candidates if self.games[key].providers_mask in masks)
+        return [self.to_json(key) for key in itertools.islice(matches, limit)]
+
+
+class CatalogServer:
+    """Catalog kept in memory, each provider being fetched again on its own schedule"""
+
+    def __init__(self, providers: Sequence[Provider], refresh_intervals: Optional[Dict[str, float]] = None,
+                 retry_interval: float = DEFAULT_RETRY_INTERVAL, fuzzy_threshold: Optional[float] = None,
+                 snapshots: Optional[ProviderSnapshotStore] = None):
+        """Prepare the server, without fetching anything yet
+
+        Args:
+            providers (Sequence[Provider]): served providers, in the order of priority of their names
+            refresh_intervals (Optional[Dict[str, float]]): time in seconds between two fetches, by provider name
+            retry_interval (float): time in seconds before fetching again a provider that failed
+            fuzzy_threshold (Optional[float]): if set, also merge the games with similar names
+            snapshots (Optional[ProviderSnapshotStore]): last games of each provider, served until it is fetched
+        """
+        self.providers = list(providers)
+        self.refresh_intervals = {provider.name: DEFAULT_REFRESH_INTERVALS.get(provider.name, DEFAULT_REFRESH_INTERVAL)
+                                  for provider in self.providers}
+        self.refresh_intervals.update(refresh_intervals or dict())
+        self.retry_interval = retry_interval
+        self.fuzzy_threshold = fuzzy_threshold
+        self.snapshots = snapshots
+
+        # last games received from each provider: a failed fetch keeps the previous ones
+        self._games: Dict[str, List] = {provider.name: [] for provider in self.providers}
+        self._updated_at: Dict[str, float] = dict()
+        # providers whose games come from a snapshot
+        self._stale = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        # games sorted by key, updated under the lock by each refresh: snapshots get a copy of it
+        self._index = CatalogIndex(by_key=True)
+        self.snapshot = CatalogSnapshot([provider.name for provider in self.providers], dict(), dict())
+
+    def refresh(self, provider: Provider) -> bool:
+        """Fetch a provider, then build and swap in a new snapshot
+
+        Args:
+            provider (Provider): fetched provider
+
+        Returns:
+            bool: True if the provider was fetched
+        """
+        try:
+            with metrics.timer("stage_seconds", stage="fetch", provider=provider.name):
+                games = provider.fetch()
+        except Exception as e:
+            logger.error("Cannot get {} games: {}".format(provider.label, e))
+            metrics.increment("provider_errors_total", provider=provider.name, error=type(e).__name__)
+            return False
+        logger.info("{}: {} Games".format(provider.label, len(games)))
+        metrics.set_gauge("games", len(games), provider=provider.name)
+        if self.snapshots is not None and len(games) > 0:
+            self.snapshots.save(provider.name, games)
+
+        self._update(provider, games, time.time(), stale=False)
+        return True
+
+    def _update(self, provider: Provider, games: List, updated_at: float, stale: bool):
+        # snapshots are built one at a time, so that a slower build does not replace a newer one
+        with self._lock:
+            self._games[provider.name] = games
+            self._updated_at[provider.name] = updated_at
+            if stale:
+                self._stale.add(provider.name)
+            else:
+                self._stale.discard(provider.name)
+            with metrics.timer("stage_seconds", stage="merge"):
+                merged_games = merge_games([provider.name for provider in self.providers], self._games)
+                if self.fuzzy_threshold is not None:
+                    fuzzy_merge(merged_games, self.fuzzy_threshold)
+                # only the games of the refreshed provider move in the index, which is not sorted again
+                self._index.sync(merged_games)
+                snapshot = CatalogSnapshot([provider.name for provider in self.providers], merged_games,
+                                           self._updated_at, self._index.copy())
+            self.snapshot = snapshot
+        metrics.set_gauge("games", len(snapshot.games), provider="all")
+
+    def _schedule(self, provider: Provider):
+        while not self._stop.is_set():
+            fetched = self.refresh(provider)
+            self._stop.wait(self.refresh_intervals[provider.name] if fetched else self.retry_interval)
+
+    def start(self):
+        """Serve the last games of the providers, and start the refresh of each provider in the background"""
+        if self.snapshots is not None:
+            for provider in self.providers:
+                snapshot = self.snapshots.load(provider.name)
+                if snapshot is not None:
+                    games, age = snapshot
+                    logger.info("{}: {} Games from the snapshot".format(provider.label, len(games)))
+                    self._update(provider, games, time.time() - age, stale=True)
+
+        for provider in self.providers:
+            thread = threading.Thread(target=self._schedule, args=(provider,), name="refresh-{}".format(provider.name),
+                                      daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Stop the refreshes; a fetch in progress is not waited for"""
+        self._stop.set()
+
+    def status(self) -> Dict:
+        snapshot = self.snapshot
+        return {
+            "games": len(snapshot.games),
+            "built_at": snapshot.built_at,
+            "providers": {provider.name: {"games": len(self._games[provider.name]),
+                                          "updated_at": snapshot.updated_at.get(provider.name),
+                                          "stale": provider.name in self._stale,
+                                          "refresh_interval": self.refresh_intervals[provider.name]}
+                          for provider in self.providers},
+        }
+
+
+def _provider_list(values: Dict[str, List[str]], name: str) -> List[str]:
+    return [provider for value in values.get(name, []) for provider in value.split(",") if provider != ""]
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    server_version = "CloudGamingGameList"
+    catalog_server: CatalogServer
+
+    def _send(self, status: int, body: str, content_type: str = "application/json; charset=utf-8"):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status: int, data):
+        self._send(status, json.dumps(data, ensure_ascii=False))
+
+    def do_GET(self):  # noqa: N802
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        # a request reads a single snapshot, even if a refresh swaps it meanwhile
+        snapshot = self.catalog_server.snapshot
+
+        try:
+            if url.path == "/games":
+                limit = int(query.get("limit", [DEFAULT_LIMIT])[0])
+                games = snapshot.find(key=query.get("key", [None])[0],
+                                      name_prefix=query.get("name", [None])[0],
+                                      with_providers=_provider_list(query, "with"),
+                                      without_providers=_provider_list(query, "without"),
+                                      min_providers=int(query.get("min_providers", [0])[0]),
+                                      limit=limit)
+                self._send_json(200, {"games": games, "count": len(games)})
+            elif url.path.startswith("/games/"):
+                games = snapshot.find(key=unquote(url.path[len("/games/"):]))
+                if len(games) == 0:
+                    self._send_json(404, {"error": "Unknown game"})
+                else:
+                    self._send_json(200, games[0])
+            elif url.path == "/status":
+                self._send_json(200, self.catalog_server.status())
+            elif url.path == "/metrics":
+                self._send(200, metrics.prometheus_text(), "text/plain; version=0.0.4; charset=utf-8")
+            else:
+                self._send_json(404, {"error": "Unknown path"})
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        logger.debug("{} {}".format(self.address_string(), format % args))
+
+
+def serve(catalog_server: CatalogServer, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+    """Refresh the catalog in the background and answer queries until interrupted
+
+    Endpoints:
+        GET /games?name=PREFIX&with=geforce,xcloud&without=psnow&min_providers=N&limit=N
+        GET /games?key=KEY or GET /games/KEY
+        GET /status
+        GET /metrics (Prometheus text format)
+
+    Args:
+        catalog_server (CatalogServer): served catalog
+        host (str): listened address
+        port (int): listened port
+    """
+    handler = type("RequestHandler", (_RequestHandler,), {"catalog_server": catalog_server})
+    http_server = ThreadingHTTPServer((host, port), handler)
+    catalog_server.start()
+    logger.info("Serving on http://{}:{}".format(host, http_server.server_address[1]))
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        http_server.server_close()
+        catalog_server.stop()
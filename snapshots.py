@@ -0,0 +1,69 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger("Snapshots")
+
+DEFAULT_SNAPSHOT_DIR = os.path.join(".cache", "snapshots")
+# older snapshots are not used anymore: better no games than very outdated ones
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+
+
+class ProviderSnapshotStore:
+    """Last games successfully fetched from each provider, used when a provider fails
+
+    Games are pickled with the time they were fetched at, one file by provider (and fetcher arguments).
+    """
+
+    def __init__(self, directory: str = DEFAULT_SNAPSHOT_DIR, max_age: float = DEFAULT_MAX_AGE):
+        self.directory = directory
+        self.max_age = max_age
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, snapshot_id: str) -> str:
+        # ids may contain fetcher arguments, which are not all valid in file names
+        digest = hashlib.sha256(snapshot_id.encode("utf-8")).hexdigest()[:16]
+        safe_id = "".join(c if c.isalnum() else "_" for c in snapshot_id)[:40]
+        return os.path.join(self.directory, "{}-{}.pickle".format(safe_id, digest))
+
+    def save(self, snapshot_id: str, games: List):
+        """Keep the games of a successful fetch
+
+        Args:
+            snapshot_id (str): provider name, with the fetcher arguments if any
+            games (List): fetched games
+        """
+        path = self._path(snapshot_id)
+        tmp_path = "{}.{}.tmp".format(path, threading.get_ident())
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"id": snapshot_id, "saved_at": time.time(), "games": games}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def load(self, snapshot_id: str) -> Optional[Tuple[List, float]]:
+        """Get the last games of a provider
+
+        Args:
+            snapshot_id (str): provider name, with the fetcher arguments if any
+
+        Returns:
+            Optional[Tuple[List, float]]: games and their age in seconds, None if there is no usable snapshot
+        """
+        try:
+            with open(self._path(snapshot_id), "rb") as f:
+                snapshot = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # i.e. the game classes changed since the snapshot was saved
+            logger.warning("Cannot read the snapshot of {}: {}".format(snapshot_id, e))
+            return None
+
+        age = time.time() - snapshot["saved_at"]
+        if snapshot.get("id") != snapshot_id or age > self.max_age:
+            return None
+        return snapshot["games"], age
@@ -0,0 +1,18 @@
+import pytest
+
+from benchmarks.fixtures import synthetic_adapter
+from fetchers.xcloud import clear_endpoints, configure_product_store
+from utils import http_client, metrics
+
+
+@pytest.fixture
+def replay():
+    """Answer the requests of all fetchers with the synthetic catalogs of the benchmarks"""
+    metrics.reset()
+    configure_product_store(None)
+    clear_endpoints()
+    adapter = synthetic_adapter()
+    http_client.configure(retries=0, transport=adapter)
+    yield adapter
+    http_client.configure()
+    clear_endpoints()
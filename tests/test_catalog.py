@@ -0,0 +1,117 @@
+import random
+from collections import namedtuple
+
+import pytest
+
+from catalog import CatalogIndex, fuzzy_form, fuzzy_merge, merge_games
+from fetchers.geforce_now import GeforceGame, GeforceStatus, Store
+
+PROVIDERS = ("geforce", "psnow", "stadia", "xcloud")
+Game = namedtuple("Game", "name")
+
+
+def _merged(*names_by_provider):
+    return merge_games(PROVIDERS, {provider: [Game(name) for name in names]
+                                   for provider, names in zip(PROVIDERS, names_by_provider)})
+
+
+def test_merge_games_by_key():
+    merged_games = _merged(["Trine 4", "Halo™"], ["Trine 4: The Nightmare Prince", "HALO"])
+
+    assert sorted(merged_games) == ["halo", "trine 4 the nightmare prince"]
+    halo = merged_games["halo"]
+    assert halo.name == "Halo™"
+    assert halo.nb_cloud() == 2
+    assert halo.psnow_game == Game("HALO")
+    assert halo.stadia_game is None
+
+
+def test_game_slots():
+    halo = _merged(["Halo"], [], [], ["Halo"])["halo"]
+
+    assert halo.games == (Game("Halo"), None, None, Game("Halo"))
+    assert halo.game("xcloud") == Game("Halo") and halo.game("shadow") is None
+    assert halo.providers_mask == 0b1001
+
+
+def test_geforce_stores_are_read_only():
+    game = GeforceGame("Halo", {Store.STEAM: GeforceStatus.AVAILABLE})
+    game.set_store(Store.EPIC, GeforceStatus.PATCHING)
+
+    assert game.stores == {Store.STEAM: GeforceStatus.AVAILABLE, Store.EPIC: GeforceStatus.PATCHING}
+    with pytest.raises(TypeError):
+        game.stores[Store.GOG] = GeforceStatus.AVAILABLE
+
+
+def test_fuzzy_form_only_strips_a_trailing_edition():
+    assert fuzzy_form("dirt 5 - deluxe edition") == "dirt 5"
+    assert fuzzy_form("forza horizon 4 standard edition") == "forza horizon 4"
+    assert fuzzy_form("deluxe paint") == "deluxe paint"
+    assert fuzzy_form("pc futbol") == "pc futbol"
+    assert fuzzy_form("---") == ""
+
+
+@pytest.mark.parametrize("name, other_name", [
+    ("Dirt 5", "DIRT 5 - Deluxe Edition"),
+    ("Grounded", "Grounded (Game Preview)"),
+    ("Halo: The Master Chief Collection", "Halo The Master Chief Collection - Windows 10 Edition"),
+    ("Spider-Man Remastered", "Spiderman Remastered"),
+    ("Wolfenstein - Deluxe Edition", "Wolfensteins Definitive Edition"),
+])
+def test_fuzzy_merge_editions(name, other_name):
+    merged_games = _merged([name], [other_name])
+
+    merges = fuzzy_merge(merged_games)
+
+    assert len(merges) == 1
+    assert len(merged_games) == 1
+    assert next(iter(merged_games.values())).nb_cloud() == 2
+
+
+@pytest.mark.parametrize("name, other_name", [
+    ("PC Futbol", "Futbol"),
+    ("Standard Chess", "Chess"),
+    ("PC Building Simulator", "Building Simulator"),
+    ("Complete Chess", "Chess"),
+    ("Forza Horizon 4", "Forza Horizon 5"),
+    # similar enough, but a word is inserted or added
+    ("Hunter Remastered", "Hunter Monster Remastered"),
+    ("Wolfenstein Remastered", "Wolfenstein Ori Remastered"),
+    ("Cities Borderlands", "Cities Borderlands Sea"),
+    ("Assassins Wolfenstein", "Wolfenstein Assassins"),
+    ("Monster Borderlands Cells Cry", "Monster Borderlands Cells Will"),
+    ("!!!", "???"),
+])
+def test_fuzzy_merge_different_games(name, other_name):
+    merged_games = _merged([name], [other_name])
+
+    assert fuzzy_merge(merged_games) == []
+    assert len(merged_games) == 2
+
+
+def test_index_follows_the_updates():
+    rnd = random.Random(1)
+    names = ["Game {}".format(i) for i in range(500)]
+    index = CatalogIndex(by_key=True)
+    copies = []
+    for _ in range(20):
+        merged_games = _merged(*(rnd.sample(names, rnd.randrange(300)) for _ in PROVIDERS))
+        index.sync(merged_games)
+        expected = CatalogIndex(merged_games, by_key=True)
+        assert [key for key, _ in index.items()] == [key for key, _ in expected.items()]
+        assert [key for key, _ in index.with_min_providers(2)] == [key for key, _ in expected.with_min_providers(2)]
+        assert index.count_with_min_providers(3) == expected.count_with_min_providers(3)
+        copies.append((index.copy(), [key for key, _ in expected.items()]))
+
+    # copies are not changed by the later updates
+    for copy, keys in copies:
+        assert [key for key, _ in copy.items()] == keys
+
+
+def test_index_by_name():
+    merged_games = _merged(["Zelda", "Ace", "Ape Out"], ["Ape Out"])
+    index = CatalogIndex(merged_games)
+
+    assert [game.name for _, game in index.items()] == ["Ace", "Ape Out", "Zelda"]
+    assert [key for key, _ in index.prefix("Ap")] == ["ape out"]
+    assert [key for key, _ in index.with_min_providers(2)] == ["ape out"]
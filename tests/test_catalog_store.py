@@ -0,0 +1,61 @@
+import pytest
+
+from catalog import merge_games
+from catalog_store import CatalogStore
+from fetchers.geforce_now import GeforceGame, GeforceStatus, Store
+from fetchers.google_stadia import StadiaGame
+from fetchers.playstation_now import PlaystationModel, PlaystationNowGame
+from fetchers.xcloud import XCloudGame
+from providers import PROVIDER_NAMES
+from writers import FAILED, STALE
+
+
+def _catalog(geforce=(), psnow=(), stadia=(), xcloud=()):
+    games = {
+        "geforce": [GeforceGame(name, {Store.STEAM: GeforceStatus.AVAILABLE}) for name in geforce],
+        "psnow": [PlaystationNowGame(name, PlaystationModel.PS4) for name in psnow],
+        "stadia": [StadiaGame(name, False) for name in stadia],
+        "xcloud": [XCloudGame(name, "9N{:08d}".format(i)) for i, name in enumerate(xcloud)],
+    }
+    return merge_games(PROVIDER_NAMES, games)
+
+
+@pytest.fixture
+def store(tmp_path):
+    with CatalogStore(str(tmp_path / "catalog.sqlite")) as catalog_store:
+        catalog_store.save(_catalog(geforce=["Halo", "Trine"], psnow=["Halo", "Bloodborne"], xcloud=["Halo"]))
+        yield catalog_store
+
+
+def _names(rows):
+    return [row["name"] for row in rows]
+
+
+def test_queries(store):
+    assert _names(store.query()) == ["Bloodborne", "Halo", "Trine"]
+    assert _names(store.query(with_providers=["psnow"], without_providers=["xcloud"])) == ["Bloodborne"]
+    assert _names(store.query(name_prefix="tri")) == ["Trine"]
+    assert _names(store.query(store="Steam", status="AVAILABLE")) == ["Halo", "Trine"]
+    assert store.stores("halo") == {"Steam": "AVAILABLE"}
+    assert store.query(name_prefix="halo")[0]["xbox_id"] == "9N00000000"
+
+
+def test_other_providers_are_kept(store):
+    # only Geforce is fetched: Trine left it, Ape Out was added
+    store.save(_catalog(geforce=["Halo", "Ape Out"]), ["geforce"])
+
+    assert _names(store.query()) == ["Ape Out", "Bloodborne", "Halo"]
+    assert _names(store.query(with_providers=["psnow"])) == ["Bloodborne", "Halo"]
+    # PS Now was not fetched with Ape Out: it is unknown, not absent
+    assert _names(store.query(without_providers=["psnow"])) == []
+    assert store.query(name_prefix="halo")[0]["xbox_id"] == "9N00000000"
+
+
+def test_failed_provider_is_kept(store):
+    store.save(_catalog(geforce=["Halo"], xcloud=["Halo"]), statuses={"psnow": FAILED, "stadia": STALE})
+
+    assert _names(store.query(with_providers=["psnow"])) == ["Bloodborne", "Halo"]
+    assert _names(store.query(with_providers=["geforce"])) == ["Halo"]
+    statuses = store.provider_statuses()
+    assert statuses["psnow"][0] == FAILED and statuses["psnow"][1] is not None
+    assert statuses["stadia"][0] == STALE and statuses["geforce"][0] is None
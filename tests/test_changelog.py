@@ -0,0 +1,50 @@
+from changelog import ADDED, CHANGED, REMOVED, Snapshot, diff_snapshots
+from writers import FAILED, STALE, mark_column
+
+COLUMNS = ["Geforce", "PSNow", "Stadia"]
+
+
+def _diff(previous_rows, current_rows, previous_columns=COLUMNS, current_columns=COLUMNS):
+    return list(diff_snapshots(Snapshot(previous_columns, previous_rows), Snapshot(current_columns, current_rows)))
+
+
+def test_added_removed_changed():
+    previous = [("Alpha", [True, False, False]), ("Beta", [True, True, False]), ("Gamma™", [False, False, True])]
+    current = [("Alpha", [True, True, False]), ("Gamma", [False, False, True]), ("Delta", [False, True, False])]
+
+    changes = {change["key"]: change for change in _diff(previous, current)}
+
+    assert changes["alpha"] == {"change": CHANGED, "key": "alpha", "name": "Alpha", "added": ["PSNow"], "removed": []}
+    assert changes["gamma"]["change"] == CHANGED and changes["gamma"]["previous_name"] == "Gamma™"
+    assert changes["delta"] == {"change": ADDED, "key": "delta", "name": "Delta", "available": ["PSNow"]}
+    assert changes["beta"] == {"change": REMOVED, "key": "beta", "name": "Beta"}
+    assert len(changes) == 4
+
+
+def test_stale_column_is_the_same_column():
+    rows = [("Alpha", [True, True, False]), ("Beta", [False, True, True])]
+    stale_columns = [COLUMNS[0], mark_column(COLUMNS[1], STALE), COLUMNS[2]]
+
+    assert _diff(rows, rows, current_columns=stale_columns) == []
+    assert _diff(rows, rows, previous_columns=stale_columns) == []
+
+
+def test_failed_column_is_left_out():
+    previous = [("Alpha", [True, True, False]), ("Beta", [False, True, False])]
+    # the failed provider has no games: its column is all false
+    current = [("Alpha", [True, False, False]), ("Gamma", [False, False, True])]
+    failed_columns = [COLUMNS[0], mark_column(COLUMNS[1], FAILED), COLUMNS[2]]
+
+    changes = _diff(previous, current, current_columns=failed_columns)
+
+    # Beta was only on the failed provider: it is unknown, not removed
+    assert changes == [{"change": ADDED, "key": "gamma", "name": "Gamma", "available": ["Stadia"]}]
+
+
+def test_new_column_counts_as_unavailable():
+    previous = [("Alpha", [True, False, False])]
+    current = [("Alpha", [True, False, False, True])]
+
+    changes = _diff(previous, current, current_columns=COLUMNS + ["XCloud"])
+
+    assert changes == [{"change": CHANGED, "key": "alpha", "name": "Alpha", "added": ["XCloud"], "removed": []}]
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from utils import http_client, metrics
+from utils.http_cache import ResponseCache
+from utils.replay import RecordedResponse, ReplayAdapter
+
+URL = "https://static.nvidiagrid.net/gfnpc-en-US.json"
+BODY = '[{"title": "Halo"}]'.encode("utf-8")
+
+
+def _cached_metric(result):
+    return sum(metric["value"] for metric in metrics.report()["metrics"]
+               if metric["name"] == "http_cache_requests_total" and metric["labels"]["result"] == result)
+
+
+@pytest.fixture
+def adapter():
+    adapter = ReplayAdapter()
+    # validated with the ETag, like the provider CDNs
+    adapter.route("nvidiagrid", lambda request: RecordedResponse(304, {"ETag": '"v1"'}, b"")
+                  if request.headers.get("If-None-Match") == '"v1"'
+                  else RecordedResponse(200, {"ETag": '"v1"', "Content-Type": "application/json"}, BODY))
+    metrics.reset()
+    yield adapter
+    http_client.configure()
+
+
+def test_not_modified_body_comes_from_the_cache(adapter, tmp_path):
+    http_client.configure(retries=0, transport=adapter, cache=ResponseCache(str(tmp_path)))
+
+    first = http_client.get(URL, use_cache=True)
+    second = http_client.get(URL, use_cache=True, stream=True)
+
+    assert first.status_code == second.status_code == 200
+    assert first.content == b"".join(second.iter_content(4)) == BODY
+    assert second.headers["ETag"] == '"v1"'
+    assert _cached_metric("miss") == 1 and _cached_metric("hit") == 1
+
+
+def test_expired_entry_is_downloaded_again(adapter, tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=-1)
+    http_client.configure(retries=0, transport=adapter, cache=cache)
+
+    http_client.get(URL, use_cache=True)
+    assert cache.lookup(URL) is None
+    assert http_client.get(URL, use_cache=True).content == BODY
+    assert _cached_metric("miss") == 2
+
+
+def test_least_recently_used_entries_are_evicted(adapter, tmp_path):
+    cache = ResponseCache(str(tmp_path), max_size=len(BODY) * 2)
+    http_client.configure(retries=0, transport=adapter, cache=cache)
+
+    for index in range(3):
+        http_client.get("{}?page={}".format(URL, index), use_cache=True)
+        if index == 0:
+            # the first body was used long ago
+            for body in tmp_path.glob("*.body"):
+                os.utime(str(body), (0, 0))
+
+    assert cache.lookup("{}?page=0".format(URL)) is None
+    assert cache.lookup("{}?page=2".format(URL)) is not None
@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+from utils.json_stream import iter_json_array
+
+DOCUMENT = json.dumps([1, -2.5, 3e10, 1.25e-7, "a,b]", {"x": [1, 2.5], "y": "é"}, True, False, None, 0, -0.0,
+                       12345678901234567890, [], {}])
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+def test_every_split(size):
+    expected = json.loads(DOCUMENT)
+    for offset in range(size):
+        chunks = [DOCUMENT[:offset]] + [DOCUMENT[i:i + size] for i in range(offset, len(DOCUMENT), size)]
+        assert list(iter_json_array(chunks)) == expected
+
+
+@pytest.mark.parametrize("chunks, expected", [
+    (["[1.", "5]"], [1.5]),
+    (["[2e", "3]"], [2000.0]),
+    (["[1.5e", "+", "2, -", "3]"], [150.0, -3]),
+    (["﻿[", "]"], []),
+])
+def test_split_numbers(chunks, expected):
+    assert list(iter_json_array(chunks)) == expected
+
+
+@pytest.mark.parametrize("chunks", [["[1.]"], ["[1", ".", "]"], ["[1e]"], ["[1, 2"], ["{}"], [""]])
+def test_invalid(chunks):
+    with pytest.raises(ValueError):
+        list(iter_json_array(chunks))
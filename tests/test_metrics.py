@@ -0,0 +1,69 @@
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils import http_client, metrics
+from utils.http_cache import ResponseCache
+
+BODY = json.dumps([{"title": "Game {}".format(i), "status": "AVAILABLE"} for i in range(2000)]).encode("utf-8")
+GZIP_BODY = gzip.compress(BODY)
+
+
+class _GzipHandler(BaseHTTPRequestHandler):
+    def do_GET(self):  # noqa: N802
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(GZIP_BODY)))
+        self.end_headers()
+        self.wfile.write(GZIP_BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def url():
+    metrics.reset()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _GzipHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield "http://127.0.0.1:{}/games.json".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+    http_client.configure()
+
+
+def _metric(name, **labels):
+    return [metric for metric in metrics.report()["metrics"]
+            if metric["name"] == name and all(metric["labels"].get(label) == value for label, value in labels.items())]
+
+
+def test_report_and_prometheus_text():
+    metrics.reset()
+    metrics.increment("http_requests_total", host="example.com", status=200)
+    metrics.increment("http_requests_total", 2, host="example.com", status=200)
+    metrics.set_gauge("games", 42, provider="geforce")
+    with metrics.timer("stage_seconds", stage="merge"):
+        pass
+
+    assert _metric("http_requests_total")[0]["value"] == 3
+    assert _metric("stage_seconds", stage="merge")[0]["count"] == 1
+    text = metrics.prometheus_text()
+    assert '# TYPE cloud_gaming_games gauge\ncloud_gaming_games{provider="geforce"} 42.0\n' in text
+    assert 'cloud_gaming_stage_seconds_count{stage="merge"} 1\n' in text
+    with pytest.raises(Exception):
+        metrics.set_gauge("http_requests_total", 1)
+
+
+@pytest.mark.parametrize("stream, use_cache", [(False, False), (True, False), (False, True)])
+def test_downloaded_bytes_are_the_received_bytes(url, tmp_path, stream, use_cache):
+    http_client.configure(retries=0, cache=ResponseCache(str(tmp_path)))
+
+    response = http_client.get(url, use_cache=use_cache, stream=stream)
+
+    assert response.content == BODY
+    downloaded = _metric("http_downloaded_bytes_total")
+    assert len(downloaded) == 1 and downloaded[0]["value"] == len(GZIP_BODY)
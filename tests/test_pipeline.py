@@ -0,0 +1,173 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import catalog_store
+import main
+import server
+from regions import fetch_regions
+from changelog import Snapshot, diff_snapshots
+from fetchers import xcloud
+from providers import PROVIDERS, Provider
+from snapshots import ProviderSnapshotStore
+from utils import metrics, parse_pool
+from writers import FAILED, STALE, read_rows
+
+
+def _failing(provider):
+    def fetch():
+        raise Exception("{} is down".format(provider.label))
+    return Provider(provider.name, provider.label, provider.column, fetch)
+
+
+def _empty(provider):
+    # i.e. the page layout changed: the fetcher finds no games, without error
+    return Provider(provider.name, provider.label, provider.column, lambda: [])
+
+
+def _output(path):
+    columns, rows = read_rows(str(path))
+    return columns, list(rows)
+
+
+def test_defaults_shown_in_the_help():
+    assert main.DEFAULT_CATALOG_DB == catalog_store.DEFAULT_CATALOG_DB
+    assert main.DEFAULT_PORT == server.DEFAULT_PORT
+    assert (main.DEFAULT_XCLOUD_BATCH_SIZE, main.DEFAULT_XCLOUD_WORKERS) == (xcloud.DEFAULT_BATCH_SIZE,
+                                                                             xcloud.DEFAULT_MAX_WORKERS)
+
+
+def test_all_providers(replay, tmp_path):
+    output = tmp_path / "output.csv"
+
+    main.main(str(output), catalog_db=str(tmp_path / "catalog.sqlite"))
+
+    columns, rows = _output(output)
+    assert columns == [provider.column for provider in PROVIDERS]
+    names = [name for name, _ in rows]
+    assert names == sorted(names)
+    for index in range(len(columns)):
+        assert any(values[index] for _, values in rows)
+    assert any(metric["name"] == "http_downloaded_bytes_total" and "nvidiagrid" in metric["labels"]["host"]
+               for metric in metrics.report()["metrics"])
+
+
+def test_fetch_all_failed_and_slow_providers(replay):
+    def sleep():
+        time.sleep(5)
+        return []
+    slow = Provider("slow", "Slow", "Slow", sleep)
+    providers = [PROVIDERS[0], _failing(PROVIDERS[1]), slow]
+
+    start = time.monotonic()
+    results, statuses = main.fetch_all(0.5, providers)
+
+    assert time.monotonic() - start < 2
+    assert len(results[PROVIDERS[0].name]) > 0
+    assert results[PROVIDERS[1].name] == [] and results["slow"] == []
+    assert statuses == {PROVIDERS[1].name: FAILED, "slow": FAILED}
+
+
+# the display catalog answers after 5 seconds, while the provider is given 0.5 second
+SLOW_XCLOUD_RUN = """
+import time
+import main
+from fetchers.xcloud import fetch_xcloud_products
+from providers import Provider
+from utils import http_client
+from utils.replay import RecordedResponse, ReplayAdapter
+
+adapter = ReplayAdapter()
+adapter.route("displaycatalog", lambda request: time.sleep(5) or RecordedResponse(200, {}, b'{"Products": []}'))
+http_client.configure(retries=0, transport=adapter)
+product_ids = [str(i) for i in range(1000)]
+provider = Provider("xcloud", "XCloud", "XCloud",
+                    lambda: fetch_xcloud_products("https://displaycatalog.mp.microsoft.com/v7.0/products?", "cv",
+                                                  product_ids))
+main.fetch_all(0.5, [provider])
+"""
+
+
+def test_timeout_bounds_the_run():
+    start = time.monotonic()
+    subprocess.run([sys.executable, "-c", SLOW_XCLOUD_RUN], check=True,
+                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    assert time.monotonic() - start < 4
+
+
+def test_parse_pool(replay):
+    expected, _ = main.fetch_all()
+
+    # the pool is created in the main thread, its processes are started by the fetching threads
+    parse_pool.configure(2)
+    try:
+        assert parse_pool._executor._mp_context.get_start_method() != "fork"
+        results, statuses = main.fetch_all()
+    finally:
+        parse_pool.configure(0)
+
+    assert statuses == dict()
+    for name, games in expected.items():
+        assert [game.name for game in results[name]] == [game.name for game in games]
+
+
+def test_command_line_providers(tmp_path):
+    stadia = {"stadia_game_list": [{"title": "Destiny 2"}], "stadia_pro_game_list": [{"title": "Celeste"}]}
+    (tmp_path / "replay").mkdir()
+    (tmp_path / "replay" / "stadia.json").write_text(json.dumps(stadia))
+    (tmp_path / "replay" / "index.json").write_text(json.dumps([{
+        "url": "https://ssl.gstatic.com/stadia/gamers/landing_page/config/landing_page_us.json", "status_code": 200,
+        "headers": {"Content-Type": "application/json"}, "body": "stadia.json"}]))
+    output = tmp_path / "output.csv"
+
+    subprocess.run([sys.executable, "main.py", "--providers", "Stadia", "--replay", str(tmp_path / "replay"),
+                    "--no-cache", "--no-snapshots", "-o", str(output)], check=True,
+                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    columns, rows = _output(output)
+    assert columns == ["Stadia"]
+    assert rows == [("Celeste", [True]), ("Destiny 2", [True])]
+
+
+def test_fetch_regions_timeout(replay):
+    def sleep(**params):
+        time.sleep(5)
+        return []
+    slow = Provider("stadia", "Stadia", "Stadia", sleep)
+
+    start = time.monotonic()
+    merged_games, statuses = fetch_regions(["US", "FR"], [PROVIDERS[0], slow], timeout=0.5)
+
+    assert time.monotonic() - start < 2
+    assert len(merged_games) > 0
+    assert statuses == {("US", "stadia"): FAILED, ("FR", "stadia"): FAILED}
+
+
+@pytest.mark.parametrize("broken", [_failing, _empty])
+def test_failed_provider_changelog(replay, tmp_path, broken):
+    snapshots = ProviderSnapshotStore(str(tmp_path / "snapshots"))
+    previous = tmp_path / "previous.csv"
+    main.main(str(previous), snapshots=snapshots)
+
+    # the provider fails: its last games are used, and nothing changed
+    providers = [broken(provider) if provider.name == "psnow" else provider for provider in PROVIDERS]
+    stale = tmp_path / "stale.csv"
+    main.main(str(stale), previous_file=str(previous), changelog_file=str(tmp_path / "stale.jsonl"),
+              providers=providers, snapshots=snapshots)
+    columns, rows = _output(stale)
+    assert "{} ({})".format(PROVIDERS[1].column, STALE) in columns
+    assert list(diff_snapshots(Snapshot(*_output(previous)), Snapshot(columns, rows))) == []
+
+    # without snapshot, its games are unknown and left out of the changelog
+    failed = tmp_path / "failed.csv"
+    main.main(str(failed), providers=providers)
+    columns, rows = _output(failed)
+    assert "{} ({})".format(PROVIDERS[1].column, FAILED) in columns
+    changes = list(diff_snapshots(Snapshot(*_output(previous)), Snapshot(columns, rows)))
+    assert all(PROVIDERS[1].column not in change.get("added", []) + change.get("removed", []) for change in changes)
+    assert not any(change["change"] == "removed" for change in changes)
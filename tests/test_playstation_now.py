@@ -0,0 +1,51 @@
+import pytest
+
+from fetchers.playstation_now import (PARSER_ENGINES, parse_playstation_now, parse_playstation_now_in_pool,
+                                      split_letter_blocks)
+from utils import http_client
+
+NESTED_PAGE = ('<div id="tab-content-a"><div id="tab-content-b"><div class="text-block"><h3>PS4</h3><p>One</p>'
+               '<div class="text-block"><p>Two<br/>Three</p></div></div></div>'
+               '<div class="text-block"><span class="txt--6">PS3</span><p>Four</p><p><span>PS4</span></p>'
+               '<p>Five</p></div></div>')
+
+# BeautifulSoup 4.9.3 takes a <br/> after a <br> as its closing tag: the <br/> stays open, with the text in it
+SELF_CLOSED_PAGE = '<div id="tab-content-6"><div class="text-block"><br><p><br/>PS3'
+
+
+def _games(html, engine):
+    return [(game.name, game.console.value) for game in parse_playstation_now(html, engine)]
+
+
+@pytest.fixture
+def page(replay):
+    return http_client.get("https://www.playstation.com/fr-fr/ps-now/ps-now-games/").text
+
+
+@pytest.mark.parametrize("engine", PARSER_ENGINES)
+def test_nested_blocks_are_parsed_for_each_enclosing_block(engine):
+    outer_column = [("One", "PS4"), ("Two", "PS4"), ("Three", "PS4")]
+    inner_column = [("Two", "UNKNOWN"), ("Three", "UNKNOWN")]
+    # tab-content-a has all columns, tab-content-b the first two
+    assert _games(NESTED_PAGE, engine) == (outer_column + inner_column + [("Four", "PS3"), ("Five", "PS4")]
+                                           + outer_column + inner_column)
+
+
+@pytest.mark.parametrize("engine", PARSER_ENGINES)
+def test_self_closed_tag_after_a_void_element(engine):
+    assert _games(SELF_CLOSED_PAGE, engine) == []
+    assert _games(SELF_CLOSED_PAGE.replace("<br>", ""), engine) == [("PS3", "UNKNOWN")]
+
+
+def test_engines_find_the_same_games(page):
+    games = _games(page, "stream")
+
+    assert len(games) > 0
+    assert games == _games(page, "soup")
+
+
+@pytest.mark.parametrize("engine", PARSER_ENGINES)
+def test_letter_blocks(page, engine):
+    assert len(split_letter_blocks(page)) > 1
+    games = [(game.name, game.console.value) for game in parse_playstation_now_in_pool(page, engine)]
+    assert games == _games(page, engine)
@@ -0,0 +1,59 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils import http_client
+from utils.http_cache import ResponseCache
+from utils.replay import RecordingAdapter, ReplayAdapter
+
+BODY = b'[{"title": "Halo"}]'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):  # noqa: N802
+        if self.path == "/missing":
+            self.send_response(404)
+            self.end_headers()
+        elif self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.send_header("ETag", '"v1"')
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(BODY)))
+            self.end_headers()
+            self.wfile.write(BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield "http://127.0.0.1:{}".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+    http_client.configure()
+
+
+def test_recording_with_a_warm_cache_is_replayed(url, tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache"))
+    for run in ("cold", "warm"):
+        http_client.configure(retries=0, cache=cache, transport=RecordingAdapter(str(tmp_path / run), cache))
+        assert http_client.get(url + "/games", use_cache=True).content == BODY
+        assert http_client.get(url + "/missing").status_code == 404
+
+    # the 304 of the warm run is recorded with the cached body, and the 404 is not recorded
+    for run in ("cold", "warm"):
+        adapter = ReplayAdapter.load(str(tmp_path / run))
+        http_client.configure(retries=0, transport=adapter)
+        response = http_client.get(url + "/games")
+        assert response.status_code == 200 and response.content == BODY
+        assert response.headers["ETag"] == '"v1"'
+        with pytest.raises(Exception):
+            http_client.get(url + "/missing")
@@ -0,0 +1,132 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from fetchers.geforce_now import GeforceGame, GeforceStatus, Store
+from fetchers.playstation_now import PlaystationModel, PlaystationNowGame
+from fetchers.xcloud import XCloudGame
+from providers import Provider
+from server import CatalogServer, _RequestHandler
+from snapshots import ProviderSnapshotStore
+from utils import metrics
+
+GAMES = {
+    "geforce": [GeforceGame(name, {Store.STEAM: GeforceStatus.AVAILABLE}) for name in ["Halo", "Trine", "Ape Out"]],
+    "psnow": [PlaystationNowGame(name, PlaystationModel.PS4) for name in ["Halo", "Bloodborne"]],
+    "xcloud": [XCloudGame("Halo", "9N0000000000")],
+}
+
+
+def _provider(name, games=None):
+    def fetch():
+        if games is None:
+            raise Exception("{} is down".format(name))
+        return games
+    return Provider(name, name.title(), name, fetch)
+
+
+@pytest.fixture
+def catalog_server():
+    metrics.reset()
+    catalog_server = CatalogServer([_provider(name, games) for name, games in GAMES.items()])
+    for provider in catalog_server.providers:
+        assert catalog_server.refresh(provider)
+    return catalog_server
+
+
+def _names(games):
+    return [game["name"] for game in games]
+
+
+def test_find(catalog_server):
+    snapshot = catalog_server.snapshot
+
+    assert _names(snapshot.find()) == ["Ape Out", "Bloodborne", "Halo", "Trine"]
+    assert snapshot.find(key="HALO") == [{"key": "halo", "name": "Halo", "providers": ["geforce", "psnow", "xcloud"]}]
+    assert snapshot.find(key="Unknown") == []
+    assert _names(snapshot.find(name_prefix="t")) == ["Trine"]
+    assert _names(snapshot.find(with_providers=["geforce"], without_providers=["xcloud"])) == ["Ape Out", "Trine"]
+    assert _names(snapshot.find(min_providers=2)) == ["Halo"]
+    assert _names(snapshot.find(limit=2)) == ["Ape Out", "Bloodborne"]
+    with pytest.raises(ValueError):
+        snapshot.find(with_providers=["stadia"])
+
+
+@pytest.mark.parametrize("games", [None, []])
+def test_failed_refresh_keeps_the_snapshot(catalog_server, games):
+    snapshot = catalog_server.snapshot
+    updated_at = snapshot.updated_at["psnow"]
+
+    # the fetch fails, or finds no games
+    assert not catalog_server.refresh(_provider("psnow", games))
+
+    assert catalog_server.snapshot is snapshot
+    status = catalog_server.status()
+    assert status["games"] == 4
+    assert status["providers"]["psnow"] == {"games": 2, "updated_at": updated_at, "stale": False,
+                                            "refresh_interval": catalog_server.refresh_intervals["psnow"]}
+    assert catalog_server.refresh_intervals["geforce"] < catalog_server.refresh_intervals["psnow"]
+
+
+def test_refresh_moves_the_games_of_the_provider(catalog_server):
+    # Trine left Geforce: it is no longer served, and Halo keeps its other providers
+    assert catalog_server.refresh(_provider("geforce", GAMES["geforce"][:1]))
+
+    snapshot = catalog_server.snapshot
+    assert _names(snapshot.find()) == ["Bloodborne", "Halo"]
+    assert snapshot.find(key="halo")[0]["providers"] == ["geforce", "psnow", "xcloud"]
+
+
+def test_snapshots_are_served_until_fetched(tmp_path):
+    snapshots = ProviderSnapshotStore(str(tmp_path / "snapshots"))
+    snapshots.save("psnow", GAMES["psnow"])
+    # the refresh fails, so the games of the snapshot are kept
+    catalog_server = CatalogServer([_provider("psnow")], retry_interval=60, snapshots=snapshots)
+
+    catalog_server.start()
+    catalog_server.stop()
+
+    assert _names(catalog_server.snapshot.find()) == ["Bloodborne", "Halo"]
+    assert catalog_server.status()["providers"]["psnow"]["stale"]
+
+
+def _get(url):
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, response.read().decode("utf-8")
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode("utf-8")
+
+
+@pytest.fixture
+def url(catalog_server):
+    handler = type("RequestHandler", (_RequestHandler,), {"catalog_server": catalog_server})
+    http_server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    yield "http://127.0.0.1:{}".format(http_server.server_address[1])
+    http_server.shutdown()
+    http_server.server_close()
+
+
+def test_endpoints(url):
+    status, body = _get(url + "/games?with=geforce,psnow&limit=10")
+    halo = {"key": "halo", "name": "Halo", "providers": ["geforce", "psnow", "xcloud"]}
+    assert status == 200 and json.loads(body) == {"games": [halo], "count": 1}
+    status, body = _get(url + "/games?name=b&without=xcloud")
+    assert status == 200 and _names(json.loads(body)["games"]) == ["Bloodborne"]
+    status, body = _get(url + "/games/Ape%20Out")
+    assert status == 200 and json.loads(body)["providers"] == ["geforce"]
+
+    assert _get(url + "/games/Unknown")[0] == 404
+    assert _get(url + "/unknown")[0] == 404
+    assert _get(url + "/games?with=stadia")[0] == 400
+    assert _get(url + "/games?limit=many")[0] == 400
+
+    status, body = _get(url + "/status")
+    assert status == 200 and json.loads(body)["games"] == 4
+    status, body = _get(url + "/metrics")
+    assert status == 200 and 'cloud_gaming_games{provider="all"} 4.0\n' in body
@@ -0,0 +1,38 @@
+import pytest
+
+from writers import STALE, WRITERS, guess_format, mark_column, open_writer, read_rows, split_column, write_batches
+
+COLUMNS = ["Geforce", mark_column("PSNow", STALE)]
+ROWS = [("Halo", [True, False]), ("Name; with \"separators\"", [False, True]), ("Ōkami", [True, True])]
+
+
+@pytest.mark.parametrize("output_format", list(WRITERS))
+def test_rows_are_read_back(output_format, tmp_path):
+    if output_format == "parquet":
+        pytest.importorskip("pyarrow")
+    path = str(tmp_path / "output.{}".format(output_format))
+
+    with open_writer(path, COLUMNS) as writer:
+        assert write_batches(writer, iter(ROWS), batch_size=2) == len(ROWS)
+
+    columns, rows = read_rows(path)
+    assert columns == COLUMNS
+    assert [(name, list(values)) for name, values in rows] == ROWS
+
+
+def test_csv_header(tmp_path):
+    path = str(tmp_path / "output.csv")
+    with open_writer(path, COLUMNS) as writer:
+        write_batches(writer, ROWS[:1])
+
+    with open(path, encoding="utf-8-sig") as f:
+        assert f.read() == 'Name;Geforce;PSNow (stale)\n"Halo";True;False\n'
+
+
+def test_formats():
+    assert guess_format("output.JSONL") == "jsonl"
+    assert guess_format("output.txt") == "csv"
+    assert split_column("PSNow (stale)") == ("PSNow", STALE)
+    assert split_column("PSNow") == ("PSNow", None)
+    with pytest.raises(Exception):
+        open_writer("output.csv", COLUMNS, "xml")
@@ -0,0 +1,129 @@
+import json
+import os
+import random
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from fetchers import xcloud
+from fetchers.xcloud import (XCloudGame, XCloudProductStore, clear_endpoints, configure_batches,
+                             configure_product_store, extract_endpoints, fetch_xcloud, fetch_xcloud_products,
+                             get_endpoints)
+from utils import http_client
+from utils.replay import RecordedResponse, ReplayAdapter
+
+PRODUCTS_URL = "https://displaycatalog.mp.microsoft.com/v7.0/products?"
+TITLES = {"9N{:08d}".format(i): "Game {}".format(i) for i in range(250)}
+
+
+@pytest.fixture
+def catalog():
+    adapter = ReplayAdapter()
+    requested = []
+
+    def products(request):
+        ids = parse_qs(urlparse(request.url).query)["bigIds"][0].split(",")
+        requested.extend(ids)
+        return RecordedResponse(200, {"Content-Type": "application/json"}, json.dumps(
+            {"Products": [{"ProductId": product_id, "LocalizedProperties": [{"ProductTitle": TITLES[product_id]}]}
+                          for product_id in ids]}).encode("utf-8"))
+
+    adapter.route("displaycatalog", products)
+    http_client.configure(retries=0, transport=adapter)
+    yield requested
+    http_client.configure()
+    configure_product_store(None)
+
+
+def test_store_is_saved_and_loaded(tmp_path):
+    path = str(tmp_path / "products.json")
+    store = XCloudProductStore(path)
+    store.put("en-US", XCloudGame("Halo", "9N00000001"))
+    store.save()
+
+    loaded = XCloudProductStore(path)
+    assert loaded.get("en-US", "9N00000001").name == "Halo"
+    assert loaded.get("fr-FR", "9N00000001") is None
+
+
+def test_old_products_are_fetched_again(tmp_path):
+    store = XCloudProductStore(revalidate_after=-1)
+    store.put("en-US", XCloudGame("Halo", "9N00000001"))
+
+    assert store.get("en-US", "9N00000001") is None
+
+
+def test_only_unknown_products_are_requested(catalog, tmp_path):
+    configure_product_store(str(tmp_path / "products.json"))
+    product_ids = list(TITLES)
+
+    first = fetch_xcloud_products(PRODUCTS_URL, "cv", product_ids[:200], batch_size=50)
+    assert sorted(catalog) == product_ids[:200]
+
+    # a new run only requests the new products
+    configure_product_store(str(tmp_path / "products.json"))
+    del catalog[:]
+    second = fetch_xcloud_products(PRODUCTS_URL, "cv", product_ids, batch_size=50)
+    assert sorted(catalog) == product_ids[200:]
+    assert {product_id: game.name for product_id, game in second.items()} == TITLES
+    assert len(first) == 200
+
+
+# parameters, parts of parameters and separators, so that parameters start inside the matches of others
+SCRIPT_PARTS = ['"allCloud" : "29a81209-df6f-41fd-a528-2ae6b91f719c"', '"ALLCLOUD" : "',
+                "29A81209-DF6F-41FD-A528-2AE6B91F719C", 'xgplistUrl = "https://catalog.gamepass.com/sigls/v2"',
+                'xgplistUrl = "', "guidUrl = 'https://d/?", "guidUrl = '", "?", "MS-CV=abc'", "ms-cv=",
+                "'", '"', "\n", " ", ";"]
+
+
+def _searched_endpoints(script):
+    # one search by parameter, as the fetcher did before the single scan
+    values = dict()
+    for name, (_, error) in xcloud._ENDPOINT_PATTERNS.items():
+        match = xcloud._ENDPOINT_REGEXES[name].search(script)
+        if match is None:
+            return error
+        values[name] = match.group(1)
+    return values
+
+
+def test_extracted_endpoints_are_the_first_matches():
+    scripts = ["xgplistUrl = \"MS-CV=a' guidUrl = 'b?\" \"allCloud\" : \"29a81209-df6f-41fd-a528-2ae6b91f719c\""]
+    generator = random.Random(0)
+    scripts.extend("".join(generator.choice(SCRIPT_PARTS) for _ in range(generator.randint(4, 30)))
+                   for _ in range(5000))
+
+    for script in scripts:
+        try:
+            endpoints = extract_endpoints(script)
+            extracted = {name: getattr(endpoints, name) for name in xcloud._ENDPOINT_PATTERNS}
+        except Exception as e:
+            extracted = str(e)
+        assert extracted == _searched_endpoints(script), script
+
+
+def test_endpoints_are_kept_between_runs(replay, tmp_path, monkeypatch):
+    configure_product_store(str(tmp_path / "products.json"))
+    endpoints = get_endpoints()
+    assert os.path.exists(str(tmp_path / "products.endpoints.json"))
+
+    # a new run does not scan the same script again
+    clear_endpoints()
+    configure_product_store(str(tmp_path / "products.json"))
+    monkeypatch.setattr(xcloud, "extract_endpoints", None)
+    loaded = get_endpoints()
+    assert all(getattr(loaded, name) == getattr(endpoints, name) for name in xcloud.XCloudEndpoints.__slots__)
+    configure_product_store(None)
+
+
+def test_configured_batches_are_used(replay):
+    configure_batches(batch_size=40, max_workers=2)
+    try:
+        games = fetch_xcloud()
+    finally:
+        configure_batches()
+
+    requests = [url for url in replay.requests if "displaycatalog" in url]
+    assert len(requests) == (len(games) + 39) // 40
+    with pytest.raises(Exception):
+        configure_batches(batch_size=0)
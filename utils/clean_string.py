@@ -1,3 +1,8 @@
+from functools import lru_cache
+from typing import List, Sequence
+
+
+@lru_cache(maxsize=65536)
 def clean_string(input_str: str) -> str:
     """Format a string by removing invisible caracters and trailing spaces
 
@@ -7,4 +12,25 @@ def clean_string(input_str: str) -> str:
     Returns:
         str: trimed and cleaned string
     """
-    return ''.join(c for c in input_str if c.isprintable()).strip(" ")
\ No newline at end of file
+    # most names do not have any invisible caracter
+    if input_str.isprintable():
+        return input_str.strip(" ")
+    return ''.join(c for c in input_str if c.isprintable()).strip(" ")
+
+
+def clean_strings(input_strs: Sequence[str]) -> List[str]:
+    """Clean a whole list of strings, i.e. all the titles of a provider
+
+    Each distinct string is cleaned once, without going through the cache of clean_string.
+
+    Args:
+        input_strs (Sequence[str]): input strings
+
+    Returns:
+        List[str]: trimed and cleaned strings, in the same order
+    """
+    unique_strs = list(dict.fromkeys(input_strs))
+    clean = clean_string.__wrapped__
+    cleaned = dict(zip(unique_strs, [input_str.strip(" ") if input_str.isprintable() else clean(input_str)
+                                     for input_str in unique_strs]))
+    return [cleaned[input_str] for input_str in input_strs]
@@ -0,0 +1,88 @@
+import queue
+import threading
+from concurrent.futures import Executor, Future
+from typing import Callable, List, Optional, Tuple
+
+_WorkItem = Tuple[Future, Callable, tuple, dict]
+
+
+class DaemonThreadPool(Executor):
+    """Thread pool whose workers are daemon threads
+
+    The workers of a ThreadPoolExecutor are joined when the interpreter exits, so a fetch
+    which timed out keeps the process alive until it ends. These workers are not waited for.
+    """
+
+    def __init__(self, max_workers: int, thread_name_prefix: str = "daemon-pool"):
+        """Prepare the pool, threads are started by the submitted tasks
+
+        Args:
+            max_workers (int): maximum number of threads
+            thread_name_prefix (str): name of the threads, followed by their number
+        """
+        if max_workers <= 0:
+            raise ValueError("max_workers must be greater than 0")
+        self._max_workers = max_workers
+        self._thread_name_prefix = thread_name_prefix
+        self._queue: "queue.SimpleQueue[Optional[_WorkItem]]" = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._idle = 0
+        self._shutdown = False
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            future: Future = Future()
+            self._queue.put((future, fn, args, kwargs))
+            if self._idle > 0:
+                self._idle -= 1
+            elif len(self._threads) < self._max_workers:
+                thread = threading.Thread(target=self._work, daemon=True,
+                                          name="{}-{}".format(self._thread_name_prefix, len(self._threads)))
+                thread.start()
+                self._threads.append(thread)
+        return future
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, fn, args, kwargs = item
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            # drop the references to the task before waiting for the next one
+            del item, future, fn, args, kwargs
+            with self._lock:
+                self._idle += 1
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        """Stop the workers once the queued tasks are done
+
+        Args:
+            wait (bool): if True, wait for the workers to stop
+            cancel_futures (bool): if True, cancel the tasks that did not start yet
+        """
+        with self._lock:
+            self._shutdown = True
+            threads = list(self._threads)
+        if cancel_futures:
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    item[0].cancel()
+        for _ in threads:
+            self._queue.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
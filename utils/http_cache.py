@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    import requests
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "http")
+# entries not validated by the server for a week are downloaded again
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_SIZE = 100 * 1024 * 1024
+
+CHUNK_SIZE = 64 * 1024
+
+# the body is stored decoded, so these headers do not describe it anymore
+IGNORED_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+class CacheEntry:
+    def __init__(self, url: str, etag: Optional[str], last_modified: Optional[str],
+                 encoding: Optional[str], headers: Dict[str, str], validated_at: float, size: int = 0):
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.encoding = encoding
+        self.headers = headers
+        self.validated_at = validated_at
+        # size of the body, in bytes
+        self.size = size
+
+
+class ResponseCache:
+    """On-disk cache of HTTP responses, revalidated with conditional requests
+
+    Each URL has a metadata file (validators, headers, encoding) and a body file.
+    Entries older than the TTL are evicted, as well as the least recently used ones
+    when the total size of the bodies goes over the maximum size.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, ttl: float = DEFAULT_TTL,
+                 max_size: int = DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str, extension: str) -> str:
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, "{}.{}".format(digest, extension))
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        """Find the cached entry of an URL
+
+        Args:
+            url (str): requested URL
+
+        Returns:
+            Optional[CacheEntry]: cached entry, or None if the URL is not cached or expired
+        """
+        try:
+            with open(self._path(url, "json"), encoding="utf-8") as f:
+                entry = CacheEntry(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+        if entry.url != url or not os.path.exists(self._path(url, "body")):
+            return None
+        if time.time() - entry.validated_at > self.ttl:
+            self._remove(url)
+            return None
+        return entry
+
+    @staticmethod
+    def validators(entry: CacheEntry) -> Dict[str, str]:
+        """Build the headers of a conditional request
+
+        Args:
+            entry (CacheEntry): cached entry
+
+        Returns:
+            Dict[str, str]: If-None-Match and If-Modified-Since headers
+        """
+        headers = dict()
+        if entry.etag is not None:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified is not None:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def store(self, url: str, response: "requests.Response") -> CacheEntry:
+        """Save a response, streaming its body to the disk
+
+        Args:
+            url (str): requested URL
+            response (requests.Response): successful response
+
+        Returns:
+            CacheEntry: new cached entry
+        """
+        headers = {name: value for name, value in response.headers.items()
+                   if name.lower() not in IGNORED_HEADERS}
+        entry = CacheEntry(url=url,
+                           etag=response.headers.get("ETag"),
+                           last_modified=response.headers.get("Last-Modified"),
+                           encoding=response.encoding,
+                           headers=headers,
+                           validated_at=time.time())
+
+        body_path = self._path(url, "body")
+        tmp_path = "{}.{}.tmp".format(body_path, threading.get_ident())
+        with open(tmp_path, "wb") as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+                entry.size += len(chunk)
+        response.close()
+        os.replace(tmp_path, body_path)
+        self._write_metadata(entry)
+
+        self.evict()
+        return entry
+
+    def refresh(self, entry: CacheEntry):
+        """Mark an entry as validated by the server (i.e. after a 304 response)
+
+        Args:
+            entry (CacheEntry): cached entry
+        """
+        entry.validated_at = time.time()
+        self._write_metadata(entry)
+
+    def build_response(self, entry: CacheEntry, stream: bool = False) -> "requests.Response":
+        """Build a response from a cached entry
+
+        Args:
+            entry (CacheEntry): cached entry
+            stream (bool): if True, the body is read from the disk while iterating over it
+
+        Returns:
+            requests.Response: response with the cached body
+        """
+        body_path = self._path(entry.url, "body")
+        # keep track of the last use for the eviction
+        os.utime(body_path)
+
+        import requests
+        from requests.structures import CaseInsensitiveDict
+
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response.url = entry.url
+        response.encoding = entry.encoding
+        response.headers = CaseInsensitiveDict(entry.headers)
+        response.raw = open(body_path, "rb")
+        if not stream:
+            response._content = response.raw.read()
+            response._content_consumed = True
+            response.raw.close()
+        return response
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in its maximum size"""
+        with self._lock:
+            bodies = []
+            for file_name in os.listdir(self.directory):
+                if not file_name.endswith(".body"):
+                    continue
+                stat = os.stat(os.path.join(self.directory, file_name))
+                bodies.append((stat.st_mtime, stat.st_size, file_name))
+
+            total_size = sum(size for _, size, _ in bodies)
+            for _, size, file_name in sorted(bodies):
+                if total_size <= self.max_size:
+                    break
+                digest = file_name[:-len(".body")]
+                for extension in ("body", "json"):
+                    self._unlink(os.path.join(self.directory, "{}.{}".format(digest, extension)))
+                total_size -= size
+
+    def _write_metadata(self, entry: CacheEntry):
+        meta_path = self._path(entry.url, "json")
+        tmp_path = "{}.{}.tmp".format(meta_path, threading.get_ident())
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry.__dict__, f)
+        os.replace(tmp_path, meta_path)
+
+    def _remove(self, url: str):
+        for extension in ("body", "json"):
+            self._unlink(self._path(url, extension))
+
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
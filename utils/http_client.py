@@ -0,0 +1,223 @@
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+from utils import metrics
+
+# requests (and urllib3) take longer to import than the rest of the program: they are only imported
+# by the first request, or the first configuration of the session
+if TYPE_CHECKING:
+    import requests
+    from requests.adapters import BaseAdapter
+    from urllib3.util.retry import Retry
+
+    from utils.http_cache import ResponseCache
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT: Tuple[float, float] = (10.0, 60.0)
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_PER_HOST = 4
+
+# server errors and rate limiting are worth a retry, other errors are not
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_lock = threading.Lock()
+_session: Optional["requests.Session"] = None
+_timeout: Union[float, Tuple[float, float]] = DEFAULT_TIMEOUT
+_max_per_host = DEFAULT_MAX_PER_HOST
+_host_semaphores: Dict[str, threading.BoundedSemaphore] = dict()
+_cache: Optional["ResponseCache"] = None
+
+
+def _accept_encoding() -> str:
+    # brotli is optional: only ask for it when it can be decoded
+    try:
+        import brotli  # type: ignore # noqa: F401
+        return "gzip, deflate, br"
+    except ImportError:
+        return "gzip, deflate"
+
+
+def build_retry(retries: int = DEFAULT_RETRIES, backoff_factor: float = DEFAULT_BACKOFF_FACTOR) -> "Retry":
+    """Build the retry policy of the shared session
+
+    Args:
+        retries (int): maximum number of retries on connection errors and server errors
+        backoff_factor (float): exponential backoff factor between two retries
+
+    Returns:
+        Retry: retry policy, to give to an HTTPAdapter
+    """
+    from urllib3.util.retry import Retry
+
+    return Retry(total=retries,
+                 backoff_factor=backoff_factor,
+                 status_forcelist=RETRY_STATUS_CODES,
+                 allowed_methods=frozenset(["GET", "HEAD"]),
+                 # let the caller check the status code once retries are exhausted
+                 raise_on_status=False)
+
+
+def _build_session(retries: int, backoff_factor: float, pool_size: int,
+                   transport: Optional["BaseAdapter"] = None) -> "requests.Session":
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    adapter = transport
+    if adapter is None:
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=build_retry(retries, backoff_factor))
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Accept-Encoding"] = _accept_encoding()
+    return session
+
+
+def configure(timeout: Union[float, Tuple[float, float]] = DEFAULT_TIMEOUT,
+              retries: int = DEFAULT_RETRIES,
+              backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+              pool_size: int = DEFAULT_POOL_SIZE,
+              max_per_host: int = DEFAULT_MAX_PER_HOST,
+              cache: Optional["ResponseCache"] = None,
+              transport: Optional["BaseAdapter"] = None):
+    """Configure the HTTP session shared by all fetchers
+
+    Args:
+        timeout (float or tuple): request timeout in seconds, or (connect, read) timeouts
+        retries (int): maximum number of retries on connection errors and server errors
+        backoff_factor (float): exponential backoff factor between two retries
+        pool_size (int): number of kept alive connections for each host
+        max_per_host (int): maximum number of concurrent requests to the same host
+        cache (Optional[ResponseCache]): on-disk cache used by cacheable requests, None to disable it
+        transport (Optional[BaseAdapter]): adapter sending the requests instead of the default one,
+            i.e. a replay.ReplayAdapter to run without network access
+    """
+    global _session, _timeout, _max_per_host, _cache
+
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = _build_session(retries, backoff_factor, pool_size, transport)
+        _timeout = timeout
+        _max_per_host = max_per_host
+        _host_semaphores.clear()
+        _cache = cache
+
+
+def get_session() -> "requests.Session":
+    """Get the shared HTTP session, creating it with the default configuration if needed
+
+    Returns:
+        requests.Session: shared session
+    """
+    global _session
+
+    with _lock:
+        if _session is None:
+            _session = _build_session(DEFAULT_RETRIES, DEFAULT_BACKOFF_FACTOR, DEFAULT_POOL_SIZE)
+        return _session
+
+
+@contextmanager
+def _host_slot(url: str):
+    host = urlparse(url).netloc
+    with _lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(_max_per_host)
+        semaphore = _host_semaphores[host]
+
+    with semaphore:
+        yield
+
+
+def _wire_bytes(response: "requests.Response", decoded_bytes: int) -> int:
+    # bytes received before decoding (gzip, brotli...), when the raw body tells its position
+    try:
+        return response.raw.tell()
+    except (AttributeError, ValueError, OSError):
+        return decoded_bytes
+
+
+def _count_downloaded_bytes(response: "requests.Response", host: str, stream: bool):
+    if not stream:
+        metrics.increment("http_downloaded_bytes_total", _wire_bytes(response, len(response.content)), host=host)
+        return
+
+    # the body of a streamed response is counted while it is read, content and iter_lines read it with iter_content
+    iter_content = response.iter_content
+
+    def counted_chunks(chunk_size: Optional[int]) -> Iterator[bytes]:
+        decoded = counted = 0
+        for chunk in iter_content(chunk_size):
+            decoded += len(chunk)
+            received = _wire_bytes(response, decoded)
+            metrics.increment("http_downloaded_bytes_total", received - counted, host=host)
+            counted = received
+            yield chunk
+
+    def counted_iter_content(chunk_size: Optional[int] = 1, decode_unicode: bool = False) -> Iterator:
+        if decode_unicode:
+            from requests.utils import stream_decode_response_unicode
+
+            return stream_decode_response_unicode(counted_chunks(chunk_size), response)
+        return counted_chunks(chunk_size)
+
+    response.iter_content = counted_iter_content  # type: ignore
+
+
+def get(url: str, use_cache: bool = False, **kwargs) -> "requests.Response":
+    """Send a GET request through the shared session
+
+    Connections are kept alive between requests, failed requests are retried
+    and the number of concurrent requests to a same host is limited. Requests,
+    downloaded bytes (as received, before decoding), cache results and times are
+    recorded in the metrics.
+
+    Args:
+        url (str): requested URL
+        use_cache (bool): if True and a cache is configured, send a conditional request
+            and get the body from the cache when it did not change
+        **kwargs: other arguments given to requests (headers, stream, ...)
+
+    Returns:
+        requests.Response: response of the request
+    """
+    session = get_session()
+    kwargs.setdefault("timeout", _timeout)
+    host = urlparse(url).netloc
+
+    cache = _cache
+    if not use_cache or cache is None:
+        with _host_slot(url), metrics.timer("http_request_seconds", host=host):
+            r = session.get(url, **kwargs)
+        metrics.increment("http_requests_total", host=host, status=r.status_code)
+        _count_downloaded_bytes(r, host, kwargs.get("stream", False))
+        return r
+
+    stream = kwargs.pop("stream", False)
+    entry = cache.lookup(url)
+    if entry is not None:
+        kwargs["headers"] = {**kwargs.get("headers", {}), **cache.validators(entry)}
+
+    with _host_slot(url), metrics.timer("http_request_seconds", host=host):
+        r = session.get(url, stream=True, **kwargs)
+        metrics.increment("http_requests_total", host=host, status=r.status_code)
+
+        if r.status_code == 304 and entry is not None:
+            r.close()
+            cache.refresh(entry)
+            metrics.increment("http_cache_requests_total", host=host, result="hit")
+        elif r.status_code == 200:
+            entry = cache.store(url, r)
+            metrics.increment("http_cache_requests_total", host=host, result="miss")
+            metrics.increment("http_downloaded_bytes_total", _wire_bytes(r, entry.size), host=host)
+        else:
+            _count_downloaded_bytes(r, host, stream)
+            return r
+
+    return cache.build_response(entry, stream=stream)
@@ -0,0 +1,109 @@
+import codecs
+import json
+import re
+from typing import Any, Iterable, Iterator, Optional
+
+import requests
+
+_WHITESPACES = " \t\n\r"
+# characters that may follow the part of a number already received, i.e. "1." or "2e"
+_NUMBER_CONTINUATION = re.compile(r"[0-9.eE+-]*")
+_decoder = json.JSONDecoder()
+
+
+def iter_json_array(chunks: Iterable[str]) -> Iterator[Any]:
+    """Decode the elements of a JSON array while its text is received
+
+    Only the text of the element being decoded is kept in memory.
+
+    Args:
+        chunks (Iterable[str]): text of the JSON array, in chunks
+
+    Raises:
+        ValueError: the text is not a JSON array
+
+    Yields:
+        Any: each element of the array
+    """
+    chunk_iterator = iter(chunks)
+    buffer = ""
+    pos = 0
+    started = False
+    ended = False
+
+    def read_more() -> bool:
+        nonlocal buffer, pos
+        for chunk in chunk_iterator:
+            if len(chunk) > 0:
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                return True
+        return False
+
+    while not ended:
+        # skip whitespaces and separators
+        while pos < len(buffer) and buffer[pos] in _WHITESPACES:
+            pos += 1
+        if pos == len(buffer):
+            if not read_more():
+                raise ValueError("Unexpected end of JSON array")
+            continue
+
+        if not started:
+            # tolerate a byte order mark before the array
+            if buffer[pos] == "\ufeff":
+                pos += 1
+                continue
+            if buffer[pos] != "[":
+                raise ValueError("Not a JSON array")
+            started = True
+            pos += 1
+            continue
+
+        if buffer[pos] == "]":
+            ended = True
+            continue
+        if buffer[pos] == ",":
+            pos += 1
+            continue
+
+        try:
+            element, end = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # the element is not complete yet
+            if not read_more():
+                raise
+            continue
+
+        # a number is only complete once a delimiter follows it: "1." is decoded as 1 and "2e" as 2
+        if isinstance(element, (int, float)) and _NUMBER_CONTINUATION.match(buffer, end).end() == len(buffer) \
+                and read_more():
+            continue
+
+        pos = end
+        yield element
+
+
+def iter_response_json_array(response: requests.Response, chunk_size: int = 64 * 1024,
+                             encoding: Optional[str] = None) -> Iterator[Any]:
+    """Decode the elements of a JSON array from a streamed response
+
+    Args:
+        response (requests.Response): response requested with stream=True
+        chunk_size (int): size of the chunks read from the response
+        encoding (Optional[str]): encoding of the body, by default the one of the response or UTF-8
+
+    Yields:
+        Any: each element of the array
+    """
+    decoder = codecs.getincrementaldecoder(encoding or response.encoding or "utf-8")()
+
+    def chunks() -> Iterator[str]:
+        for chunk in response.iter_content(chunk_size):
+            yield decoder.decode(chunk)
+        yield decoder.decode(b"", final=True)
+
+    try:
+        yield from iter_json_array(chunks())
+    finally:
+        response.close()
@@ -0,0 +1,20 @@
+import logging
+
+LOG_FORMAT = '%(name)s %(asctime)s %(levelname)s %(message)s'
+
+
+def configure_logging(level: str = "INFO"):
+    """Set up the colored logs of all loggers, once at startup rather than when importing each module
+
+    Args:
+        level (str): minimum level of the shown logs, i.e. "DEBUG"
+    """
+    # ignore "mypy" import error for coloredlogs.
+    # see https://mypy.readthedocs.io/en/latest/running_mypy.html#missing-imports
+    import coloredlogs  # type: ignore
+
+    coloredlogs.install(level=level, fmt=LOG_FORMAT)
+
+    # suppress overly verbose logs from libraries that aren't helpful
+    logging.getLogger("requests").setLevel(logging.WARNING)
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
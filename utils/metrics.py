@@ -0,0 +1,194 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# resource is not available on Windows: the peak memory is then not reported
+try:
+    import resource
+except ImportError:
+    resource = None  # type: ignore
+
+PROMETHEUS_PREFIX = "cloud_gaming_"
+
+COUNTER = "counter"
+GAUGE = "gauge"
+SUMMARY = "summary"
+
+_Labels = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_types: Dict[str, str] = dict()
+_values: Dict[Tuple[str, _Labels], float] = dict()
+_counts: Dict[Tuple[str, _Labels], int] = dict()
+_started_at = time.time()
+
+
+def _key(name: str, metric_type: str, labels: Dict[str, object]) -> Tuple[str, _Labels]:
+    known_type = _types.setdefault(name, metric_type)
+    if known_type != metric_type:
+        raise Exception("Metric {} is a {}, not a {}".format(name, known_type, metric_type))
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def reset():
+    """Forget all metrics, i.e. before a new run in the same process"""
+    global _started_at
+
+    with _lock:
+        _types.clear()
+        _values.clear()
+        _counts.clear()
+        _started_at = time.time()
+
+
+def increment(name: str, value: float = 1, **labels):
+    """Add to a counter
+
+    Args:
+        name (str): metric name, i.e. "http_requests_total"
+        value (float): added value
+        **labels: labels of the counter, i.e. host="example.com"
+    """
+    with _lock:
+        key = _key(name, COUNTER, labels)
+        _values[key] = _values.get(key, 0) + value
+
+
+def set_gauge(name: str, value: float, **labels):
+    """Set a gauge
+
+    Args:
+        name (str): metric name, i.e. "games"
+        value (float): new value
+        **labels: labels of the gauge, i.e. provider="geforce"
+    """
+    with _lock:
+        _values[_key(name, GAUGE, labels)] = value
+
+
+def observe(name: str, seconds: float, **labels):
+    """Add a duration to a summary, which keeps their sum and count
+
+    Args:
+        name (str): metric name, i.e. "stage_seconds"
+        seconds (float): observed duration
+        **labels: labels of the summary, i.e. stage="merge"
+    """
+    with _lock:
+        key = _key(name, SUMMARY, labels)
+        _values[key] = _values.get(key, 0) + seconds
+        _counts[key] = _counts.get(key, 0) + 1
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Observe the duration of a block, even when it raises
+
+    Args:
+        name (str): metric name, i.e. "stage_seconds"
+        **labels: labels of the summary, i.e. stage="merge"
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def peak_memory() -> Optional[int]:
+    """Get the peak resident memory of the process
+
+    Returns:
+        Optional[int]: peak memory in bytes, None if it is not available on this platform
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _finish():
+    set_gauge("run_duration_seconds", time.time() - _started_at)
+    set_gauge("last_run_timestamp_seconds", time.time())
+    memory = peak_memory()
+    if memory is not None:
+        set_gauge("peak_memory_bytes", memory)
+
+
+def report() -> Dict:
+    """Build the run report
+
+    Returns:
+        Dict: start time, and value of each metric with its labels (sum and count for summaries)
+    """
+    _finish()
+    with _lock:
+        metrics: List[Dict] = []
+        for (name, labels), value in sorted(_values.items()):
+            metric: Dict = {"name": name, "type": _types[name], "labels": dict(labels)}
+            if _types[name] == SUMMARY:
+                metric["sum"] = value
+                metric["count"] = _counts[(name, labels)]
+            else:
+                metric["value"] = value
+            metrics.append(metric)
+        return {"started_at": _started_at, "metrics": metrics}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace("\"", "\\\"")
+
+
+def prometheus_text() -> str:
+    """Format the metrics in the Prometheus text exposition format
+
+    Returns:
+        str: metrics, with their type
+    """
+    lines: List[str] = []
+    written_types = set()
+    for metric in report()["metrics"]:
+        name = PROMETHEUS_PREFIX + metric["name"]
+        if name not in written_types:
+            lines.append("# TYPE {} {}".format(name, metric["type"]))
+            written_types.add(name)
+
+        labels = ",".join('{}="{}"'.format(label, _escape(value)) for label, value in metric["labels"].items())
+        labels = "{{{}}}".format(labels) if labels != "" else ""
+        if metric["type"] == SUMMARY:
+            lines.append("{}_sum{} {}".format(name, labels, repr(float(metric["sum"]))))
+            lines.append("{}_count{} {}".format(name, labels, metric["count"]))
+        else:
+            lines.append("{}{} {}".format(name, labels, repr(float(metric["value"]))))
+    return "".join(line + "\n" for line in lines)
+
+
+def _write(path: str, text: str):
+    # written atomically, as the file may be read at any time (i.e. by a textfile collector)
+    tmp_path = "{}.tmp".format(path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def write_json_report(path: str):
+    """Write the run report as JSON
+
+    Args:
+        path (str): report file
+    """
+    _write(path, json.dumps(report(), indent=2))
+
+
+def write_prometheus(path: str):
+    """Write the metrics in the Prometheus text format, i.e. for the node exporter textfile collector
+
+    Args:
+        path (str): metrics file, with the .prom extension for the textfile collector
+    """
+    _write(path, prometheus_text())
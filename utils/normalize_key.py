@@ -0,0 +1,54 @@
+import re
+from functools import lru_cache
+from typing import List, Sequence
+
+# names that are not the same for every provider
+NAME_REMAPPING = {
+    "Trine 4": "Trine 4: The Nightmare Prince",
+    "Cities: Skylines - Xbox One Edition": "Cities: Skylines",
+    "Wolfenstein Young Blood": "Wolfenstein Youngblood",
+    "ARK: Survival Evolved Explorer's Edition": "ARK: Survival Evolved",
+    "Totally Accurate Battle Simulator (Game Preview)": "Totally Accurate Battle Simulator",
+    "Tom Clancy's Rainbow Six® Siege Deluxe Edition": "Tom Clancy's Rainbow Six® Siege"
+}
+
+# characters removed from keys, in a single pass
+_REMOVED_CHARACTERS = re.compile("[™®©:'’]")
+
+
+@lru_cache(maxsize=65536)
+def normalize_key(name: str) -> str:
+    """Build the key used to match a game between providers
+
+    Args:
+        name (str): game name
+
+    Returns:
+        str: lower case name without trademark symbols and punctuation
+    """
+    key = _REMOVED_CHARACTERS.sub("", NAME_REMAPPING.get(name, name).lower())
+    if "_" in key:
+        key = key.replace("_", " ")
+    return key
+
+
+def normalize_keys(names: Sequence[str]) -> List[str]:
+    """Build the keys of a whole list of names, i.e. all the games of a provider
+
+    The distinct names are lowered and cleaned together as a single string, which is much faster than
+    one name at a time on large lists.
+
+    Args:
+        names (Sequence[str]): game names
+
+    Returns:
+        List[str]: keys, in the same order
+    """
+    unique_names = list(dict.fromkeys(names))
+    remapped = "\n".join([NAME_REMAPPING.get(name, name) for name in unique_names]).lower()
+    keys = _REMOVED_CHARACTERS.sub("", remapped).replace("_", " ").split("\n")
+    # cleaned names never have line breaks, but other names may
+    if len(keys) != len(unique_names):
+        keys = [normalize_key.__wrapped__(name) for name in unique_names]
+    keys_by_name = dict(zip(unique_names, keys))
+    return [keys_by_name[name] for name in names]
@@ -0,0 +1,80 @@
+import atexit
+import threading
+from typing import TYPE_CHECKING, Callable, List, Optional, Sequence, TypeVar
+
+# multiprocessing is only imported by the runs parsing in processes
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing.context import BaseContext
+
+Chunk = TypeVar("Chunk")
+Result = TypeVar("Result")
+
+# payloads are parsed in the fetching thread unless a number of processes is configured
+_lock = threading.Lock()
+_workers = 0
+_executor: Optional["ProcessPoolExecutor"] = None
+
+
+def _context() -> "BaseContext":
+    import multiprocessing
+
+    # the processes are started by the first parse, from a fetching thread: forking it while other threads hold
+    # locks (logging, HTTP connection pools) would copy them locked, the fork server forks from a clean process
+    start_methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in start_methods else "spawn")
+
+
+def configure(workers: int):
+    """Set the number of processes parsing the payloads, and create their pool
+
+    Parsing holds the GIL, so fetcher threads only parse in parallel in other processes. Call it from the main
+    thread, before the fetches start.
+
+    Args:
+        workers (int): number of processes, 0 to parse in the fetching thread
+    """
+    global _workers, _executor
+
+    shutdown()
+    with _lock:
+        _workers = max(0, workers)
+        if _workers > 0:
+            from concurrent.futures import ProcessPoolExecutor
+
+            _executor = ProcessPoolExecutor(max_workers=_workers, mp_context=_context())
+
+
+def enabled() -> bool:
+    return _executor is not None
+
+
+def map_chunks(function: Callable[[Chunk], Result], chunks: Sequence[Chunk]) -> List[Result]:
+    """Parse the chunks of a payload in the process pool
+
+    Args:
+        function (Callable): module level function parsing a chunk, returning compact results (i.e. tuples)
+        chunks (Sequence): chunks of the payload, which must be picklable
+
+    Returns:
+        List: result of each chunk, in the same order
+    """
+    executor = _executor
+    if executor is None or len(chunks) < 2:
+        return [function(chunk) for chunk in chunks]
+    # a few chunks per task, so that processes are not idle waiting for the slowest one
+    chunk_size = max(1, len(chunks) // (_workers * 4))
+    return list(executor.map(function, chunks, chunksize=chunk_size))
+
+
+def shutdown():
+    """Stop the processes, the payloads are then parsed in the fetching thread until the next configuration"""
+    global _executor
+
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown()
+
+
+atexit.register(shutdown)
@@ -0,0 +1,172 @@
+import io
+import json
+import os
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Pattern, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from utils.http_cache import IGNORED_HEADERS, ResponseCache
+
+INDEX_FILE = "index.json"
+
+
+class RecordedResponse:
+    def __init__(self, status_code: int, headers: Dict[str, str], body: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+
+
+def canonical_url(url: str) -> str:
+    """Get a form of an URL that does not depend on the order of its query parameters
+
+    Args:
+        url (str): URL
+
+    Returns:
+        str: URL with sorted query parameters
+    """
+    url_parts = list(urlparse(url))
+    url_parts[4] = urlencode(sorted(parse_qsl(url_parts[4], keep_blank_values=True)))
+    return urlunparse(url_parts)
+
+
+class ReplayAdapter(BaseAdapter):
+    """Transport adapter answering requests with recorded or generated responses, without network access
+
+    Responses are found by URL first, then by the first route whose pattern matches the URL.
+    Requests without a response fail with a connection error, like an unreachable host.
+    """
+
+    def __init__(self, responses: Optional[Dict[str, RecordedResponse]] = None):
+        super().__init__()
+        self._responses: Dict[str, RecordedResponse] = dict()
+        self._routes: List[Tuple[Pattern, Callable[[requests.PreparedRequest], RecordedResponse]]] = []
+        self._lock = threading.Lock()
+        # URLs of the answered requests, in order
+        self.requests: List[str] = []
+        for url, response in (responses or dict()).items():
+            self.add(url, response)
+
+    @classmethod
+    def load(cls, directory: str) -> "ReplayAdapter":
+        """Load the responses saved by a RecordingAdapter
+
+        Args:
+            directory (str): recording directory
+
+        Returns:
+            ReplayAdapter: adapter answering the recorded requests
+        """
+        with open(os.path.join(directory, INDEX_FILE), "r", encoding="utf-8") as f:
+            index = json.load(f)
+
+        adapter = cls()
+        for record in index:
+            with open(os.path.join(directory, record["body"]), "rb") as body_file:
+                adapter.add(record["url"], RecordedResponse(record["status_code"], record["headers"],
+                                                            body_file.read()))
+        return adapter
+
+    def add(self, url: str, response: RecordedResponse):
+        """Answer a URL with a response
+
+        Args:
+            url (str): requested URL
+            response (RecordedResponse): response to send
+        """
+        self._responses[canonical_url(url)] = response
+
+    def route(self, pattern: str, handler: Callable[[requests.PreparedRequest], RecordedResponse]):
+        """Answer the URLs matching a pattern with a generated response
+
+        Args:
+            pattern (str): regular expression searched in the URLs
+            handler (Callable): function building the response of a request
+        """
+        self._routes.append((re.compile(pattern), handler))
+
+    def _find(self, request: requests.PreparedRequest) -> Optional[RecordedResponse]:
+        response = self._responses.get(canonical_url(request.url))
+        if response is not None:
+            return response
+        for pattern, handler in self._routes:
+            if pattern.search(request.url):
+                return handler(request)
+        return None
+
+    def send(self, request: requests.PreparedRequest, stream: bool = False, timeout=None, verify=True,
+             cert=None, proxies=None) -> requests.Response:
+        recorded = self._find(request)
+        if recorded is None:
+            raise requests.ConnectionError("No recorded response for {}".format(request.url), request=request)
+        with self._lock:
+            self.requests.append(request.url)
+
+        response = requests.Response()
+        response.status_code = recorded.status_code
+        response.headers = CaseInsensitiveDict(recorded.headers)
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.raw = io.BytesIO(recorded.body)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self):
+        pass
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Transport adapter saving every successful response, to replay them later with ReplayAdapter.load
+
+    Only 200 responses are saved. A 304 response to a conditional request is saved with the body of the
+    cache entry it validates, so that a run recorded with a warm cache replays the full bodies.
+    """
+
+    def __init__(self, directory: str, cache: Optional[ResponseCache] = None, **kwargs):
+        """Record in a directory
+
+        Args:
+            directory (str): recording directory, its previous recording is replaced
+            cache (Optional[ResponseCache]): HTTP cache of the run, giving the bodies of the 304 responses
+            **kwargs: other arguments given to HTTPAdapter (max_retries, ...)
+        """
+        super().__init__(**kwargs)
+        self.directory = directory
+        self.cache = cache
+        self._index: List[Dict] = []
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        response = super().send(request, **kwargs)
+        if response.status_code == 200:
+            # read the whole body, it is then given to the caller from memory
+            body = response.content
+            headers = {name: value for name, value in response.headers.items()
+                       if name.lower() not in IGNORED_HEADERS}
+        elif response.status_code == 304 and self.cache is not None:
+            entry = self.cache.lookup(request.url)
+            if entry is None:
+                return response
+            # the cached body is stored decoded, and its headers already leave out the ignored ones
+            body = self.cache.build_response(entry).content
+            headers = dict(entry.headers)
+        else:
+            return response
+
+        with self._lock:
+            body_file = "{:04d}.body".format(len(self._index))
+            with open(os.path.join(self.directory, body_file), "wb") as f:
+                f.write(body)
+            self._index.append({"url": request.url, "status_code": 200, "headers": headers, "body": body_file})
+            # the index is written after each response, so that an interrupted run can be replayed
+            with open(os.path.join(self.directory, INDEX_FILE), "w", encoding="utf-8") as f:
+                json.dump(self._index, f, indent=1)
+        return response
@@ -0,0 +1,121 @@
+from bisect import bisect_left, insort
+from typing import Any, Iterable, Iterator, List, Optional
+
+# number of items of a block: a block is split when it gets twice as large
+DEFAULT_LOAD = 1000
+
+
+class SortedList:
+    """List kept sorted, split in blocks so that an insertion or a removal only moves the items of one block
+
+    The last item of each block is kept in a separate list: a lookup is a bisection in it, then in a block.
+    """
+
+    def __init__(self, items: Iterable = (), load: int = DEFAULT_LOAD):
+        """Sort the initial items
+
+        Args:
+            items (Iterable): initial items, comparable with each other
+            load (int): number of items of a block
+        """
+        self.load = load
+        ordered = sorted(items)
+        self._blocks: List[List] = [ordered[start:start + load] for start in range(0, len(ordered), load)]
+        self._maxes: List = [block[-1] for block in self._blocks]
+        self._len = len(ordered)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator:
+        for block in self._blocks:
+            yield from block
+
+    def copy(self) -> "SortedList":
+        """Copy the list without sorting it again
+
+        Returns:
+            SortedList: independent list with the same items
+        """
+        other = SortedList(load=self.load)
+        other._blocks = [list(block) for block in self._blocks]
+        other._maxes = list(self._maxes)
+        other._len = self._len
+        return other
+
+    def __contains__(self, item: Any) -> bool:
+        index = bisect_left(self._maxes, item)
+        if index == len(self._maxes):
+            return False
+        block = self._blocks[index]
+        position = bisect_left(block, item)
+        return block[position] == item
+
+    def add(self, item: Any):
+        """Insert an item at its place
+
+        Args:
+            item (Any): new item
+        """
+        if len(self._blocks) == 0:
+            self._blocks.append([item])
+            self._maxes.append(item)
+            self._len = 1
+            return
+
+        # after the last item: added to the last block
+        index = min(bisect_left(self._maxes, item), len(self._maxes) - 1)
+        block = self._blocks[index]
+        insort(block, item)
+        self._maxes[index] = block[-1]
+        self._len += 1
+
+        if len(block) > 2 * self.load:
+            self._blocks[index:index + 1] = [block[:self.load], block[self.load:]]
+            self._maxes[index:index + 1] = [block[self.load - 1], block[-1]]
+
+    def remove(self, item: Any):
+        """Remove an item
+
+        Args:
+            item (Any): removed item
+
+        Raises:
+            ValueError: the item is not in the list
+        """
+        index = bisect_left(self._maxes, item)
+        if index < len(self._maxes):
+            block = self._blocks[index]
+            position = bisect_left(block, item)
+            if block[position] == item:
+                del block[position]
+                self._len -= 1
+                if len(block) == 0:
+                    del self._blocks[index]
+                    del self._maxes[index]
+                else:
+                    self._maxes[index] = block[-1]
+                return
+        raise ValueError("{} is not in the list".format(item))
+
+    def irange(self, start: Optional[Any] = None, end: Optional[Any] = None) -> Iterator:
+        """Iterate over the items from start (included) to end (excluded), in order
+
+        Args:
+            start (Optional[Any]): first item, None to start from the beginning
+            end (Optional[Any]): item ending the iteration, None to go to the end
+
+        Yields:
+            Any: items of the range
+        """
+        index = 0 if start is None else bisect_left(self._maxes, start)
+        position = 0 if start is None or index == len(self._maxes) else bisect_left(self._blocks[index], start)
+
+        while index < len(self._blocks):
+            block = self._blocks[index]
+            for item in block[position:] if position > 0 else block:
+                if end is not None and not item < end:
+                    return
+                yield item
+            index += 1
+            position = 0
@@ -0,0 +1,107 @@
+import math
+from bisect import bisect_right
+from collections import Counter
+from typing import Dict, FrozenSet, List, Sequence, Tuple
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """Get the trigrams of a text, padded so that short texts still have some
+
+    Args:
+        text (str): input text
+
+    Returns:
+        FrozenSet[str]: distinct trigrams
+    """
+    padded = "  {} ".format(text)
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _min_overlap(size: int, threshold: float) -> int:
+    # Dice(A, B) = 2|A & B| / (|A| + |B|) >= t implies |A & B| >= t|A| / (2 - t)
+    return max(1, math.ceil(threshold * size / (2 - threshold) - 1e-9))
+
+
+class TrigramIndex:
+    """Index of texts by trigram, to find the similar texts without comparing all pairs
+
+    The similarity is the Dice coefficient of the trigram sets. Trigrams of each text are
+    sorted from the rarest to the most frequent, and only a prefix of them is indexed: two
+    texts reaching the threshold share at least one trigram of their prefixes (prefix
+    filtering). Frequent trigrams are thus rarely indexed, and a search only reads a few
+    short posting lists.
+    """
+
+    def __init__(self, texts: Sequence[str], threshold: float):
+        """Index texts
+
+        Args:
+            texts (Sequence[str]): indexed texts, identified by their position
+            threshold (float): minimum Dice similarity of the searches, between 0 (excluded) and 1
+        """
+        self.threshold = threshold
+        self._trigrams: Dict[int, FrozenSet[str]] = dict()
+        self._prefixes: Dict[int, List[str]] = dict()
+        self._postings: Dict[str, List[int]] = dict()
+
+        for item_id, text in enumerate(texts):
+            self._trigrams[item_id] = trigrams(text)
+        frequencies = Counter(trigram for item_trigrams in self._trigrams.values() for trigram in item_trigrams)
+
+        for item_id, item_trigrams in self._trigrams.items():
+            ordered = sorted(item_trigrams, key=lambda trigram: (frequencies[trigram], trigram))
+            prefix = ordered[:len(ordered) - _min_overlap(len(ordered), threshold) + 1]
+            self._prefixes[item_id] = prefix
+            for trigram in prefix:
+                self._postings.setdefault(trigram, []).append(item_id)
+
+    def __len__(self) -> int:
+        return len(self._trigrams)
+
+    def remove(self, item_id: int):
+        """Remove a text from the search results
+
+        Args:
+            item_id (int): position of the text
+        """
+        self._trigrams.pop(item_id, None)
+
+    def similar(self, item_id: int, following_only: bool = False) -> List[Tuple[int, float]]:
+        """Find the texts similar to an indexed text
+
+        Args:
+            item_id (int): position of the text
+            following_only (bool): only search the texts after this one, i.e. when the texts
+                before it were already compared to it
+
+        Returns:
+            List[Tuple[int, float]]: positions and similarities of the other matching texts, most similar first
+        """
+        query = self._trigrams.get(item_id)
+        if query is None:
+            return []
+
+        candidates = set()
+        for trigram in self._prefixes[item_id]:
+            postings = self._postings[trigram]
+            if following_only:
+                # posting lists are sorted by position
+                postings = postings[bisect_right(postings, item_id):]
+            candidates.update(postings)
+        candidates.discard(item_id)
+
+        # the sizes of the trigram sets of a match are bounded
+        min_size = self.threshold * len(query) / (2 - self.threshold) - 1e-9
+        max_size = (2 - self.threshold) * len(query) / self.threshold + 1e-9
+
+        matches: List[Tuple[int, float]] = []
+        for candidate in candidates:
+            item_trigrams = self._trigrams.get(candidate)
+            if item_trigrams is None or not min_size <= len(item_trigrams) <= max_size:
+                continue
+            similarity = 2 * len(query & item_trigrams) / (len(query) + len(item_trigrams))
+            if similarity >= self.threshold:
+                matches.append((candidate, similarity))
+
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches
@@ -0,0 +1,267 @@
+import itertools
+import json
+import os
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Type
+
+# a row of the output: game name and availability of each column
+Row = Tuple[str, Sequence[bool]]
+
+BATCH_SIZE = 1000
+BUFFER_SIZE = 1024 * 1024
+
+# marks added to the name of a column: its games are the last known ones, not freshly fetched (stale),
+# or its provider could not be fetched and its games are unknown (failed)
+STALE = "stale"
+FAILED = "failed"
+COLUMN_STATUSES = (STALE, FAILED)
+
+
+def mark_column(column: str, status: Optional[str]) -> str:
+    """Add the status of a column to its name
+
+    Args:
+        column (str): name of the column
+        status (Optional[str]): STALE, FAILED or None for a freshly fetched column
+
+    Returns:
+        str: name written in the header, i.e. "PSNow (stale)"
+    """
+    return column if status is None else "{} ({})".format(column, status)
+
+
+def split_column(column: str) -> Tuple[str, Optional[str]]:
+    """Separate the name of a column from its status
+
+    Args:
+        column (str): name written in the header
+
+    Returns:
+        Tuple[str, Optional[str]]: name of the column and its status, None if it has none
+    """
+    for status in COLUMN_STATUSES:
+        suffix = " ({})".format(status)
+        if column.endswith(suffix):
+            return column[:-len(suffix)], status
+    return column, None
+
+
+class CatalogWriter:
+    """Base class of the output writers
+
+    Rows are given by batches; writers are context managers.
+    """
+
+    def __init__(self, path: str, columns: Sequence[str]):
+        self.path = path
+        self.columns = list(columns)
+
+    def write_rows(self, rows: Sequence[Row]):
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class CsvWriter(CatalogWriter):
+    """Semicolon separated file, i.e. Name;Geforce;PSNow;Stadia;XCloud"""
+
+    def __init__(self, path: str, columns: Sequence[str]):
+        super().__init__(path, columns)
+        self._file = open(path, "w", encoding="utf-8-sig", buffering=BUFFER_SIZE)
+        self._file.write('Name;{}\n'.format(";".join(self.columns)))
+
+    def write_rows(self, rows: Sequence[Row]):
+        self._file.write("".join('"{}";{}\n'.format(name, ";".join(str(value) for value in values))
+                                 for name, values in rows))
+
+    def close(self):
+        self._file.close()
+
+
+class JsonLinesWriter(CatalogWriter):
+    """One JSON object by line, i.e. {"Name": "...", "Geforce": true, ...}"""
+
+    def __init__(self, path: str, columns: Sequence[str]):
+        super().__init__(path, columns)
+        self._file = open(path, "w", encoding="utf-8", buffering=BUFFER_SIZE)
+        self._encoder = json.JSONEncoder(ensure_ascii=False)
+
+    def write_rows(self, rows: Sequence[Row]):
+        lines = []
+        for name, values in rows:
+            record: Dict[str, object] = {"Name": name}
+            record.update(zip(self.columns, values))
+            lines.append(self._encoder.encode(record))
+        lines.append("")
+        self._file.write("\n".join(lines))
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter(CatalogWriter):
+    """Columnar Parquet file, with a string column for the name and a boolean column by provider"""
+
+    def __init__(self, path: str, columns: Sequence[str]):
+        super().__init__(path, columns)
+        # pyarrow is only needed for this format
+        try:
+            import pyarrow  # type: ignore
+            import pyarrow.parquet  # type: ignore
+        except ImportError:
+            raise Exception("pyarrow is required to write Parquet files: pip install pyarrow")
+
+        self._pyarrow = pyarrow
+        self._schema = pyarrow.schema([("Name", pyarrow.string())]
+                                      + [(column, pyarrow.bool_()) for column in self.columns])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+
+    def write_rows(self, rows: Sequence[Row]):
+        arrays = [self._pyarrow.array([name for name, _ in rows], type=self._pyarrow.string())]
+        for index in range(len(self.columns)):
+            arrays.append(self._pyarrow.array([values[index] for _, values in rows], type=self._pyarrow.bool_()))
+        self._writer.write_table(self._pyarrow.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+WRITERS: Dict[str, Type[CatalogWriter]] = {
+    "csv": CsvWriter,
+    "jsonl": JsonLinesWriter,
+    "parquet": ParquetWriter,
+}
+
+
+def guess_format(path: str) -> str:
+    """Get the output format from the extension of a file
+
+    Args:
+        path (str): output file
+
+    Returns:
+        str: format name, "csv" when the extension is not known
+    """
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    return extension if extension in WRITERS else "csv"
+
+
+def open_writer(path: str, columns: Sequence[str], output_format: Optional[str] = None) -> CatalogWriter:
+    """Open a writer
+
+    Args:
+        path (str): output file
+        columns (Sequence[str]): name of the availability columns
+        output_format (Optional[str]): format name, guessed from the file extension if None
+
+    Returns:
+        CatalogWriter: writer of the format
+    """
+    output_format = output_format or guess_format(path)
+    if output_format not in WRITERS:
+        raise Exception("Unknown output format: {}".format(output_format))
+    return WRITERS[output_format](path, columns)
+
+
+def write_batches(writer: CatalogWriter, rows: Iterable[Row], batch_size: int = BATCH_SIZE) -> int:
+    """Write rows by batches
+
+    Args:
+        writer (CatalogWriter): output writer
+        rows (Iterable[Row]): rows to write
+        batch_size (int): number of rows given at once to the writer
+
+    Returns:
+        int: number of written rows
+    """
+    batch: List[Row] = []
+    count = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            writer.write_rows(batch)
+            count += len(batch)
+            batch = []
+    if len(batch) > 0:
+        writer.write_rows(batch)
+        count += len(batch)
+    return count
+
+
+def _read_csv(path: str) -> Tuple[List[str], Iterator[Row]]:
+    f = open(path, "r", encoding="utf-8-sig")
+    columns = f.readline().rstrip("\n").split(";")[1:]
+
+    def rows() -> Iterator[Row]:
+        with f:
+            for line in f:
+                # names are quoted but may contain separators: split the availability columns from the right
+                fields = line.rstrip("\n").rsplit(";", len(columns))
+                if len(fields) != len(columns) + 1:
+                    continue
+                yield fields[0][1:-1], [value == "True" for value in fields[1:]]
+
+    return columns, rows()
+
+
+def _read_jsonl(path: str) -> Tuple[List[str], Iterator[Row]]:
+    f = open(path, "r", encoding="utf-8")
+    first = f.readline()
+    columns = [column for column in json.loads(first) if column != "Name"] if first.strip() else []
+
+    def rows() -> Iterator[Row]:
+        with f:
+            for line in itertools.chain([first], f):
+                if line.strip():
+                    record = json.loads(line)
+                    yield record["Name"], [record.get(column, False) for column in columns]
+
+    return columns, rows()
+
+
+def _read_parquet(path: str) -> Tuple[List[str], Iterator[Row]]:
+    try:
+        import pyarrow.parquet  # type: ignore
+    except ImportError:
+        raise Exception("pyarrow is required to read Parquet files: pip install pyarrow")
+
+    parquet_file = pyarrow.parquet.ParquetFile(path)
+    columns = [column for column in parquet_file.schema_arrow.names if column != "Name"]
+
+    def rows() -> Iterator[Row]:
+        for batch in parquet_file.iter_batches(batch_size=BATCH_SIZE):
+            records = batch.to_pydict()
+            for index, name in enumerate(records["Name"]):
+                yield name, [bool(records[column][index]) for column in columns]
+
+    return columns, rows()
+
+
+READERS: Dict[str, Callable[[str], Tuple[List[str], Iterator[Row]]]] = {
+    "csv": _read_csv,
+    "jsonl": _read_jsonl,
+    "parquet": _read_parquet,
+}
+
+
+def read_rows(path: str, output_format: Optional[str] = None) -> Tuple[List[str], Iterator[Row]]:
+    """Read back an output file
+
+    Args:
+        path (str): output file
+        output_format (Optional[str]): format name, guessed from the file extension if None
+
+    Returns:
+        Tuple[List[str], Iterator[Row]]: name of the availability columns, with their status (see split_column),
+            and rows read lazily
+    """
+    output_format = output_format or guess_format(path)
+    if output_format not in READERS:
+        raise Exception("Unknown output format: {}".format(output_format))
+    return READERS[output_format](path)